@@ -0,0 +1,11 @@
+import pytest
+
+from core.testing import IsolatedCaches
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_caches():
+    caches = IsolatedCaches()
+    caches.start()
+    yield
+    caches.stop()
@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def query_budgets(settings):
+    """Every request must keep to the query budget of its view."""
+    settings.QUERY_BUDGET_MODE = 'raise'
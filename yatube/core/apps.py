@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import slow_queries, sqlite
+
+        connection_created.connect(
+            sqlite.configure, dispatch_uid='core.sqlite'
+        )
+        connection_created.connect(
+            slow_queries.install, dispatch_uid='core.slow_queries'
+        )
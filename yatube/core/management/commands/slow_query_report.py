@@ -0,0 +1,74 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import slow_queries
+
+SQL_WIDTH: int = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Sum up the slow query log, rotated files included: statements '
+        'by total time with the views and code that ran them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', default=None,
+            help='Log to read (default: settings.SLOW_QUERY_LOG).',
+        )
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--by', choices=('fingerprint', 'view'), default='fingerprint',
+            help='Group statements by fingerprint or by view.',
+        )
+        parser.add_argument(
+            '--view', help='Only statements run by this URL name.'
+        )
+        parser.add_argument(
+            '--json', action='store_true', help='Print the rows as JSON.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.SLOW_QUERY_LOG
+        files = slow_queries.log_files(path)
+        if not files:
+            raise CommandError(f'No slow query log at {path}')
+        records = slow_queries.read(files)
+        if options['view']:
+            records = (
+                entry for entry in records
+                if entry.get('view') == options['view']
+            )
+        rows = slow_queries.aggregate(records, options['by'])
+        top = rows[:options['top']]
+        if options['json']:
+            self.stdout.write(json.dumps(top, ensure_ascii=False, indent=2))
+            return
+        self.stdout.write(
+            f'{sum(row["count"] for row in rows)} slow statements in '
+            f'{len(rows)} groups from {len(files)} file(s)'
+        )
+        self.stdout.write(
+            f'{"total ms":>10} {"count":>7} {"mean ms":>9} {"max ms":>9}  '
+            f'{options["by"]}'
+        )
+        for row in top:
+            self.stdout.write(
+                f'{row["total_ms"]:>10.1f} {row["count"]:>7} '
+                f'{row["mean_ms"]:>9.1f} {row["max_ms"]:>9.1f}  '
+                f'{" ".join(row[options["by"]].split())[:SQL_WIDTH]}'
+            )
+            if options['by'] == 'fingerprint':
+                self.stdout.write(' ' * 40 + 'views: ' + _counts(
+                    row['views']
+                ))
+            self.stdout.write(' ' * 40 + 'from: ' + _counts(row['stacks']))
+
+
+def _counts(pairs, limit: int = 3) -> str:
+    return ', '.join(
+        f'{value or "?"} ({count})' for value, count in pairs[:limit]
+    )
@@ -0,0 +1,198 @@
+"""In-process request metrics, exported in the Prometheus text format.
+
+``core.middleware.MetricsMiddleware`` measures every request and files
+it under its URL name: latency, database queries and time, template
+render time and cache hits and misses. Each sample lands in fixed-bucket
+histograms, which cost a ``bisect`` and a few additions under a lock,
+so the metrics can stay on in production.
+
+The numbers live in the memory of one process. With several worker
+processes each one reports its own share; scrape them one by one.
+"""
+import bisect
+import threading
+import time
+
+from django.core.cache import caches
+
+SECONDS_BUCKETS: tuple = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS: tuple = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+UNRESOLVED: str = '<unresolved>'
+PREFIX: str = 'yatube_request'
+
+HISTOGRAMS = (
+    ('duration_seconds', 'duration', SECONDS_BUCKETS,
+     'Request latency.'),
+    ('db_queries', 'queries', QUERY_BUCKETS,
+     'Database queries per request.'),
+    ('db_duration_seconds', 'db_time', SECONDS_BUCKETS,
+     'Time spent in database queries per request.'),
+    ('template_duration_seconds', 'template_time', SECONDS_BUCKETS,
+     'Time spent rendering templates per request.'),
+)
+COUNTERS = (
+    ('cache_hits_total', 'cache_hits', 'Cache hits.'),
+    ('cache_misses_total', 'cache_misses', 'Cache misses.'),
+    ('db_slow_queries_total', 'slow_queries',
+     'Queries over SLOW_QUERY_THRESHOLD, see core.slow_queries.'),
+)
+
+_local = threading.local()
+
+
+class Histogram:
+    """Counts of observations per bucket, Prometheus style."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        # Bucket bounds are inclusive: ``le="0.1"`` counts 0.1 itself.
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def cumulative(self):
+        """``(upper bound, observations up to it)`` pairs, ``+Inf`` last."""
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestSample:
+    """What one request spent; filled in while it runs."""
+
+    __slots__ = (
+        'view', 'duration', 'queries', 'db_time', 'template_time',
+        'template_depth', 'cache_hits', 'cache_misses', 'slow_queries',
+    )
+
+    def __init__(self):
+        self.view = None
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.slow_queries = 0
+
+    def execute(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper()`` hook timing every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.histograms = {
+            attribute: Histogram(buckets)
+            for _, attribute, buckets, _ in HISTOGRAMS
+        }
+        self.counters = dict.fromkeys(
+            (attribute for _, attribute, _ in COUNTERS), 0
+        )
+
+    def observe(self, sample):
+        for attribute, histogram in self.histograms.items():
+            histogram.observe(getattr(sample, attribute))
+        for attribute in self.counters:
+            self.counters[attribute] += getattr(sample, attribute)
+
+
+class Registry:
+    """Metrics of this process by URL name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def observe(self, view, sample):
+        with self.lock:
+            metrics = self.views.get(view)
+            if metrics is None:
+                metrics = self.views[view] = ViewMetrics()
+            metrics.observe(sample)
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+    def render(self) -> str:
+        """The text exposition format read by Prometheus."""
+        lines = []
+        with self.lock:
+            views = sorted(self.views.items())
+            for name, attribute, _, description in HISTOGRAMS:
+                metric = f'{PREFIX}_{name}'
+                lines.append(f'# HELP {metric} {description}')
+                lines.append(f'# TYPE {metric} histogram')
+                for view, metrics in views:
+                    histogram = metrics.histograms[attribute]
+                    label = f'view="{_escape(view)}"'
+                    for bound, total in histogram.cumulative():
+                        lines.append(
+                            f'{metric}_bucket{{{label},le="{bound}"}} {total}'
+                        )
+                    lines.append(f'{metric}_sum{{{label}}} {histogram.sum}')
+                    lines.append(
+                        f'{metric}_count{{{label}}} {histogram.count}'
+                    )
+            for name, attribute, description in COUNTERS:
+                metric = f'{PREFIX}_{name}'
+                lines.append(f'# HELP {metric} {description}')
+                lines.append(f'# TYPE {metric} counter')
+                for view, metrics in views:
+                    lines.append(
+                        f'{metric}{{view="{_escape(view)}"}} '
+                        f'{metrics.counters[attribute]}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+registry = Registry()
+
+
+def start() -> RequestSample:
+    """Begin a sample for the request served by this thread."""
+    sample = _local.sample = RequestSample()
+    return sample
+
+
+def finish():
+    _local.sample = None
+
+
+def current():
+    """The sample of the request in progress, if any."""
+    return getattr(_local, 'sample', None)
+
+
+def cache_counts() -> dict:
+    """Hits and misses of this thread's metered caches.
+
+    Django creates cache backends per thread, so the difference of two
+    readings taken around a request is exactly that request's share.
+    """
+    counts = {}
+    for cache in caches.all():
+        if hasattr(cache, 'hits'):
+            counts[id(cache)] = (cache.hits, cache.misses)
+    return counts
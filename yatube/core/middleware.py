@@ -0,0 +1,46 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Record latency, queries, template and cache use per URL name.
+
+    Goes first in ``MIDDLEWARE`` so the latency covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample = metrics.start()
+        caches_before = metrics.cache_counts()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(sample.execute)
+                    )
+                response = self.get_response(request)
+            sample.duration = time.perf_counter() - started
+            for key, (hits, misses) in metrics.cache_counts().items():
+                hits_before, misses_before = caches_before.get(key, (0, 0))
+                sample.cache_hits += hits - hits_before
+                sample.cache_misses += misses - misses_before
+        finally:
+            metrics.finish()
+        match = request.resolver_match
+        metrics.registry.observe(
+            match.view_name if match else metrics.UNRESOLVED, sample
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        sample = metrics.current()
+        if sample is not None:
+            # Read by ``core.slow_queries`` while the view runs.
+            sample.view = request.resolver_match.view_name
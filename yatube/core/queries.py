@@ -0,0 +1,152 @@
+"""Query budgets and N+1 detection for development and tests.
+
+Views declare the most queries a request may run with ``query_budget``
+where they are routed (see ``posts.urls``). ``QueryBudgetMiddleware``
+records every query of a request, session and user lookups included,
+and reports two problems: a view going over its budget, and N+1
+patterns, the same statement with different parameters run
+``REPEAT_LIMIT`` times or more. ``settings.QUERY_BUDGET_MODE`` decides
+what a report does: ``'raise'`` fails the request with
+``QueryBudgetExceeded``, ``'log'`` writes a warning and ``'off'`` skips
+the recording altogether.
+
+``assert_queries`` runs the same checks over a block of code in tests.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+REPEAT_LIMIT: int = 5
+MODES: tuple = ('off', 'log', 'raise')
+# Shown of each repeated statement in a report.
+SQL_PREVIEW: int = 200
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+class QueryBudgetExceeded(Exception):
+    """More queries, or more repeated ones, than a view may run."""
+
+
+def fingerprint(sql: str) -> str:
+    """``sql`` without what varies between runs of the same statement.
+
+    Parameters are already placeholders; lists of them and numbers
+    inlined by the ORM, like ``LIMIT 21``, are collapsed too.
+    """
+    return _NUMBER.sub('?', _IN_LIST.sub('IN (...)', sql))
+
+
+def query_budget(queries=None, repeats: int = REPEAT_LIMIT):
+    """Declare the budget of a view: at most ``queries`` per request and
+    no statement run ``repeats`` times or more.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+
+        wrapper.query_budget = (queries, repeats)
+        return wrapper
+    return decorator
+
+
+class QueryLog:
+    """Queries run while ``record()`` is active, by fingerprint."""
+
+    def __init__(self):
+        self.count = 0
+        self.fingerprints = Counter()
+
+    def execute(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper()`` hook."""
+        self.count += 1
+        self.fingerprints[fingerprint(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.execute))
+            yield self
+
+    def problems(self, queries=None, repeats: int = REPEAT_LIMIT) -> list:
+        """What breaks the budget, as readable lines; empty if nothing."""
+        problems = []
+        if queries is not None and self.count > queries:
+            problems.append(
+                f'{self.count} queries, the budget is {queries}'
+            )
+        for sql, times in self.fingerprints.most_common():
+            if times < repeats:
+                break
+            problems.append(
+                f'{times} runs of the same statement: {sql[:SQL_PREVIEW]}'
+            )
+        return problems
+
+
+def mode() -> str:
+    value = getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+    if value not in MODES:
+        raise ValueError(f'QUERY_BUDGET_MODE must be one of {MODES}')
+    return value
+
+
+def report(where: str, problems: list, action: str):
+    if not problems:
+        return
+    message = f'{where}: ' + '; '.join(problems)
+    if action == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def assert_queries(queries=None, repeats: int = REPEAT_LIMIT):
+    """Fail if the block runs more than ``queries`` queries or N+1."""
+    log = QueryLog()
+    with log.record():
+        yield log
+    report('block', log.problems(queries, repeats), 'raise')
+
+
+class QueryBudgetMiddleware:
+    """Check every request against the budget of its view.
+
+    Views without a declared budget are only checked for N+1 queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        action = mode()
+        if action == 'off':
+            return self.get_response(request)
+        with QueryLog().record() as log:
+            response = self.get_response(request)
+        queries, repeats = getattr(
+            request, 'query_budget', (None, REPEAT_LIMIT)
+        )
+        match = request.resolver_match
+        report(
+            match.view_name if match else request.path,
+            log.problems(queries, repeats),
+            action,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        budget = getattr(view_func, 'query_budget', None)
+        if budget is not None:
+            request.query_budget = budget
@@ -0,0 +1,140 @@
+"""Slow query log.
+
+Every database connection gets an execute wrapper when it is created.
+It times each statement and, for those taking
+``settings.SLOW_QUERY_THRESHOLD`` seconds or longer, writes a JSON line
+to the ``core.slow_queries`` logger: the statement and its fingerprint
+(see ``core.queries``), the URL name of the view being served, the
+project frames of the stack and the duration. Parameters are not
+logged. A fast statement costs two clock reads and a comparison.
+
+``settings.LOGGING`` sends the lines to a rotating file;
+``slow_query_report`` sums them up by fingerprint or by view.
+"""
+import json
+import logging
+import os
+import time
+import traceback
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics
+from .queries import fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Innermost project frames kept of the stack of a slow statement.
+STACK_DEPTH: int = 8
+SQL_LIMIT: int = 2000
+NO_VIEW: str = '<no view>'
+
+
+def threshold():
+    """Seconds from which a statement is logged; ``None`` turns it off."""
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD', None)
+
+
+def _stack() -> list:
+    """Project frames calling the statement, innermost first."""
+    base = str(settings.BASE_DIR) + os.sep
+    frames = []
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename == __file__ or not frame.filename.startswith(base):
+            continue
+        path = os.path.relpath(frame.filename, settings.BASE_DIR)
+        frames.append(f'{path}:{frame.lineno} {frame.name}')
+        if len(frames) == STACK_DEPTH:
+            break
+    return frames
+
+
+def record(sql: str, duration: float, many: bool = False):
+    sample = metrics.current()
+    if sample is not None:
+        sample.slow_queries += 1
+    logger.info(json.dumps({
+        'at': timezone.now().isoformat(),
+        'duration_ms': round(duration * 1000, 3),
+        'view': getattr(sample, 'view', None) or NO_VIEW,
+        'fingerprint': fingerprint(sql),
+        'sql': sql[:SQL_LIMIT],
+        'many': many,
+        'stack': _stack(),
+    }, ensure_ascii=False))
+
+
+def execute(execute, sql, params, many, context):
+    """``connection.execute_wrapper()`` hook logging slow statements."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        limit = threshold()
+        if limit is not None and duration >= limit:
+            record(sql, duration, many)
+
+
+def install(sender, connection, **kwargs):
+    """``connection_created`` receiver adding the wrapper once."""
+    if execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute)
+
+
+def log_files(path) -> list:
+    """``path`` and its rotated copies, oldest first."""
+    files = [path]
+    number = 1
+    while os.path.exists(f'{path}.{number}'):
+        files.append(f'{path}.{number}')
+        number += 1
+    return [name for name in reversed(files) if os.path.exists(name)]
+
+
+def read(paths):
+    """Records of the log files; lines that do not parse are skipped."""
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                    entry['duration_ms'] = float(entry['duration_ms'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                yield entry
+
+
+def aggregate(records, key: str = 'fingerprint') -> list:
+    """Totals per ``key`` value, the largest total time first.
+
+    Each row has the ``count``, ``total_ms``, ``mean_ms`` and ``max_ms``
+    of its records, the ``views`` and ``stacks`` they came from, most
+    frequent first, and the ``sql`` of the slowest one.
+    """
+    groups = defaultdict(lambda: {
+        'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'sql': '',
+        'views': Counter(), 'stacks': Counter(),
+    })
+    for entry in records:
+        row = groups[entry.get(key, '')]
+        duration = entry['duration_ms']
+        row['count'] += 1
+        row['total_ms'] += duration
+        if duration >= row['max_ms']:
+            row['max_ms'] = duration
+            row['sql'] = entry.get('sql', '')
+        row['views'][entry.get('view', NO_VIEW)] += 1
+        stack = entry.get('stack') or []
+        row['stacks'][stack[0] if stack else ''] += 1
+    rows = []
+    for value, row in groups.items():
+        row[key] = value
+        row['mean_ms'] = row['total_ms'] / row['count']
+        row['views'] = row['views'].most_common()
+        row['stacks'] = row['stacks'].most_common()
+        rows.append(row)
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
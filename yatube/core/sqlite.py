@@ -0,0 +1,34 @@
+"""SQLite tuning applied to every new connection.
+
+``configure`` runs ``settings.SQLITE_PRAGMAS`` on each new SQLite
+connection; with ``CONN_MAX_AGE`` that is once per connection rather
+than once per request. The defaults put the database in WAL mode, where
+readers never wait for the writer and the writer never waits for
+readers, and trade ``synchronous=FULL`` for ``NORMAL``: a commit may be
+lost on power failure, never corrupted.
+
+SQLite still has one writer at a time; concurrent writes, such as new
+posts and comments, wait for it up to the ``timeout`` of
+``DATABASES['OPTIONS']``. The wait only covers taking the lock first: a
+transaction that has read and then writes after another one committed
+fails at once with "database is locked". Code that reads before it
+writes takes the lock with its first statement, as ``posts.counters``
+and ``posts.follows`` do.
+"""
+import re
+
+from django.conf import settings
+
+_NAME = re.compile(r'\w+')
+_VALUE = re.compile(r'-?\w+')
+
+
+def configure(sender, connection, **kwargs):
+    """``connection_created`` receiver applying ``SQLITE_PRAGMAS``."""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        if not (_NAME.fullmatch(name) and _VALUE.fullmatch(str(value))):
+            raise ValueError(f'Bad SQLITE_PRAGMAS entry: {name}={value}')
+        # Straight to the driver: not a query of the request.
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,65 @@
+"""Test runs with caches of their own.
+
+``settings.CACHES`` keeps the shared cache in a file; tests clear it and
+fill it with pages of throwaway rows, so every run gets its own copy in
+a temporary directory. ``manage.py test`` does it through
+``DiscoverRunner``, the pytest suite through a fixture.
+
+``DiscoverRunner`` puts the SQLite test database in the same directory
+too. In memory, connections share one page cache and its table locks,
+so tests running requests from several threads would see locking of a
+kind the site never does.
+"""
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner as BaseRunner
+
+
+def caches_in(directory) -> dict:
+    """``settings.CACHES`` with the file-backed caches in ``directory``."""
+    caches = {
+        alias: dict(config) for alias, config in settings.CACHES.items()
+    }
+    for alias, config in caches.items():
+        if config['BACKEND'].endswith('SQLiteCache'):
+            config['LOCATION'] = os.path.join(
+                directory, f'cache-{alias}.sqlite3'
+            )
+    return caches
+
+
+class IsolatedCaches:
+    """Point the caches at a new temporary directory until ``stop()``."""
+
+    def start(self):
+        self.directory = tempfile.mkdtemp(prefix='yatube-test-')
+        self.override = override_settings(CACHES=caches_in(self.directory))
+        self.override.enable()
+
+    def stop(self):
+        self.override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class DiscoverRunner(BaseRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches = IsolatedCaches()
+        self.caches.start()
+
+    def setup_databases(self, **kwargs):
+        # Removed with the directory after the run.
+        for alias, config in settings.DATABASES.items():
+            if config['ENGINE'].endswith('sqlite3'):
+                config.setdefault('TEST', {})['NAME'] = os.path.join(
+                    self.caches.directory, f'db-{alias}.sqlite3'
+                )
+        return super().setup_databases(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches.stop()
+        super().teardown_test_environment(**kwargs)
@@ -1,4 +1,37 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+
+from . import metrics, queries, slow_queries, sqlite
+
+User = get_user_model()
+
+
+def list_users(request):
+    """Reads every user's last login the slow way, one query each."""
+    for user in User.objects.only('pk'):
+        user.last_login
+    return HttpResponse('ok')
+
+
+urlpatterns = [
+    path('n-plus-one/', list_users, name='n_plus_one'),
+    path(
+        'budget/',
+        queries.query_budget(1, repeats=100)(list_users),
+        name='budget',
+    ),
+]
 
 
 class ViewTestClass(TestCase):
@@ -7,3 +40,234 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+
+    def scrape(self):
+        response = self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_protected(self):
+        """Метрики доступны только персоналу и по токену."""
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.assertEqual(
+            self.client.get(
+                '/metrics/', HTTP_AUTHORIZATION='Bearer wrong'
+            ).status_code,
+            403,
+        )
+        staff = User.objects.create_user(username='admin', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    def test_request_recorded_by_url_name(self):
+        """Запрос учитывается под именем своего URL."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            text,
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2',
+            text,
+        )
+        sample = metrics.registry.views['posts:index']
+        self.assertGreater(sample.histograms['queries'].sum, 0)
+        self.assertGreater(sample.histograms['template_time'].sum, 0)
+        self.assertGreater(
+            sample.counters['cache_hits'] + sample.counters['cache_misses'], 0
+        )
+
+    def test_histogram_buckets(self):
+        """Границы корзин включают значение."""
+        histogram = metrics.Histogram((1, 5))
+        for value in (0, 1, 3, 5, 7):
+            histogram.observe(value)
+        self.assertEqual(
+            list(histogram.cumulative()), [(1, 2), (5, 4), ('+Inf', 5)]
+        )
+        self.assertEqual(histogram.sum, 16)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(queries.REPEAT_LIMIT):
+            User.objects.create_user(username=f'user{number}')
+
+    def test_fingerprint(self):
+        """Запросы, различающиеся только параметрами, совпадают."""
+        self.assertEqual(
+            queries.fingerprint(
+                'SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21'
+            ),
+            queries.fingerprint('SELECT * FROM t WHERE id IN (%s) LIMIT 1'),
+        )
+        self.assertNotEqual(
+            queries.fingerprint('SELECT * FROM t WHERE id = %s'),
+            queries.fingerprint('SELECT * FROM u WHERE id = %s'),
+        )
+
+    def test_assert_queries(self):
+        """Помощник для тестов ловит N+1 и превышение бюджета."""
+        with self.assertRaisesMessage(
+            queries.QueryBudgetExceeded, f'{queries.REPEAT_LIMIT} runs'
+        ):
+            with queries.assert_queries():
+                for user in User.objects.only('pk'):
+                    user.last_login
+        with self.assertRaisesMessage(
+            queries.QueryBudgetExceeded, '2 queries, the budget is 1'
+        ):
+            with queries.assert_queries(1):
+                User.objects.count()
+                User.objects.exists()
+        with queries.assert_queries(1) as log:
+            list(User.objects.all())
+        self.assertEqual(log.count, 1)
+
+    @override_settings(QUERY_BUDGET_MODE='raise')
+    def test_middleware_raises(self):
+        """В режиме raise запрос с N+1 или сверх бюджета падает."""
+        with self.assertRaisesMessage(
+            queries.QueryBudgetExceeded, 'n_plus_one: '
+        ):
+            self.client.get('/n-plus-one/')
+        with self.assertRaisesMessage(
+            queries.QueryBudgetExceeded,
+            f'budget: {queries.REPEAT_LIMIT + 1} queries, the budget is 1',
+        ):
+            self.client.get('/budget/')
+
+    @override_settings(QUERY_BUDGET_MODE='log')
+    def test_middleware_logs(self):
+        """В режиме log нарушение записывается в журнал."""
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            response = self.client.get('/n-plus-one/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('runs of the same statement', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_MODE='off')
+    def test_middleware_off(self):
+        """Выключенная проверка ничего не записывает."""
+        # ``assertLogs`` fails when nothing is logged.
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('core.queries', 'WARNING'):
+                self.client.get('/n-plus-one/')
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class SlowQueryTests(TestCase):
+    def setUp(self):
+        slow_queries.install(None, connection)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_slow_query_logged(self):
+        """Медленный запрос записывается с представлением и стеком."""
+        with self.assertLogs('core.slow_queries', 'INFO') as logs:
+            self.client.get('/budget/')
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        listing = [
+            entry for entry in entries if 'auth_user' in entry['sql']
+        ][0]
+        self.assertEqual(listing['view'], 'budget')
+        self.assertEqual(
+            listing['fingerprint'], queries.fingerprint(listing['sql'])
+        )
+        self.assertTrue(listing['stack'][0].startswith('core/tests.py:'))
+        self.assertIn('list_users', listing['stack'][0])
+
+    @override_settings(SLOW_QUERY_THRESHOLD=None)
+    def test_off(self):
+        """Без порога ничего не записывается."""
+        # ``assertLogs`` fails when nothing is logged.
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('core.slow_queries', 'INFO'):
+                self.client.get('/budget/')
+
+    def test_report(self):
+        """Отчёт суммирует журнал и его ротированные копии."""
+        def line(duration, sql, view):
+            return json.dumps({
+                'duration_ms': duration,
+                'fingerprint': queries.fingerprint(sql),
+                'sql': sql,
+                'view': view,
+                'stack': ['posts/views.py:10 index'],
+            }) + '\n'
+
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'slow.log')
+        with open(path, 'w') as file:
+            file.write(line(150, 'SELECT 1 FROM a LIMIT 10', 'posts:index'))
+            file.write('not json\n')
+        with open(path + '.1', 'w') as file:
+            file.write(line(120, 'SELECT 1 FROM b', 'posts:search'))
+            file.write(line(100, 'SELECT 1 FROM a LIMIT 20', 'posts:index'))
+
+        out = StringIO()
+        call_command('slow_query_report', '--file', path, stdout=out)
+        report = out.getvalue()
+        self.assertIn('3 slow statements in 2 groups', report)
+        self.assertLess(
+            report.index('FROM a LIMIT ?'), report.index('FROM b')
+        )
+        self.assertIn('posts/views.py:10 index (2)', report)
+
+        out = StringIO()
+        call_command(
+            'slow_query_report', '--file', path, '--by', 'view', '--json',
+            stdout=out,
+        )
+        rows = json.loads(out.getvalue())
+        self.assertEqual(
+            [(row['view'], row['count'], row['total_ms']) for row in rows],
+            [('posts:index', 2, 250.0), ('posts:search', 1, 120.0)],
+        )
+
+
+class SQLiteTests(TestCase):
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Настройки SQLite применяются к каждому соединению."""
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)
+        self.assertEqual(self.pragma(connection, 'cache_size'), -64 * 1024)
+        self.assertEqual(self.pragma(connection, 'temp_store'), 2)
+        # The test database lives in memory; a file one goes to WAL.
+        copy = connection.copy()
+        copy.settings_dict['NAME'] = os.path.join(
+            tempfile.mkdtemp(), 'db.sqlite3'
+        )
+        try:
+            self.assertEqual(self.pragma(copy, 'journal_mode'), 'wal')
+        finally:
+            copy.close()
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': '0; DROP TABLE x'})
+    def test_bad_pragma(self):
+        """Значение PRAGMA не может содержать произвольный SQL."""
+        with self.assertRaisesMessage(ValueError, 'cache_size'):
+            sqlite.configure(None, connection)
+
+
+class IsolatedCachesTests(TestCase):
+    def test_run_has_own_cache_file(self):
+        """Тесты пишут в собственный файл кеша, а не в общий."""
+        location = settings.CACHES['default']['LOCATION']
+        self.assertIn('yatube-test-', location)
+        self.assertEqual(caches['default']._path, location)
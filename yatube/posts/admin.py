@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import fulltext
 from .models import Comment, Follow, Group, Post
 
 
@@ -16,6 +17,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        words = fulltext.terms(search_term)
+        if not words:
+            return queryset, False
+        return fulltext.get_backend().filter(queryset, words), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,275 @@
+"""JSON endpoints of the posts app.
+
+The feeds reuse the querysets of ``posts.views`` and are paged by
+cursor. Their ``ETag`` and ``Last-Modified`` come from the feed
+generations of ``posts.caching`` and are checked before any post is
+loaded, so revalidating an unchanged feed costs a cache lookup and ends
+in 304 without serializing anything. ``Last-Modified`` has one-second
+resolution; clients should prefer ``If-None-Match``.
+"""
+import hashlib
+
+from django.core.paginator import Paginator
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+from . import caching, directory, timeline
+from .forms import SearchForm
+from .helpers import CURSOR_PARAM, CursorPaginator
+from .models import COMMENT_ORDERING, Comment, Group, Post, User
+from .views import QUANTITY_RECORDS
+
+MAX_LIMIT: int = 100
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'updated': lambda post: post.updated.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comment_count': lambda post: post.comment_count,
+    'url': lambda post: reverse(
+        'posts:post_detail', kwargs={'post_id': post.pk}
+    ),
+}
+
+
+def serialize_post(post, fields=None) -> dict:
+    return {name: POST_FIELDS[name](post) for name in fields or POST_FIELDS}
+
+
+def serialize_comment(comment) -> dict:
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'author': comment.author.username,
+    }
+
+
+def serialize_group(group) -> dict:
+    stats = getattr(group, 'stats', None)
+    last_post_at = stats and stats.last_post_at
+    return {
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+        'post_count': group.post_count,
+        'last_post_at': last_post_at.isoformat() if last_post_at else None,
+        'top_authors': stats.top_authors if stats else [],
+        'url': reverse('posts:group_list', kwargs={'slug': group.slug}),
+    }
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={
+        'ensure_ascii': False, 'separators': (',', ':'),
+    })
+
+
+def error_response(status, **errors):
+    return json_response({'errors': errors}, status=status)
+
+
+def _fields(request):
+    """Sparse fieldset from ``?fields=id,text``; ``None`` means all."""
+    value = request.GET.get('fields')
+    if not value:
+        return None
+    fields = [name for name in value.split(',') if name]
+    unknown = [name for name in fields if name not in POST_FIELDS]
+    if unknown:
+        raise ValueError('Неизвестные поля: ' + ', '.join(unknown))
+    return fields
+
+
+def _limit(request) -> int:
+    try:
+        limit = int(request.GET.get('limit', QUANTITY_RECORDS))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'Ожидается число от 1 до {MAX_LIMIT}')
+    return limit
+
+
+def conditional(request, feeds, build, private=False):
+    """Answer 304 for an unchanged ``feeds`` or the response of ``build``.
+
+    Everything the payload depends on besides the feeds (path, cursor,
+    fieldset, limit) is part of the ``ETag``.
+    """
+    version = caching.feed_version(*feeds)
+    etag = quote_etag(hashlib.md5(
+        f'{version}|{request.get_full_path()}'.encode()
+    ).hexdigest())
+    modified = int(caching.last_modified(*feeds))
+    response = get_conditional_response(
+        request, etag=etag, last_modified=modified
+    )
+    if response is None:
+        response = build()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        patch_cache_control(response, no_cache=True, private=private)
+        if private:
+            patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def _parse(request, **parsers):
+    """Run ``parsers`` on the request; values or a 400 response."""
+    values, errors = {}, {}
+    for name, parse in parsers.items():
+        try:
+            values[name] = parse(request)
+        except ValueError as error:
+            errors[name] = [str(error)]
+    if errors:
+        return None, error_response(400, **errors)
+    return values, None
+
+
+def feed_response(request, queryset, feeds, private=False):
+    params, error = _parse(request, fields=_fields, limit=_limit)
+    if error:
+        return error
+    fields, limit = params['fields'], params['limit']
+
+    def build():
+        page = CursorPaginator(queryset, limit).get_page(
+            request.GET.get(CURSOR_PARAM)
+        )
+        return json_response({
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+            'results': [serialize_post(post, fields) for post in page],
+        })
+
+    return conditional(request, feeds, build, private)
+
+
+def index(request):
+    return feed_response(request, Post.objects.for_feed(), ['index'])
+
+
+def groups(request):
+    params, error = _parse(request, limit=_limit)
+    if error:
+        return error
+
+    def build():
+        page = CursorPaginator(
+            directory.groups(), params['limit'], directory.ORDERING
+        ).get_page(request.GET.get(CURSOR_PARAM))
+        return json_response({
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+            'results': [serialize_group(group) for group in page],
+        })
+
+    # Every post change bumps the index feed and every group change all
+    # feeds, so the index version covers the directory.
+    return conditional(request, ['index'], build)
+
+
+def group_posts(request, slug):
+    group = Group.objects.only('pk').filter(slug=slug).first()
+    if group is None:
+        return error_response(404, group=['Группа не найдена'])
+    return feed_response(
+        request, group.posts.for_feed(), [f'group:{group.pk}']
+    )
+
+
+def profile(request, username):
+    author = User.objects.only('pk').filter(username=username).first()
+    if author is None:
+        return error_response(404, author=['Автор не найден'])
+    return feed_response(
+        request, author.posts.for_feed(), [f'profile:{author.pk}']
+    )
+
+
+def follow(request):
+    if not request.user.is_authenticated:
+        return error_response(401, user=['Требуется авторизация'])
+    # The follow feed is bumped on follows and with the profiles fanned
+    # out to it; authors read on demand bring their own generations.
+    hot = timeline.hot_authors_followed_by(request.user).order_by(
+        'author_id'
+    ).values_list('author_id', flat=True)
+    return feed_response(
+        request,
+        timeline.feed_for(request.user).for_feed(),
+        [f'follow:{request.user.pk}', *(f'profile:{pk}' for pk in hot)],
+        private=True,
+    )
+
+
+def post_detail(request, post_id):
+    author_id = Post.objects.filter(
+        pk=post_id
+    ).values_list('author_id', flat=True).first()
+    if author_id is None:
+        return error_response(404, post=['Публикация не найдена'])
+    params, error = _parse(request, fields=_fields)
+    if error:
+        return error
+    fields = params['fields']
+
+    def build():
+        post = Post.objects.for_feed().filter(pk=post_id).first()
+        if post is None:
+            return error_response(404, post=['Публикация не найдена'])
+        return json_response(serialize_post(post, fields))
+
+    return conditional(request, [f'profile:{author_id}'], build)
+
+
+def post_comments(request, post_id):
+    # Comments bump the feeds of their post, the author's profile too.
+    author_id = Post.objects.filter(
+        pk=post_id
+    ).values_list('author_id', flat=True).first()
+    if author_id is None:
+        return error_response(404, post=['Публикация не найдена'])
+    params, error = _parse(request, limit=_limit)
+    if error:
+        return error
+
+    def build():
+        page = CursorPaginator(
+            Comment.objects.filter(post_id=post_id).for_list(),
+            params['limit'],
+            COMMENT_ORDERING,
+        ).get_page(request.GET.get(CURSOR_PARAM))
+        return json_response({
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+            'results': [serialize_comment(comment) for comment in page],
+        })
+
+    return conditional(request, [f'profile:{author_id}'], build)
+
+
+def search(request):
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return json_response({'errors': form.errors}, status=400)
+    page = Paginator(form.results(), QUANTITY_RECORDS).get_page(
+        request.GET.get('page')
+    )
+    return json_response({
+        'count': page.paginator.count,
+        'num_pages': page.paginator.num_pages,
+        'page': page.number,
+        'results': [serialize_post(post) for post in page],
+    })
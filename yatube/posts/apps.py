@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import fulltext, signals  # noqa: F401
+        post_migrate.connect(fulltext.ensure_triggers, sender=self)
@@ -0,0 +1,292 @@
+"""Helpers shared by the ``bench_*`` management commands.
+
+``SCENARIOS`` builds a request to every benchmarked route from a
+``Sampler``, which draws popular posts, authors and groups of
+``BenchData`` the way real traffic does.
+"""
+import contextlib
+import os
+import statistics
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.testing import caches_in
+
+from . import fake_data
+from .helpers import CURSOR_PARAM, CursorPaginator
+from .models import Follow, Group, Post, User
+
+# Most popular rows the requests are drawn from.
+SAMPLE_SIZE: int = 10000
+VIEWERS: int = 20
+# Authors followed and unfollowed by one ``follow_bulk`` request, each.
+BULK_AUTHORS: int = 3
+
+
+@contextlib.contextmanager
+def scratch_database(verbosity: int = 0, name=None):
+    """Run the block against a throwaway test database.
+
+    Benchmarks generate a lot of rows; they must never touch real data.
+    ``name`` puts the database in that file instead of the default
+    in-memory one, whose table locks serialize concurrent requests.
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings.get('NAME')
+    if name is not None:
+        test_settings['NAME'] = name
+    connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        test_settings['NAME'] = old_test_name
+
+
+def isolated_storage(directory):
+    """Keep generated images and cached pages out of the real ones."""
+    return override_settings(
+        MEDIA_ROOT=os.path.join(directory, 'media'),
+        CACHES=caches_in(directory),
+    )
+
+
+def measure(func, repeat: int) -> list:
+    """Call ``func`` ``repeat`` times, return durations in seconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def percentile(samples, fraction: float) -> float:
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples) -> dict:
+    """p50/p95/p99 and mean of ``samples`` in milliseconds."""
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.mean(samples) * 1000, 3) if samples
+        else 0.0,
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+
+@dataclass
+class Scenario:
+    """How to build a request to one route from a ``Sampler``."""
+
+    build: object
+    login: bool = False
+    writes: bool = False
+
+
+def _get(name, params=None, **kwargs):
+    return 'GET', reverse(name, kwargs=kwargs), params or {}
+
+
+def _post(name, data, **kwargs):
+    return 'POST', reverse(name, kwargs=kwargs), data
+
+
+SCENARIOS = {
+    'posts:index': Scenario(
+        lambda s: _get('posts:index', {'page': s.page()})
+    ),
+    'posts:trending': Scenario(
+        lambda s: _get('posts:trending', {'page': s.page()})
+    ),
+    'posts:group_directory': Scenario(
+        lambda s: _get('posts:group_directory')
+    ),
+    'posts:group_list': Scenario(
+        lambda s: _get('posts:group_list', slug=s.group())
+    ),
+    'posts:profile': Scenario(
+        lambda s: _get('posts:profile', username=s.author())
+    ),
+    'posts:post_detail': Scenario(
+        lambda s: _get('posts:post_detail', post_id=s.post())
+    ),
+    'posts:post_comments': Scenario(
+        lambda s: _get('posts:post_comments', post_id=s.post())
+    ),
+    'posts:post_edit': Scenario(
+        lambda s: _get('posts:post_edit', post_id=s.own_post()),
+        login=True,
+    ),
+    'posts:post_create': Scenario(
+        lambda s: _post('posts:post_create', {'text': s.text()}),
+        login=True, writes=True,
+    ),
+    'posts:add_comment': Scenario(
+        lambda s: _post(
+            'posts:add_comment', {'text': s.text()}, post_id=s.post()
+        ),
+        login=True, writes=True,
+    ),
+    'posts:follow_index': Scenario(
+        lambda s: _get('posts:follow_index', {'page': s.page()}),
+        login=True,
+    ),
+    'posts:profile_follow': Scenario(
+        lambda s: _get('posts:profile_follow', username=s.author()),
+        login=True, writes=True,
+    ),
+    'posts:profile_unfollow': Scenario(
+        lambda s: _get('posts:profile_unfollow', username=s.author()),
+        login=True, writes=True,
+    ),
+    'posts:follow_bulk': Scenario(
+        lambda s: _post('posts:follow_bulk', {
+            'follow': [s.author_id() for _ in range(BULK_AUTHORS)],
+            'unfollow': [s.author_id() for _ in range(BULK_AUTHORS)],
+        }),
+        login=True, writes=True,
+    ),
+    'posts:follow_suggestions': Scenario(
+        lambda s: _get('posts:follow_suggestions'), login=True
+    ),
+    'posts:followers': Scenario(
+        lambda s: _get(
+            'posts:followers', {CURSOR_PARAM: s.follow_cursor()},
+            username=s.author(),
+        )
+    ),
+    'posts:following': Scenario(
+        lambda s: _get(
+            'posts:following', {CURSOR_PARAM: s.follow_cursor()},
+            username=s.author(),
+        )
+    ),
+    'posts:search': Scenario(
+        lambda s: _get('posts:search', {'q': s.word()})
+    ),
+    'posts:api_search': Scenario(
+        lambda s: _get('posts:api_search', {'q': s.word()})
+    ),
+    'posts:api_index': Scenario(lambda s: _get('posts:api_index')),
+    'posts:api_post_detail': Scenario(
+        lambda s: _get('posts:api_post_detail', post_id=s.post())
+    ),
+    'posts:api_post_comments': Scenario(
+        lambda s: _get('posts:api_post_comments', post_id=s.post())
+    ),
+    'posts:api_group_directory': Scenario(
+        lambda s: _get('posts:api_group_directory')
+    ),
+    'posts:api_group_list': Scenario(
+        lambda s: _get('posts:api_group_list', slug=s.group())
+    ),
+    'posts:api_profile': Scenario(
+        lambda s: _get('posts:api_profile', username=s.author())
+    ),
+    'posts:api_follow_index': Scenario(
+        lambda s: _get('posts:api_follow_index'), login=True
+    ),
+}
+
+
+class BenchData:
+    """The most popular posts, authors and groups, most popular first."""
+
+    def __init__(self):
+        self.posts = list(Post.objects.order_by(
+            '-comment_count', '-pk'
+        ).values_list('pk', flat=True)[:SAMPLE_SIZE])
+        authors = list(User.objects.filter(
+            stats__isnull=False
+        ).order_by('-stats__follower_count', 'pk').values_list(
+            'pk', 'username'
+        )[:SAMPLE_SIZE])
+        self.author_ids = [pk for pk, _ in authors]
+        self.authors = [username for _, username in authors]
+        # Follow lists seek by follow id: the first page, then from
+        # every tenth of the ids down.
+        newest = Follow.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        paginator = CursorPaginator(Follow.objects.all(), 1, ('-id',))
+        self.follow_cursors = [''] + [
+            paginator.encode_cursor(Follow(pk=newest * step // 10))
+            for step in range(9, 0, -1)
+        ]
+        self.groups = list(Group.objects.order_by(
+            '-post_count', 'pk'
+        ).values_list('slug', flat=True)[:SAMPLE_SIZE])
+        # Logged-in requests come from prolific authors, so they have
+        # posts to edit and a follow feed to read.
+        self.viewers = []
+        for user_id in User.objects.filter(
+            stats__post_count__gt=0
+        ).order_by('-stats__post_count').values_list(
+            'pk', flat=True
+        )[:VIEWERS]:
+            self.viewers.append((user_id, list(Post.objects.filter(
+                author_id=user_id
+            ).values_list('pk', flat=True)[:100])))
+        if not (self.posts and self.authors and self.viewers):
+            raise CommandError(
+                'No data to request: run generate_fake_data first.'
+            )
+
+
+class Sampler:
+    """Popularity-weighted request parameters for one worker."""
+
+    def __init__(self, data, rng, alpha):
+        self.rng = rng
+        self.post = fake_data.Zipf(data.posts, alpha, rng)
+        self.author = fake_data.Zipf(data.authors, alpha, rng)
+        self.author_id = fake_data.Zipf(data.author_ids, alpha, rng)
+        self.group = fake_data.Zipf(data.groups or [''], alpha, rng)
+        self.word = fake_data.Zipf(fake_data.WORDS, alpha, rng)
+        self.page = fake_data.Zipf(range(1, 11), alpha, rng)
+        self.follow_cursor = fake_data.Zipf(data.follow_cursors, alpha, rng)
+        self.viewer_id, self.own_posts = rng.choice(data.viewers)
+
+    def own_post(self):
+        return self.rng.choice(self.own_posts)
+
+    def text(self):
+        return fake_data.text(self.rng, self.word)
+
+
+def login_cookies(user_id):
+    """A CSRF token and the ``Cookie`` headers to send it with, by
+    whether the request is made logged in as ``user_id``.
+
+    The session is created in the database this command uses.
+    """
+    client = Client()
+    client.force_login(User.objects.get(pk=user_id))
+    session = client.cookies[settings.SESSION_COOKIE_NAME].value
+    request = HttpRequest()
+    csrf_token = get_token(request)
+    csrf_cookie = request.META['CSRF_COOKIE']
+    return csrf_token, {
+        False: f'{settings.CSRF_COOKIE_NAME}={csrf_cookie}',
+        True: f'{settings.CSRF_COOKIE_NAME}={csrf_cookie}; '
+              f'{settings.SESSION_COOKIE_NAME}={session}',
+    }
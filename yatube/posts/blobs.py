@@ -0,0 +1,146 @@
+"""Reference counts of stored images.
+
+Posts share image files (see ``posts.storage``), so a file may only go
+when the last post using it does. Signals move ``ImageBlob.refs`` with
+``F()`` updates as posts gain, change and lose images; once a count
+drops to zero, the file and its thumbnails are deleted after commit,
+unless a post took the name again meanwhile. A file only the posts know
+gets its row back when another post takes it; files the table does not
+know are never deleted here.
+
+``dedupe`` brings files stored before, or around, the hashing storage
+into the same shape: one file per content, every post pointing to it.
+"""
+import posixpath
+from collections import Counter, defaultdict
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from . import caching, thumbnails
+from .models import ImageBlob, Post
+from .storage import content_hash
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def acquire(name):
+    """Add a reference to ``name``, recreating a row released meanwhile.
+
+    The storage may hand out a stored name while its last post goes in
+    another request; the row is then gone and is recounted from posts.
+    """
+    if not name:
+        return
+    if ImageBlob.objects.filter(name=name).update(refs=F('refs') + 1):
+        return
+    try:
+        if not storage().exists(name):
+            return
+    except SuspiciousFileOperation:
+        # Not a name of the storage: a path set by hand, left alone.
+        return
+    with storage().open(name) as content:
+        sha256 = content_hash(content)
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(
+                name=name,
+                sha256=sha256,
+                size=storage().size(name),
+                refs=Post.objects.filter(image=name).count(),
+            )
+    except IntegrityError:
+        ImageBlob.objects.filter(name=name).update(refs=F('refs') + 1)
+
+
+def release(name):
+    """Drop a reference to ``name``; the last one deletes the file."""
+    if not name:
+        return
+    with transaction.atomic():
+        ImageBlob.objects.filter(name=name, refs__gt=0).update(
+            refs=F('refs') - 1
+        )
+        deleted, _ = ImageBlob.objects.filter(name=name, refs=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: delete_unused(name))
+
+
+def delete_unused(name):
+    """Delete ``name`` unless a post has taken it since its release."""
+    if ImageBlob.objects.filter(name=name).exists():
+        return
+    if Post.objects.filter(image=name).exists():
+        return
+    delete_file(name)
+
+
+def delete_file(name):
+    """Delete ``name`` and every configured thumbnail of it."""
+    thumbnails.delete_all(name)
+    storage().delete(name)
+
+
+def _stored_names(directory):
+    """Every file under ``directory`` of the image storage."""
+    try:
+        directories, files = storage().listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in sorted(files):
+        yield posixpath.join(directory, name)
+    for child in sorted(directories):
+        yield from _stored_names(posixpath.join(directory, child))
+
+
+def dedupe(dry_run=False, prune=False) -> Counter:
+    """Merge identical image files and recount their references.
+
+    Of each set of identical files the most used one stays; posts using
+    the others are pointed to it and the others go with their
+    thumbnails. ``prune`` also deletes files no post uses. Returns the
+    number of ``files`` seen, ``duplicates`` and ``pruned`` files
+    deleted, their ``bytes`` and the ``posts`` moved to another file.
+    """
+    stats = Counter()
+    refs = dict(Post.objects.exclude(image='').order_by().values(
+        'image'
+    ).annotate(total=Count('pk')).values_list('image', 'total'))
+    by_hash = defaultdict(list)
+    directory = Post._meta.get_field('image').upload_to.strip('/')
+    for name in _stored_names(directory):
+        with storage().open(name) as content:
+            by_hash[content_hash(content)].append(name)
+        stats['files'] += 1
+    for sha256, names in by_hash.items():
+        names.sort(key=lambda name: (-refs.get(name, 0), name))
+        keep, duplicates = names[0], names[1:]
+        size = storage().size(keep)
+        total = sum(refs.get(name, 0) for name in names)
+        stats['duplicates'] += len(duplicates)
+        stats['bytes'] += size * len(duplicates)
+        stats['posts'] += total - refs.get(keep, 0)
+        unused = prune and not total
+        if unused:
+            stats['pruned'] += 1
+            stats['bytes'] += size
+        if dry_run:
+            continue
+        with transaction.atomic():
+            Post.objects.filter(image__in=duplicates).update(image=keep)
+            ImageBlob.objects.filter(name__in=duplicates).delete()
+            if unused:
+                ImageBlob.objects.filter(name=keep).delete()
+            else:
+                ImageBlob.objects.update_or_create(name=keep, defaults={
+                    'sha256': sha256, 'size': size, 'refs': total,
+                })
+        for name in duplicates + ([keep] if unused else []):
+            delete_file(name)
+    if stats['posts'] and not dry_run:
+        caching.bump(caching.EVERY_FEED)
+    return stats
@@ -0,0 +1,316 @@
+"""Cache backends with hit/miss metrics.
+
+``SQLiteCache`` keeps entries in a SQLite file, so every worker process
+on the host shares one cache and sees the same generation counters.
+It needs no outside service. Entries past ``MAX_ENTRIES`` or
+``MAX_SIZE`` bytes are evicted least recently used first.
+``MeteredLocMemCache`` is the per-process ``LocMemCache`` with the same
+metrics, for comparison.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+MAX_SIZE: int = 64 * 1024 * 1024
+# Hits refresh the LRU clock of an entry at most once per this many
+# seconds, so hot keys do not turn every read into a write.
+ACCESS_RESOLUTION: float = 1.0
+# Keys per statement in get_many(), below SQLite's variable limit.
+CHUNK_SIZE: int = 500
+
+# ``value`` goes last so scans of the other columns never read the
+# overflow pages of large values. ``cache_totals`` is kept up to date by
+# triggers, so checking the limits on every write is a single-row read.
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entries_accessed
+    ON cache_entries (accessed);
+CREATE TABLE IF NOT EXISTS cache_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_totals VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_entries_inserted
+AFTER INSERT ON cache_entries BEGIN
+    UPDATE cache_totals SET entries = entries + 1, size = size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_updated
+AFTER UPDATE OF size ON cache_entries BEGIN
+    UPDATE cache_totals SET size = size - old.size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_deleted
+AFTER DELETE ON cache_entries BEGIN
+    UPDATE cache_totals SET entries = entries - 1, size = size - old.size;
+END;
+'''
+
+# Upsert rather than INSERT OR REPLACE: REPLACE deletes the old row
+# without firing the delete trigger.
+UPSERT = (
+    'INSERT INTO cache_entries VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (key) DO UPDATE SET size = excluded.size, '
+    'expires = excluded.expires, accessed = excluded.accessed, '
+    'value = excluded.value'
+)
+
+_MISSING = object()
+
+
+class CacheMetricsMixin:
+    """Hit and miss counters of this process."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.reset_stats()
+
+    def _record(self, hits=0, misses=0):
+        with self._metrics_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class MeteredLocMemCache(CacheMetricsMixin, LocMemCache):
+    """``LocMemCache`` that counts hits and misses."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            self._record(misses=1)
+            return default
+        self._record(hits=1)
+        return value
+
+
+class SQLiteCache(CacheMetricsMixin, BaseCache):
+    """Cache shared by every process through a SQLite database file.
+
+    ``LOCATION`` is the file path. Besides the standard options it
+    takes ``MAX_SIZE``, the limit of the pickled values in bytes. When
+    a limit is exceeded the least recently used entries are evicted
+    down to ``1 - 1 / CULL_FREQUENCY`` of it.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS') or {}
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', MAX_SIZE))
+        self._local = threading.local()
+        self.evictions = 0
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT expires, accessed, value FROM cache_entries '
+            'WHERE key = ?', (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (row[0] is not None and row[0] <= now):
+            self._record(misses=1)
+            return default
+        if now - row[1] > ACCESS_RESOLUTION:
+            connection.execute(
+                'UPDATE cache_entries SET accessed = ? WHERE key = ?',
+                (now, key),
+            )
+        self._record(hits=1)
+        return pickle.loads(row[2])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        connection = self._connection()
+        now = time.time()
+        found, touched = {}, []
+        names = list(keys)
+        for start in range(0, len(names), CHUNK_SIZE):
+            chunk = names[start:start + CHUNK_SIZE]
+            rows = connection.execute(
+                'SELECT key, expires, accessed, value FROM cache_entries '
+                'WHERE key IN ({})'.format(', '.join('?' * len(chunk))),
+                chunk,
+            )
+            for key, expires, accessed, value in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[keys[key]] = pickle.loads(value)
+                if now - accessed > ACCESS_RESOLUTION:
+                    touched.append((now, key))
+        if touched:
+            connection.executemany(
+                'UPDATE cache_entries SET accessed = ? WHERE key = ?',
+                touched,
+            )
+        self._record(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache_entries WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone() is not None
+
+    def _row(self, key, value, timeout, now):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return key, len(blob), self.get_backend_timeout(timeout), now, blob
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        connection.execute(UPSERT, self._row(key, value, timeout, time.time()))
+        self._cull(connection)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = [
+            self._row(self._key(key, version), value, timeout, now)
+            for key, value in data.items()
+        ]
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(UPSERT, rows)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self._cull(connection)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        connection = self._connection()
+        # Only an expired entry may be overwritten, in one statement, so
+        # concurrent add() calls from several processes have one winner.
+        cursor = connection.execute(
+            UPSERT + ' WHERE cache_entries.expires IS NOT NULL '
+            'AND cache_entries.expires <= ?',
+            (*self._row(key, value, timeout, now), now),
+        )
+        if cursor.rowcount:
+            self._cull(connection)
+        return bool(cursor.rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache_entries WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)', (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache_entries SET size = ?, value = ? WHERE key = ?',
+                (len(blob), blob, key),
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._connection().execute(
+            'UPDATE cache_entries SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return bool(cursor.rowcount)
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        cursor = self._connection().execute(
+            'DELETE FROM cache_entries WHERE key = ?', (key,)
+        )
+        return bool(cursor.rowcount)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entries')
+
+    def _totals(self, connection):
+        return connection.execute(
+            'SELECT entries, size FROM cache_totals'
+        ).fetchone()
+
+    def _cull(self, connection):
+        entries, size = self._totals(connection)
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        connection.execute(
+            'DELETE FROM cache_entries WHERE expires <= ?', (time.time(),)
+        )
+        keep = 1 - 1 / self._cull_frequency if self._cull_frequency else 0
+        cursor = connection.execute(
+            'DELETE FROM cache_entries WHERE key IN ('
+            ' SELECT key FROM ('
+            '  SELECT key,'
+            '   ROW_NUMBER() OVER recent AS position,'
+            '   SUM(size) OVER recent AS kept'
+            '  FROM cache_entries'
+            '  WINDOW recent AS (ORDER BY accessed DESC, key)'
+            ' ) WHERE position > ? OR kept > ?'
+            ')',
+            (int(self._max_entries * keep), int(self._max_size * keep)),
+        )
+        self.evictions += cursor.rowcount
+
+    def stats(self) -> dict:
+        entries, size = self._totals(self._connection())
+        return {
+            **super().stats(),
+            'entries': entries,
+            'size': size,
+            'evictions': self.evictions,
+        }
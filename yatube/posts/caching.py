@@ -0,0 +1,196 @@
+"""Generation-based invalidation for feed caches.
+
+Every feed (``index``, ``group:<id>``, ``profile:<author id>``) has a
+generation counter in the cache. Cached renders are keyed by the current
+generation, so bumping the counter on a relevant write invalidates all
+of them at once, without knowing their keys and without a short TTL.
+
+The follow feed of a user, ``follow:<user id>``, is bumped when the user
+follows or unfollows and along with the profile of every followed
+author whose posts are fanned out to it (see ``posts.timeline``).
+
+Everything goes through the cache alias named by ``POSTS_CACHE_ALIAS``;
+it must be shared by all worker processes for invalidation to reach
+them (see ``posts.cache_backends``).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from . import timeline
+from .helpers import CURSOR_PARAM, use_cursor_pagination
+
+FEED_CACHE_TIMEOUT: int = 60 * 15
+CACHE_ALIAS: str = 'default'
+EVERY_FEED: str = 'all'
+
+
+def cache_alias() -> str:
+    return getattr(settings, 'POSTS_CACHE_ALIAS', CACHE_ALIAS)
+
+
+def get_cache():
+    """The cache backend of the posts app."""
+    return caches[cache_alias()]
+
+
+def feed_cache_timeout() -> int:
+    return getattr(settings, 'POSTS_FEED_CACHE_TIMEOUT', FEED_CACHE_TIMEOUT)
+
+
+def _key(feed: str) -> str:
+    return f'posts:generation:{feed}'
+
+
+def generations(*feeds) -> dict:
+    """Current generations of ``feeds``; missing ones are started."""
+    keys = {_key(feed): feed for feed in feeds}
+    cache = get_cache()
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # Start from the clock, not from 1, so renders cached under an
+        # evicted counter can never be served again.
+        cache.add(key, time.time_ns(), None)
+        found[key] = cache.get(key)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def _modified_key(feed: str) -> str:
+    return f'posts:modified:{feed}'
+
+
+def follow_feeds(feeds) -> set:
+    """Follow feeds showing the posts of the profiles among ``feeds``."""
+    author_ids = [
+        int(feed.split(':')[1]) for feed in feeds
+        if feed.startswith('profile:')
+    ]
+    if not author_ids:
+        return set()
+    return {
+        f'follow:{user_id}'
+        for user_id in timeline.fanned_out_followers(author_ids)
+    }
+
+
+def _increment(feeds, followers=()):
+    cache = get_cache()
+    for feed in feeds:
+        try:
+            cache.incr(_key(feed))
+        except ValueError:
+            cache.add(_key(feed), time.time_ns(), None)
+    # Up to the fan-out limit of them: one write moves all to the clock.
+    stamp = time.time_ns()
+    cache.set_many(dict.fromkeys(map(_key, followers), stamp), None)
+    cache.set_many(dict.fromkeys(
+        map(_modified_key, (*feeds, *followers)), time.time()
+    ), None)
+
+
+def bump(*feeds):
+    """Invalidate everything cached for ``feeds``.
+
+    Bumped once right away for the writer's own next read and once more
+    after commit, so readers that rendered the old rows while the
+    transaction was open do not keep them cached. The follow feeds of
+    the followers of profiles in ``feeds`` go with them.
+    """
+    followers = follow_feeds(feeds) - set(feeds)
+    _increment(feeds, followers)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _increment(feeds, followers))
+
+
+def feed_version(*feeds) -> str:
+    """Cache key part that changes whenever any of ``feeds`` changes."""
+    current = generations(EVERY_FEED, *feeds)
+    return '.'.join(str(current[feed]) for feed in (EVERY_FEED, *feeds))
+
+
+def last_modified(*feeds) -> float:
+    """Unix time of the last change to any of ``feeds``.
+
+    Like a generation, a stamp lost to eviction restarts from the clock:
+    later than the real change, so clients refetch once instead of
+    keeping a stale copy.
+    """
+    keys = [_modified_key(feed) for feed in (EVERY_FEED, *feeds)]
+    cache = get_cache()
+    found = cache.get_many(keys)
+    now = time.time()
+    for key in set(keys) - found.keys():
+        cache.add(key, now, None)
+        found[key] = cache.get(key, now)
+    return max(found.values())
+
+
+def feed_context(request, version: str) -> dict:
+    """Template context for a ``{% cache %}``-wrapped post list.
+
+    Only the pagination parameters are part of the key, so arbitrary
+    query strings can not flood the cache with copies of a page.
+    """
+    page = request.GET.get('page', '')
+    cursor = request.GET.get(CURSOR_PARAM)
+    position = f'c{cursor}' if use_cursor_pagination(request) else f'p{page}'
+    return {
+        'feed_cache_alias': cache_alias(),
+        'feed_cache_timeout': feed_cache_timeout(),
+        'feed_cache_key': f'{version}:{position}',
+    }
+
+
+def card_version() -> int:
+    """Generation shared by every card: bumped when a group changes."""
+    return generations(EVERY_FEED)[EVERY_FEED]
+
+
+def card_key(post, variant: str, version: int) -> str:
+    """Key of a rendered post card.
+
+    A card changes when the post is edited (``updated``), when it gets
+    comments, or when any group is renamed (``version``).
+    """
+    return 'posts:card:{}:{}:{}:{}:{}'.format(
+        post.pk,
+        post.updated.timestamp() if post.updated else '',
+        post.comment_count,
+        variant,
+        version,
+    )
+
+
+def render_card(post, variant: str, version: int, render) -> str:
+    """Cached ``render()`` of the card of ``post``.
+
+    ``render`` returns ``(html, complete)``; incomplete cards (e.g. with
+    a thumbnail still being rendered) are not cached.
+    """
+    key = card_key(post, variant, version)
+    cache = get_cache()
+    html = cache.get(key)
+    if html is None:
+        html, complete = render()
+        if complete:
+            cache.set(key, html, feed_cache_timeout())
+    return html
+
+
+def remember(key: str, default):
+    """``cache.get_or_set`` with the feed timeout."""
+    return get_cache().get_or_set(key, default, feed_cache_timeout())
+
+
+def post_feeds(post, author_id=None, group_id=None):
+    """Feeds that show ``post`` now or showed it before a move."""
+    feeds = {'index', f'profile:{post.author_id}'}
+    if post.group_id is not None:
+        feeds.add(f'group:{post.group_id}')
+    if author_id is not None:
+        feeds.add(f'profile:{author_id}')
+    if group_id is not None:
+        feeds.add(f'group:{group_id}')
+    return feeds
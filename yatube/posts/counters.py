@@ -0,0 +1,213 @@
+"""Denormalized counters.
+
+Posts per author, per group and per author in a group, comments per
+post, followers per author and posts per stored image are stored next
+to the rows they describe and moved with ``F()`` updates from signals,
+so pages read them instead of running ``COUNT(*)``. ``rebuild``
+recomputes everything from scratch.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import (AuthorStats, Comment, Follow, Group, GroupAuthorStats,
+                     ImageBlob, Post, User)
+
+BATCH_SIZE: int = 300
+
+
+def _shift(queryset, field: str, delta: int) -> int:
+    value = F(field) + delta
+    if delta < 0:
+        value = Greatest(value, 0)
+    return queryset.update(**{field: value})
+
+
+def _shift_row(model, field: str, delta: int, **lookup):
+    """Shift ``field`` of the row at ``lookup``, creating it if needed."""
+    rows = model.objects.filter(**lookup)
+    if _shift(rows, field, delta) or delta < 0:
+        return
+    _, created = model.objects.get_or_create(**lookup, defaults={field: delta})
+    if not created:
+        _shift(rows, field, delta)
+
+
+def _shift_author(user_id, field: str, delta: int):
+    _shift_row(AuthorStats, field, delta, user_id=user_id)
+
+
+def _shift_authors(deltas: Counter, field: str):
+    """Shift ``field`` of many authors, a few queries per distinct delta."""
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        by_delta[delta].append(user_id)
+    with transaction.atomic():
+        for delta, user_ids in by_delta.items():
+            # The ``UPDATE`` comes first and takes the write lock, so no
+            # row appears between it and the lookup of the missing ones.
+            stats = AuthorStats.objects.filter(user_id__in=user_ids)
+            _shift(stats, field, delta)
+            if delta < 0:
+                continue
+            missing = set(user_ids) - set(
+                stats.values_list('user_id', flat=True)
+            )
+            AuthorStats.objects.bulk_create(
+                [
+                    AuthorStats(user_id=user_id, **{field: delta})
+                    for user_id in missing
+                ],
+                batch_size=BATCH_SIZE,
+            )
+
+
+def _shift_group(group_id, delta: int):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), 'post_count', delta)
+
+
+def _shift_group_author(group_id, author_id, delta: int):
+    if group_id is not None:
+        _shift_row(
+            GroupAuthorStats, 'post_count', delta,
+            group_id=group_id, author_id=author_id,
+        )
+
+
+def post_added(post):
+    _shift_author(post.author_id, 'post_count', 1)
+    _shift_group(post.group_id, 1)
+    _shift_group_author(post.group_id, post.author_id, 1)
+
+
+def post_removed(post):
+    _shift_author(post.author_id, 'post_count', -1)
+    _shift_group(post.group_id, -1)
+    _shift_group_author(post.group_id, post.author_id, -1)
+
+
+def posts_bulk_added(posts):
+    authors = Counter(post.author_id for post in posts)
+    groups = Counter(post.group_id for post in posts)
+    group_authors = Counter((post.group_id, post.author_id) for post in posts)
+    _shift_authors(authors, 'post_count')
+    for group_id, total in groups.items():
+        _shift_group(group_id, total)
+    for (group_id, author_id), total in group_authors.items():
+        _shift_group_author(group_id, author_id, total)
+
+
+def post_moved(post, old_author_id, old_group_id):
+    if old_author_id != post.author_id:
+        _shift_author(old_author_id, 'post_count', -1)
+        _shift_author(post.author_id, 'post_count', 1)
+    if old_group_id != post.group_id:
+        _shift_group(old_group_id, -1)
+        _shift_group(post.group_id, 1)
+    if (old_group_id, old_author_id) != (post.group_id, post.author_id):
+        _shift_group_author(old_group_id, old_author_id, -1)
+        _shift_group_author(post.group_id, post.author_id, 1)
+
+
+def comment_added(comment):
+    if comment.post_id is not None:
+        _shift(
+            Post.objects.filter(pk=comment.post_id), 'comment_count', 1
+        )
+
+
+def comment_removed(comment):
+    if comment.post_id is not None:
+        _shift(
+            Post.objects.filter(pk=comment.post_id), 'comment_count', -1
+        )
+
+
+def follow_added(follow):
+    _shift_author(follow.author_id, 'follower_count', 1)
+
+
+def follow_removed(follow):
+    _shift_author(follow.author_id, 'follower_count', -1)
+
+
+def follows_bulk_added(author_ids):
+    """A new follower for each of ``author_ids``."""
+    _shift_authors(Counter(author_ids), 'follower_count')
+
+
+def follows_bulk_removed(author_ids):
+    _shift_authors(
+        Counter({author_id: -1 for author_id in author_ids}),
+        'follower_count',
+    )
+
+
+def posts_of(author) -> int:
+    """Post count of ``author`` without touching ``Post``."""
+    try:
+        return author.stats.post_count
+    except AuthorStats.DoesNotExist:
+        return 0
+
+
+def followers_of(author) -> int:
+    try:
+        return author.stats.follower_count
+    except AuthorStats.DoesNotExist:
+        return 0
+
+
+def _count(queryset, field: str, key: str = 'pk'):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef(key)}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute every counter from the source tables."""
+    Group.objects.update(post_count=_count(Post.objects.all(), 'group'))
+    Post.objects.update(comment_count=_count(Comment.objects.all(), 'post'))
+    ImageBlob.objects.update(
+        refs=_count(Post.objects.all(), 'image', key='name')
+    )
+    authors = User.objects.annotate(
+        post_total=_count(Post.objects.all(), 'author'),
+        follower_total=_count(Follow.objects.all(), 'author'),
+    ).filter(Q(post_total__gt=0) | Q(follower_total__gt=0))
+    GroupAuthorStats.objects.all().delete()
+    GroupAuthorStats.objects.bulk_create(
+        [
+            GroupAuthorStats(
+                group_id=group_id, author_id=author_id, post_count=total
+            )
+            for group_id, author_id, total in Post.objects.exclude(
+                group=None
+            ).order_by().values('group', 'author').annotate(
+                total=Count('pk')
+            ).values_list('group', 'author', 'total').iterator()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    AuthorStats.objects.all().delete()
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(
+                user_id=user_id, post_count=posts, follower_count=followers
+            )
+            for user_id, posts, followers in authors.values_list(
+                'pk', 'post_total', 'follower_total'
+            ).iterator()
+        ],
+        batch_size=BATCH_SIZE,
+    )
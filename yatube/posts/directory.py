@@ -0,0 +1,114 @@
+"""Group directory: per-group statistics kept up to date on post changes.
+
+``posts.counters`` moves the posts of every group and of every author
+in it. After a post change ``refresh`` rewrites the ``GroupStats`` rows
+of the groups touched, in batches of three queries: the newest post of
+each group is one index seek, its ``TOP_AUTHORS`` most active authors
+one window over the counters, and the rows are replaced in bulk.
+Usernames are copied into the rows, so renaming an author refreshes
+the groups they post in (``refresh_author``). The directory lists groups by
+``Group.post_count`` with the stats joined in, so a page is one query
+however many groups there are. ``rebuild`` refreshes every group.
+"""
+import json
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from .models import Group, GroupAuthorStats, GroupStats, Post
+
+TOP_AUTHORS: int = 3
+ORDERING: tuple = ('-post_count', '-id')
+BATCH_SIZE: int = 300
+GROUP_FIELDS: tuple = (
+    'slug',
+    'title',
+    'description',
+    'post_count',
+    'stats__last_post_at',
+    'stats__top_authors_json',
+)
+
+# The ``(group, -post_count, author)`` index feeds the window in order.
+TOP_AUTHORS_SQL = '''
+SELECT group_id, username, post_count FROM (
+    SELECT
+        counter.group_id AS group_id,
+        author.username AS username,
+        counter.post_count AS post_count,
+        ROW_NUMBER() OVER (
+            PARTITION BY counter.group_id
+            ORDER BY counter.post_count DESC, counter.author_id
+        ) AS position
+    FROM {counter} counter
+    JOIN {user} author ON author.id = counter.author_id
+    WHERE counter.group_id IN ({groups}) AND counter.post_count > 0
+) ranked
+WHERE position <= %s
+ORDER BY group_id, position
+'''
+
+
+def _top_authors(group_ids) -> dict:
+    sql = TOP_AUTHORS_SQL.format(
+        counter=connection.ops.quote_name(GroupAuthorStats._meta.db_table),
+        user=connection.ops.quote_name(get_user_model()._meta.db_table),
+        groups=', '.join(['%s'] * len(group_ids)),
+    )
+    authors = defaultdict(list)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*group_ids, TOP_AUTHORS])
+        for group_id, username, posts in cursor.fetchall():
+            authors[group_id].append({'username': username, 'posts': posts})
+    return authors
+
+
+def _refresh_batch(group_ids):
+    newest = Post.objects.filter(group=OuterRef('pk')).order_by(
+        '-pub_date', '-id'
+    ).values('pub_date')[:1]
+    last_post_at = Group.objects.filter(pk__in=group_ids).annotate(
+        last_post_at=Subquery(newest)
+    ).values_list('pk', 'last_post_at')
+    authors = _top_authors(group_ids)
+    rows = [
+        GroupStats(
+            group_id=group_id,
+            last_post_at=last,
+            top_authors_json=json.dumps(
+                authors[group_id], ensure_ascii=False
+            ),
+        )
+        for group_id, last in last_post_at
+    ]
+    with transaction.atomic():
+        GroupStats.objects.filter(group_id__in=group_ids).delete()
+        GroupStats.objects.bulk_create(rows)
+
+
+def refresh(group_ids):
+    """Recompute the ``GroupStats`` rows of ``group_ids``."""
+    group_ids = sorted(set(group_ids) - {None})
+    for start in range(0, len(group_ids), BATCH_SIZE):
+        _refresh_batch(group_ids[start:start + BATCH_SIZE])
+
+
+def refresh_author(author_id):
+    """Refresh the groups ``author_id`` posts in, e.g. after a rename."""
+    refresh(GroupAuthorStats.objects.filter(
+        author_id=author_id, post_count__gt=0
+    ).values_list('group_id', flat=True))
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute every ``GroupStats`` row from the counters and posts."""
+    GroupStats.objects.all().delete()
+    refresh(Group.objects.values_list('pk', flat=True))
+
+
+def groups():
+    """Directory rows: groups with their stats, for ``ORDERING``."""
+    return Group.objects.select_related('stats').only(*GROUP_FIELDS)
@@ -0,0 +1,275 @@
+"""Synthetic community data with realistic skew, for benchmarks.
+
+Activity on social sites follows power laws: a few authors write most
+of the posts and gather most of the followers, a few posts draw most of
+the comments, a few groups hold most of the posts. Every such choice
+here is drawn from a Zipf distribution, weight ``rank ** -alpha``, so
+feeds, profiles and post pages get the long tails and the hot spots of
+real traffic.
+
+Rows go in with ``bulk_create()`` in batches; counters, timelines and
+the search index are rebuilt once at the end, as after ``import_data``.
+"""
+import io
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import reset_queries, transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import caching
+from .models import Comment, Follow, Group, Post, User
+from .transfer import REBUILD_COMMANDS, original_timestamps
+
+ALPHA: float = 1.1
+BATCH_SIZE: int = 1000
+PASSWORD: str = 'yatube-bench'
+HISTORY_DAYS: int = 365
+IMAGE_SIZE: tuple = (800, 600)
+GROUP_SHARE: float = 0.6
+
+WORDS = (
+    'жизнь', 'город', 'день', 'дом', 'книга', 'море', 'лес', 'друг',
+    'время', 'работа', 'дорога', 'утро', 'вечер', 'история', 'мысль',
+    'музыка', 'кино', 'театр', 'поезд', 'кофе', 'зима', 'лето', 'весна',
+    'осень', 'снег', 'дождь', 'солнце', 'река', 'гора', 'поход', 'кот',
+    'собака', 'сад', 'урок', 'школа', 'письмо', 'праздник', 'путешествие',
+    'фотография', 'картина', 'стихи', 'роман', 'вопрос', 'ответ',
+    'новость', 'проект', 'код', 'программа', 'сервер', 'ошибка',
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Лев', 'Нина')
+LAST_NAMES = ('Иванов', 'Толстой', 'Чехов', 'Горький', 'Бунин', 'Блок')
+
+
+class Zipf:
+    """Draws from ``items``; the n-th one has weight ``n ** -alpha``."""
+
+    def __init__(self, items, alpha, rng):
+        self.items = list(items)
+        self.weights = list(accumulate(
+            1 / rank ** alpha for rank in range(1, len(self.items) + 1)
+        ))
+        self.rng = rng
+
+    def __call__(self):
+        return self.rng.choices(self.items, cum_weights=self.weights)[0]
+
+
+def text(rng, words, low=5, high=60) -> str:
+    return ' '.join(words() for _ in range(rng.randint(low, high)))
+
+
+def _image(rng) -> bytes:
+    """A JPEG gradient between two random colours."""
+    width, height = IMAGE_SIZE
+    start = [rng.randrange(256) for _ in range(3)]
+    end = [rng.randrange(256) for _ in range(3)]
+    image = Image.new('RGB', IMAGE_SIZE)
+    for x in range(width):
+        colour = tuple(
+            a + (b - a) * x // width for a, b in zip(start, end)
+        )
+        image.paste(colour, (x, 0, x + 1, height))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(model, rows, batch_size, **kwargs):
+    for batch in _batches(rows, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, **kwargs)
+        reset_queries()
+
+
+def generate(users=1000, groups=20, posts=20000, comments=50000,
+             follows=20000, images=20, image_share=0.1, alpha=ALPHA,
+             seed=0, prefix='fake', batch_size=BATCH_SIZE, log=None):
+    """Create the data set; returns the number of rows per model."""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    words = Zipf(WORDS, alpha, rng)
+    now = timezone.now()
+
+    password = make_password(PASSWORD)
+    _insert(User, (
+        User(
+            username=f'{prefix}{number}',
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            password=password,
+        )
+        for number in range(users)
+    ), batch_size, ignore_conflicts=True)
+    usernames = [f'{prefix}{number}' for number in range(users)]
+    user_ids = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('username', 'id'))
+    # Rank follows the number, so the same users are the prolific
+    # writers and the most followed authors.
+    ranked_users = [user_ids[name] for name in usernames]
+    log(f'{len(ranked_users)} users')
+
+    _insert(Group, (
+        Group(
+            title=f'Группа {number}: {words()}',
+            slug=f'{prefix}-group-{number}',
+            description=text(rng, words, 5, 20),
+        )
+        for number in range(groups)
+    ), batch_size, ignore_conflicts=True)
+    ranked_groups = list(Group.objects.filter(
+        slug__in=[f'{prefix}-group-{number}' for number in range(groups)]
+    ).order_by('pk').values_list('pk', flat=True))
+    log(f'{len(ranked_groups)} groups')
+
+    # Through the post image storage, so the files are registered for
+    # reference counting like uploads.
+    storage = Post._meta.get_field('image').storage
+    image_names = [
+        storage.save(
+            f'posts/{prefix}-{number}.jpg', ContentFile(_image(rng))
+        )
+        for number in range(images)
+    ]
+    log(f'{len(image_names)} images')
+
+    authors = Zipf(ranked_users, alpha, rng)
+    group_of = Zipf(ranked_groups, alpha, rng) if ranked_groups else None
+    last_pk = Post.objects.order_by('-pk').values_list('pk', flat=True)
+    last_pk = last_pk.first() or 0
+
+    def new_posts():
+        for _ in range(posts):
+            published = now - timedelta(
+                seconds=rng.randrange(HISTORY_DAYS * 24 * 3600)
+            )
+            yield Post(
+                author_id=authors(),
+                group_id=(
+                    group_of() if group_of and rng.random() < GROUP_SHARE
+                    else None
+                ),
+                text=text(rng, words),
+                pub_date=published,
+                updated=published,
+                image=(
+                    rng.choice(image_names)
+                    if image_names and rng.random() < image_share else ''
+                ),
+            )
+
+    with original_timestamps(Post):
+        _insert(Post, new_posts(), batch_size)
+    created_posts = list(Post.objects.filter(
+        pk__gt=last_pk
+    ).values_list('pk', 'pub_date'))
+    log(f'{len(created_posts)} posts')
+
+    # Popular posts are scattered over time, not the oldest ones.
+    shuffled = created_posts[:]
+    rng.shuffle(shuffled)
+    commented = Zipf(shuffled, alpha, rng) if shuffled else None
+    commenters = Zipf(ranked_users, alpha / 2, rng)
+
+    def new_comments():
+        for _ in range(comments if commented else 0):
+            post_id, published = commented()
+            age = max(1, int((now - published).total_seconds()))
+            yield Comment(
+                post_id=post_id,
+                author_id=commenters(),
+                text=text(rng, words, 2, 30),
+                created=published + timedelta(
+                    seconds=rng.randrange(min(age, 7 * 24 * 3600))
+                ),
+            )
+
+    with original_timestamps(Comment):
+        _insert(Comment, new_comments(), batch_size)
+    log(f'{comments if commented else 0} comments')
+
+    # Readers follow popular authors; everyone follows a little.
+    readers = Zipf(ranked_users, alpha / 2, rng)
+    pairs = set()
+    attempts = 0
+    while len(pairs) < follows and attempts < follows * 10:
+        attempts += 1
+        user_id, author_id = readers(), authors()
+        if user_id != author_id:
+            pairs.add((user_id, author_id))
+    _insert(Follow, (
+        Follow(
+            user_id=user_id,
+            author_id=author_id,
+            created=now - timedelta(
+                seconds=rng.randrange(HISTORY_DAYS * 24 * 3600)
+            ),
+        )
+        for user_id, author_id in sorted(pairs)
+    ), batch_size, ignore_conflicts=True)
+    log(f'{len(pairs)} follows')
+
+    caching.bump(caching.EVERY_FEED)
+    for command in REBUILD_COMMANDS:
+        call_command(*command, stdout=io.StringIO())
+    return {
+        'users': len(ranked_users),
+        'groups': len(ranked_groups),
+        'posts': len(created_posts),
+        'comments': comments if commented else 0,
+        'follows': len(pairs),
+        'images': len(image_names),
+    }
+
+
+def add_data_arguments(parser, users, groups, posts, comments, follows,
+                       images):
+    """Data set size options of ``generate_fake_data`` and the benchmarks."""
+    parser.add_argument('--users', type=int, default=users)
+    parser.add_argument('--groups', type=int, default=groups)
+    parser.add_argument('--posts', type=int, default=posts)
+    parser.add_argument('--comments', type=int, default=comments)
+    parser.add_argument('--follows', type=int, default=follows)
+    parser.add_argument(
+        '--images', type=int, default=images,
+        help='Distinct image files shared by the posts with images.',
+    )
+    parser.add_argument(
+        '--image-share', type=float, default=0.1,
+        help='Share of posts with an image.',
+    )
+    parser.add_argument(
+        '--alpha', type=float, default=ALPHA,
+        help='Zipf exponent of authorship, follows and comments.',
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--prefix', default='fake',
+        help='Prefix of generated usernames, group slugs and images.',
+    )
+
+
+def data_options(options) -> dict:
+    return {
+        name: options[name] for name in (
+            'users', 'groups', 'posts', 'comments', 'follows', 'images',
+            'image_share', 'alpha', 'seed', 'prefix',
+        )
+    }
@@ -0,0 +1,132 @@
+"""Follow state of one user towards many authors, in batches.
+
+``FollowState`` answers "which of these authors does the user follow?"
+with one query and remembers the answers. ``for_request`` keeps one per
+request, so the profile header, the follow buttons of the feed cards
+and the bulk endpoint of a request share the lookups.
+
+``follow`` and ``unfollow`` change many rows at once and move counters
+and timelines for all of them together; while ``unfollow`` deletes, the
+per-row ``Follow`` receivers of ``posts.signals`` stand aside.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+
+from . import caching, counters, timeline
+from .models import Follow
+
+MAX_BULK: int = 100
+REQUEST_ATTRIBUTE: str = '_posts_follow_state'
+
+_local = threading.local()
+
+
+class FollowState:
+    """Memoised follow lookups of ``user``; anonymous users follow none."""
+
+    def __init__(self, user):
+        self.user = user
+        self._known = {}
+
+    def following(self, author_ids) -> set:
+        """The authors of ``author_ids`` followed, in one query at most."""
+        author_ids = set(author_ids)
+        if not self.user.is_authenticated:
+            return set()
+        missing = author_ids - self._known.keys()
+        if missing:
+            found = set(Follow.objects.filter(
+                user=self.user, author_id__in=missing
+            ).values_list('author_id', flat=True))
+            for author_id in missing:
+                self._known[author_id] = author_id in found
+        return {
+            author_id for author_id in author_ids if self._known[author_id]
+        }
+
+    def follows(self, author_id) -> bool:
+        return author_id in self.following([author_id])
+
+    def remember(self, author_ids, value: bool):
+        for author_id in author_ids:
+            self._known[author_id] = value
+
+
+def for_request(request) -> FollowState:
+    state = getattr(request, REQUEST_ATTRIBUTE, None)
+    if state is None:
+        state = FollowState(request.user)
+        setattr(request, REQUEST_ATTRIBUTE, state)
+    return state
+
+
+def in_bulk() -> bool:
+    """Whether this thread is inside ``bulk_changes``."""
+    return getattr(_local, 'bulk', False)
+
+
+@contextmanager
+def bulk_changes():
+    """Tell the per-row ``Follow`` receivers that the caller moves
+    counters and timelines itself."""
+    outer = in_bulk()
+    _local.bulk = True
+    try:
+        yield
+    finally:
+        _local.bulk = outer
+
+
+def _lock(follows):
+    """Take the write lock before reading ``follows``.
+
+    On SQLite a transaction that reads first and writes after another
+    connection committed fails at once with "database is locked": the
+    busy timeout only covers waiting to take the lock. Like the counters
+    do, the ``UPDATE`` comes first; it leaves the rows as they are.
+    """
+    follows.update(created=F('created'))
+
+
+def follow(user, author_ids) -> list:
+    """Follow ``author_ids``; returns the ids that were not followed yet.
+
+    ``bulk_create()`` sends no signals, so counters and timelines are
+    moved here for all the new follows at once.
+    """
+    author_ids = set(author_ids) - {user.pk}
+    with transaction.atomic():
+        follows = Follow.objects.filter(user=user, author_id__in=author_ids)
+        _lock(follows)
+        existing = set(follows.values_list('author_id', flat=True))
+        new = sorted(author_ids - existing)
+        Follow.objects.bulk_create(
+            Follow(user=user, author_id=author_id) for author_id in new
+        )
+        counters.follows_bulk_added(new)
+        timeline.add_follows(user.pk, new)
+        if new:
+            caching.bump(f'follow:{user.pk}')
+    return new
+
+
+def unfollow(user, author_ids) -> list:
+    """Stop following ``author_ids``; returns the ids that were followed.
+
+    ``delete()`` sends ``post_delete`` for every row; under
+    ``bulk_changes`` the receivers skip it, and counters and timelines
+    are moved here for all of them at once.
+    """
+    with transaction.atomic(), bulk_changes():
+        follows = Follow.objects.filter(user=user, author_id__in=author_ids)
+        _lock(follows)
+        removed = sorted(follows.values_list('author_id', flat=True))
+        Follow.objects.filter(user=user, author_id__in=removed).delete()
+        counters.follows_bulk_removed(removed)
+        timeline.remove_follows(user.pk, removed)
+        if removed:
+            caching.bump(f'follow:{user.pk}')
+    return removed
@@ -1,7 +1,10 @@
 from django import forms
+from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
-from .models import Comment, Post
+from . import fulltext
+from .models import Comment, Group, Post, User
+from .uploads import check_image
 
 
 class PostForm(forms.ModelForm):
@@ -19,6 +22,30 @@ class PostForm(forms.ModelForm):
             'image': _('Добавьте картинку'),
         }
 
+    def __init__(self, *args, **kwargs):
+        """Check the uploaded image header before ``ImageField`` opens it.
+
+        A rejected file is dropped from the form's files, so the field
+        never opens it and only the header error is reported.
+        """
+        super().__init__(*args, **kwargs)
+        self.image_error = None
+        key = self.add_prefix('image')
+        image = self.files.get(key)
+        if image is None:
+            return
+        try:
+            check_image(image)
+        except ValidationError as error:
+            self.image_error = error
+            self.files = self.files.copy()
+            del self.files[key]
+
+    def clean(self):
+        if self.image_error is not None:
+            self.add_error('image', self.image_error)
+        return super().clean()
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -27,3 +54,32 @@ class CommentForm(forms.ModelForm):
         labels = {
             'text': _('Текст комментария'),
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label=_('Поиск'), max_length=200)
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+        label=_('Группа'),
+        empty_label=_('Все группы'),
+    )
+    author = forms.ModelChoiceField(
+        queryset=User.objects.all(),
+        to_field_name='username',
+        required=False,
+        label=_('Автор'),
+        widget=forms.TextInput,
+        error_messages={'invalid_choice': _('Автор не найден')},
+    )
+
+    def results(self):
+        """Ranked, lazily paginated posts matching the cleaned query."""
+        group = self.cleaned_data['group']
+        author = self.cleaned_data['author']
+        return fulltext.search(
+            self.cleaned_data['q'],
+            group_id=group.pk if group else None,
+            author_id=author.pk if author else None,
+        )
@@ -0,0 +1,252 @@
+"""Full-text search over posts and their comments.
+
+On SQLite with FTS5 the ``posts_search`` virtual table (migration 0012)
+is an inverted index of every post: its text and, in a second column,
+the text of its comments. Triggers on ``posts_post`` and
+``posts_comment`` keep it in sync on any write, including
+``bulk_create()`` and ``update()``, which bypass signals. They are
+created, and the index filled, by ``ensure_triggers`` after ``migrate``;
+it also restores them when a migration rebuilds one of the tables, which
+drops its triggers on SQLite. Results are ranked by BM25, with matches
+in the post text weighted over matches in comments.
+
+Elsewhere ``SubstringBackend`` filters with ``icontains`` and orders by
+date. ``POSTS_SEARCH_BACKEND`` (``'auto'``, ``'fts'`` or
+``'substring'``) picks the backend.
+"""
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .helpers import FEED_ORDERING
+from .models import Comment, Post
+
+SEARCH_BACKEND: str = 'auto'
+SEARCH_TABLE: str = 'posts_search'
+MAX_TERMS: int = 10
+
+TERM_RE = re.compile(r'\w+')
+
+COMMENTS_OF = (
+    "COALESCE((SELECT group_concat(c.text, char(10)) FROM posts_comment c "
+    "WHERE c.post_id = {post}), '')"
+)
+TRIGGERS = {
+    'posts_search_post_inserted':
+        "AFTER INSERT ON posts_post "
+        "BEGIN INSERT INTO posts_search (rowid, text, comments) "
+        "VALUES (new.id, new.text, ''); END",
+    'posts_search_post_updated':
+        "AFTER UPDATE OF text ON posts_post "
+        "BEGIN UPDATE posts_search SET text = new.text "
+        "WHERE rowid = new.id; END",
+    'posts_search_post_deleted':
+        "AFTER DELETE ON posts_post "
+        "BEGIN DELETE FROM posts_search WHERE rowid = old.id; END",
+    'posts_search_comment_inserted':
+        "AFTER INSERT ON posts_comment "
+        "BEGIN UPDATE posts_search SET comments = "
+        + COMMENTS_OF.format(post='new.post_id')
+        + " WHERE rowid = new.post_id; END",
+    'posts_search_comment_updated':
+        "AFTER UPDATE OF text, post_id ON posts_comment "
+        "BEGIN UPDATE posts_search SET comments = "
+        + COMMENTS_OF.format(post='posts_search.rowid')
+        + " WHERE rowid IN (old.post_id, new.post_id); END",
+    'posts_search_comment_deleted':
+        "AFTER DELETE ON posts_comment "
+        "BEGIN UPDATE posts_search SET comments = "
+        + COMMENTS_OF.format(post='old.post_id')
+        + " WHERE rowid = old.post_id; END",
+}
+
+_available = {}
+
+
+def terms(query: str) -> list:
+    """Words of ``query``; punctuation and FTS syntax are dropped."""
+    return TERM_RE.findall(query)[:MAX_TERMS]
+
+
+def _has_index(using=DEFAULT_DB_ALIAS) -> bool:
+    target = connections[using]
+    return (
+        target.vendor == 'sqlite'
+        and SEARCH_TABLE in target.introspection.table_names()
+    )
+
+
+def fts_available() -> bool:
+    """Whether the FTS5 index exists in the current database."""
+    name = connection.settings_dict['NAME']
+    if name not in _available:
+        _available[name] = _has_index()
+    return _available[name]
+
+
+class FTSBackend:
+    """Ranked search through the FTS5 index."""
+
+    name = 'fts'
+
+    @staticmethod
+    def match(words) -> str:
+        # Every word is a quoted prefix query: "пост"* also finds
+        # "посты" and "постов"; the words are ANDed.
+        return ' '.join('"{}"*'.format(word) for word in words)
+
+    def _query(self, select, words, group_id, author_id):
+        # CROSS JOIN makes SQLite drive the join from the index matches;
+        # left to itself it scans the posts of a group and probes the
+        # index for each one.
+        sql = (
+            f'SELECT {select} FROM {SEARCH_TABLE} '
+            f'CROSS JOIN posts_post p ON p.id = {SEARCH_TABLE}.rowid '
+            f'WHERE {SEARCH_TABLE} MATCH %s'
+        )
+        params = [self.match(words)]
+        if group_id is not None:
+            sql += ' AND p.group_id = %s'
+            params.append(group_id)
+        if author_id is not None:
+            sql += ' AND p.author_id = %s'
+            params.append(author_id)
+        return sql, params
+
+    def count(self, words, group_id=None, author_id=None) -> int:
+        sql, params = self._query('COUNT(*)', words, group_id, author_id)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+
+    def page_ids(self, words, group_id, author_id, offset, limit) -> list:
+        sql, params = self._query('p.id', words, group_id, author_id)
+        sql += ' ORDER BY rank, p.id DESC LIMIT %s OFFSET %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, words):
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+            [self.match(words)],
+        ))
+
+
+class SubstringBackend:
+    """``icontains`` fallback: no index, newest first."""
+
+    name = 'substring'
+
+    def filter(self, queryset, words):
+        for word in words:
+            queryset = queryset.filter(
+                Q(text__icontains=word)
+                | Q(pk__in=Comment.objects.filter(
+                    text__icontains=word
+                ).values('post'))
+            )
+        return queryset
+
+    def _queryset(self, words, group_id, author_id):
+        queryset = self.filter(Post.objects.all(), words)
+        if group_id is not None:
+            queryset = queryset.filter(group_id=group_id)
+        if author_id is not None:
+            queryset = queryset.filter(author_id=author_id)
+        return queryset
+
+    def count(self, words, group_id=None, author_id=None) -> int:
+        return self._queryset(words, group_id, author_id).count()
+
+    def page_ids(self, words, group_id, author_id, offset, limit) -> list:
+        queryset = self._queryset(words, group_id, author_id)
+        return list(queryset.order_by(*FEED_ORDERING).values_list(
+            'id', flat=True
+        )[offset:offset + limit])
+
+
+def get_backend():
+    name = getattr(settings, 'POSTS_SEARCH_BACKEND', SEARCH_BACKEND)
+    if name == 'fts' or (name == 'auto' and fts_available()):
+        return FTSBackend()
+    return SubstringBackend()
+
+
+class SearchResults:
+    """Lazy ranked results; ``Paginator`` counts and slices them.
+
+    A page costs one query for the ids and one for the posts, loaded
+    with ``Post.objects.for_feed()``.
+    """
+
+    def __init__(self, words, group_id=None, author_id=None):
+        self.backend = get_backend()
+        self.words = words
+        self.group_id = group_id
+        self.author_id = author_id
+        self._count = None
+
+    def count(self) -> int:
+        if self._count is None:
+            self._count = self.backend.count(
+                self.words, self.group_id, self.author_id
+            ) if self.words else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        if not self.words:
+            return []
+        start = item.start or 0
+        ids = self.backend.page_ids(
+            self.words, self.group_id, self.author_id,
+            start, item.stop - start,
+        )
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search(query: str, group_id=None, author_id=None) -> SearchResults:
+    return SearchResults(terms(query), group_id, author_id)
+
+
+def rebuild(using=DEFAULT_DB_ALIAS) -> int:
+    """Refill the FTS5 index from scratch; returns the number of posts."""
+    if not _has_index(using):
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, text, comments) '
+            f'SELECT p.id, p.text, {COMMENTS_OF.format(post="p.id")} '
+            f'FROM posts_post p'
+        )
+        return cursor.rowcount
+
+
+def ensure_triggers(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Recreate sync triggers lost to a table rebuild and reindex.
+
+    Connected to ``post_migrate``.
+    """
+    _available.pop(connections[using].settings_dict['NAME'], None)
+    if not _has_index(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name IN ('posts_post', 'posts_comment')"
+        )
+        missing = TRIGGERS.keys() - {row[0] for row in cursor.fetchall()}
+        for name in missing:
+            cursor.execute(f'CREATE TRIGGER {name} {TRIGGERS[name]}')
+    if missing:
+        rebuild(using)
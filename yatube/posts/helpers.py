@@ -1,8 +1,156 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
 
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
 
-def pagination(posts, request, records: int):
-    """Pagination function"""
+CURSOR_PARAM: str = 'cursor'
+FEED_ORDERING: tuple = ('-pub_date', '-id')
+
+
+def pagination(posts, request, records: int, count=None):
+    """Pagination function
+
+    ``count`` is a precomputed total (a denormalized counter); when given,
+    the paginator trusts it instead of running ``COUNT(*)``.
+    """
+    if use_cursor_pagination(request):
+        paginator = CursorPaginator(posts, records, FEED_ORDERING)
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
     paginator = Paginator(posts, records)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def use_cursor_pagination(request) -> bool:
+    """Keyset mode is enabled globally in settings or by a cursor link."""
+    if CURSOR_PARAM in request.GET:
+        return True
+    return getattr(settings, 'POSTS_PAGINATION', 'offset') == 'cursor'
+
+
+class CursorPage(Page):
+    """Page of a keyset paginator, addressed by cursors, not numbers."""
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page of %s objects>' % len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Keyset paginator: seeks by the last seen ordering key.
+
+    Neither ``OFFSET`` nor ``COUNT(*)`` is issued, so any page costs the
+    same as the first one provided the ordering is backed by an index.
+    The last ordering field must be unique to break ties.
+    """
+    cursor_based = True
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def get_page(self, cursor=None):
+        try:
+            backwards, values = self.decode_cursor(cursor)
+        except ValueError:
+            backwards, values = False, None
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(_reverse_field(field) for field in ordering)
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(_seek_filter(ordering, values))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=(
+                self.encode_cursor(rows[-1]) if has_next and rows else None
+            ),
+            previous_cursor=(
+                self.encode_cursor(rows[0], backwards=True)
+                if has_previous and rows else None
+            ),
+        )
+
+    def page(self, cursor):
+        return self.get_page(cursor)
+
+    def encode_cursor(self, obj, backwards=False) -> str:
+        values = [
+            self._field(field).value_to_string(obj)
+            for field in self.ordering
+        ]
+        raw = json.dumps([int(backwards), values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return False, None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            backwards, values = json.loads(raw.decode())
+        except (binascii.Error, UnicodeDecodeError, TypeError) as error:
+            raise ValueError(error)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise ValueError('Cursor does not match the ordering')
+        try:
+            values = [
+                self._field(field).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except Exception as error:
+            raise ValueError(error)
+        return bool(backwards), values
+
+    def _field(self, field):
+        name = field.lstrip('-')
+        if name == 'pk':
+            return self.object_list.model._meta.pk
+        return self.object_list.model._meta.get_field(name)
+
+
+def _reverse_field(field: str) -> str:
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def _seek_filter(ordering, values):
+    """Rows strictly after ``values`` in ``ordering``, as one ``Q``.
+
+    ``(a, b) > (x, y)`` is spelled ``a >= x AND (a > x OR b > y)``: the
+    leading non-strict bound lets the index seek straight to the cursor
+    instead of scanning every row before it.
+    """
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    first = ordering[0]
+    bound = 'lte' if first.startswith('-') else 'gte'
+    return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
@@ -0,0 +1,106 @@
+import itertools
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from posts.benchmark import summarize
+
+
+def _backend(alias, location):
+    """A fresh instance of the ``alias`` backend on a scratch location."""
+    params = dict(settings.CACHES[alias])
+    backend = import_string(params.pop('BACKEND'))
+    return backend(location, params)
+
+
+def _worker(alias, location, options, seed, results):
+    cache = _backend(alias, location)
+    rng = random.Random(seed)
+    ranks = range(1, options['keys'] + 1)
+    weights = list(itertools.accumulate(1 / rank for rank in ranks))
+    value = 'x' * options['value_size']
+    render = options['render_ms'] / 1000
+    samples = []
+    for _ in range(options['ops']):
+        started = time.perf_counter()
+        if rng.random() < options['writes']:
+            try:
+                cache.incr('generation')
+            except ValueError:
+                cache.add('generation', 1, None)
+        generation = cache.get('generation', 0)
+        key = 'page:{}:{}'.format(
+            generation, rng.choices(ranks, cum_weights=weights)[0]
+        )
+        if cache.get(key) is None:
+            time.sleep(render)
+            cache.set(key, value)
+        samples.append(time.perf_counter() - started)
+    stats = cache.stats()
+    results.put((stats['hits'], stats['misses'], samples))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare cache backends under several processes reading the '
+        'same pages: hit rate and per-request latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alias', action='append', dest='aliases',
+            help='CACHES alias to test, repeatable (default: all).',
+        )
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--ops', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=200)
+        parser.add_argument('--value-size', type=int, default=4096)
+        parser.add_argument(
+            '--render-ms', type=float, default=2.0,
+            help='Simulated cost of rendering a page on a miss.',
+        )
+        parser.add_argument(
+            '--writes', type=float, default=0.001,
+            help='Share of requests that invalidate every page.',
+        )
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        for alias in options['aliases'] or list(settings.CACHES):
+            with tempfile.TemporaryDirectory() as directory:
+                location = os.path.join(directory, 'cache.sqlite3')
+                _backend(alias, location).clear()
+                results = context.Queue()
+                workers = [
+                    context.Process(
+                        target=_worker,
+                        args=(alias, location, options, seed, results),
+                    )
+                    for seed in range(options['processes'])
+                ]
+                started = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                collected = [results.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+                elapsed = time.perf_counter() - started
+            hits = sum(result[0] for result in collected)
+            misses = sum(result[1] for result in collected)
+            samples = [
+                sample for result in collected for sample in result[2]
+            ]
+            stats = summarize(samples)
+            self.stdout.write(
+                f'{alias:>10}: hit rate {hits / (hits + misses):6.1%}  '
+                f'{len(samples) / elapsed:8.0f} req/s  '
+                f'p50 {stats["p50_ms"]:7.3f} ms  '
+                f'p95 {stats["p95_ms"]:7.3f} ms  '
+                f'p99 {stats["p99_ms"]:7.3f} ms'
+            )
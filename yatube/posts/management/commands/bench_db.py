@@ -0,0 +1,297 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import RequestFactory, override_settings
+
+from posts import fake_data
+from posts.benchmark import (
+    SCENARIOS, BenchData, Sampler, isolated_storage, login_cookies,
+    scratch_database, summarize,
+)
+from posts.fake_data import add_data_arguments, data_options
+
+READ_ROUTES: tuple = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:api_post_detail',
+)
+WRITE_ROUTES: tuple = (
+    'posts:post_create',
+    'posts:add_comment',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+)
+
+# The database as it was configured before the profile in settings:
+# a connection per request, SQLite's own defaults and sqlite3's 5 s
+# wait for a locked database.
+BASELINE: dict = {
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {},
+    'SQLITE_PRAGMAS': {
+        'journal_mode': 'delete',
+        'synchronous': 'full',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'default',
+    },
+}
+
+
+def profiles() -> dict:
+    database = settings.DATABASES['default']
+    return {
+        'baseline': BASELINE,
+        'settings': {
+            'CONN_MAX_AGE': database.get('CONN_MAX_AGE', 0),
+            'OPTIONS': database.get('OPTIONS', {}),
+            'SQLITE_PRAGMAS': settings.SQLITE_PRAGMAS,
+        },
+    }
+
+
+class EnvironFactory(RequestFactory):
+    """Builds WSGI environs instead of requests."""
+
+    def request(self, **request):
+        return self._base_environ(**request)
+
+
+class WSGITransport:
+    """Requests through Django's WSGI handler, as a server makes them.
+
+    Unlike the test client, the handler closes connections as
+    ``CONN_MAX_AGE`` says and turns an error into a 500 of its own
+    request only: the client re-raises it in every thread.
+    """
+
+    handler = None
+
+    def __init__(self, user_id):
+        self.csrf_token, self.cookies = login_cookies(user_id)
+        self.factory = EnvironFactory()
+        if WSGITransport.handler is None:
+            WSGITransport.handler = WSGIHandler()
+
+    def request(self, scenario, method, path, data):
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(int(status.split()[0]))
+
+        environ = getattr(self.factory, method.lower())(
+            path, data,
+            HTTP_COOKIE=self.cookies[scenario.login],
+            HTTP_X_CSRFTOKEN=self.csrf_token,
+        )
+        response = self.handler(environ, start_response)
+        for _ in response:
+            pass
+        # Sends request_finished, which closes the connection.
+        response.close()
+        return statuses[0], None
+
+
+class Command(BaseCommand):
+    help = (
+        'Run readers and writers against the same SQLite database at '
+        'once, first with the baseline database setup, then with the '
+        'one in settings (persistent connections, PRAGMAs, lock '
+        'timeout), and report latency, throughput and errors of each.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=6)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--seconds', type=float, default=10.0,
+            help='Measured run time per profile.',
+        )
+        parser.add_argument(
+            '--warmup', type=float, default=2.0,
+            help='Unmeasured run time per profile first.',
+        )
+        parser.add_argument(
+            '--profile', action='append', dest='profiles',
+            choices=('baseline', 'settings'),
+            help='Profile to run, repeatable (default: both).',
+        )
+        parser.add_argument('--json', help='Write the results to this file.')
+        add_data_arguments(
+            parser, users=500, groups=10, posts=5000, comments=20000,
+            follows=5000, images=0,
+        )
+
+    def handle(self, *args, **options):
+        names = options['profiles'] or list(profiles())
+        results = {}
+        with ExitStack() as stack:
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+            stack.enter_context(isolated_storage(directory))
+            stack.enter_context(override_settings(
+                DEBUG=False,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                SLOW_QUERY_THRESHOLD=None,
+            ))
+            path = os.path.join(directory, 'bench.sqlite3')
+            pristine = os.path.join(directory, 'pristine.sqlite3')
+            stack.enter_context(scratch_database(name=path))
+            data_counts = fake_data.generate(
+                **data_options(options), log=self.stdout.write
+            )
+            # Closing the last connection folds the WAL back in.
+            connections.close_all()
+            shutil.copyfile(path, pristine)
+            self.stdout.write(
+                f'{"profile":<10} {"kind":<6} {"req/s":>8} '
+                f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+                f'{"errors":>6}'
+            )
+            for name in names:
+                self._restore(pristine, path)
+                results[name] = self._run(profiles()[name], options)
+                for kind, result in results[name].items():
+                    self.stdout.write(
+                        f'{name:<10} {kind:<6} '
+                        f'{result["throughput_rps"]:8.1f} '
+                        f'{result["p50_ms"]:8.2f} '
+                        f'{result["p95_ms"]:8.2f} '
+                        f'{result["p99_ms"]:8.2f} '
+                        f'{result["errors"]:>6}'
+                    )
+                connections.close_all()
+        if len(results) == 2:
+            self._compare(results['baseline'], results['settings'])
+        if options['json']:
+            with open(options['json'], 'w') as file:
+                json.dump({
+                    'readers': options['readers'],
+                    'writers': options['writers'],
+                    'seconds': options['seconds'],
+                    'data': data_counts,
+                    'profiles': {name: profiles()[name] for name in results},
+                    'results': results,
+                }, file, indent=2, ensure_ascii=False)
+
+    def _restore(self, pristine, path):
+        """Start every profile from the same rows and an empty cache."""
+        connections.close_all()
+        for suffix in ('-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        shutil.copyfile(pristine, path)
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def _run(self, profile, options):
+        database = connection.settings_dict
+        saved = {key: database[key] for key in ('CONN_MAX_AGE', 'OPTIONS')}
+        database['CONN_MAX_AGE'] = profile['CONN_MAX_AGE']
+        database['OPTIONS'] = profile['OPTIONS']
+        try:
+            return self._measure(profile, options)
+        finally:
+            database.update(saved)
+
+    def _measure(self, profile, options):
+        with override_settings(
+            SQLITE_PRAGMAS=profile['SQLITE_PRAGMAS'],
+        ):
+            data = BenchData()
+            params = data_options(options)
+            workers = []
+            for index in range(options['readers'] + options['writers']):
+                rng = random.Random(params['seed'] * 1000 + index)
+                sampler = Sampler(data, rng, params['alpha'])
+                routes = (
+                    READ_ROUTES if index < options['readers']
+                    else WRITE_ROUTES
+                )
+                workers.append(
+                    (WSGITransport(sampler.viewer_id), sampler, routes)
+                )
+            connections.close_all()
+            self._phase(workers, options['warmup'])
+            return self._phase(workers, options['seconds'])
+
+    def _phase(self, workers, seconds):
+        """Every worker requests its routes for ``seconds`` at once."""
+        lock = threading.Lock()
+        latencies = {'read': [], 'write': []}
+        statuses = {'read': Counter(), 'write': Counter()}
+        errors = {'read': Counter(), 'write': Counter()}
+        deadline = time.perf_counter() + seconds
+
+        def work(transport, sampler, routes):
+            kind = 'read' if routes is READ_ROUTES else 'write'
+            try:
+                while time.perf_counter() < deadline:
+                    scenario = SCENARIOS[sampler.rng.choice(routes)]
+                    method, path, data = scenario.build(sampler)
+                    started = time.perf_counter()
+                    try:
+                        status, _ = transport.request(
+                            scenario, method, path, data
+                        )
+                    except Exception as error:
+                        with lock:
+                            errors[kind][type(error).__name__] += 1
+                        continue
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies[kind].append(elapsed)
+                        statuses[kind][status] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=work, args=worker) for worker in workers
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return {
+            kind: {
+                **summarize(latencies[kind]),
+                'throughput_rps': round(len(latencies[kind]) / elapsed, 1),
+                'statuses': {
+                    str(code): total
+                    for code, total in statuses[kind].items()
+                },
+                'exceptions': dict(errors[kind]),
+                'errors': sum(errors[kind].values()) + sum(
+                    total for status, total in statuses[kind].items()
+                    if status >= 400
+                ),
+            }
+            for kind in ('read', 'write')
+        }
+
+    def _compare(self, before, after):
+        self.stdout.write('\nSettings profile against the baseline:')
+        for kind in ('read', 'write'):
+            old, new = before[kind], after[kind]
+            self.stdout.write(
+                f'{kind:<6} p95 {old["p95_ms"]:8.2f} -> '
+                f'{new["p95_ms"]:8.2f} ms  '
+                f'{old["throughput_rps"]:8.1f} -> '
+                f'{new["throughput_rps"]:8.1f} req/s  '
+                f'errors {old["errors"]} -> {new["errors"]}'
+            )
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from posts.benchmark import measure, scratch_database, summarize
+from posts.helpers import CursorPaginator
+from posts.models import Post, User
+from posts.views import QUANTITY_RECORDS
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare OFFSET and keyset pagination latency on the first '
+        'and a deep page of the post feed (uses a scratch database).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--page', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=30)
+
+    def handle(self, *args, **options):
+        per_page = QUANTITY_RECORDS
+        deep_page = options['page']
+        total = max(options['posts'], deep_page * per_page)
+        with scratch_database():
+            self._populate(total)
+            queryset = Post.objects.all()
+
+            cursor = CursorPaginator(queryset, per_page)
+            anchor = queryset.order_by(*cursor.ordering)[
+                (deep_page - 1) * per_page - 1
+            ]
+            deep_cursor = cursor.encode_cursor(anchor)
+
+            results = {
+                'offset page 1': lambda: list(
+                    Paginator(queryset, per_page).get_page(1)
+                ),
+                f'offset page {deep_page}': lambda: list(
+                    Paginator(queryset, per_page).get_page(deep_page)
+                ),
+                'cursor page 1': lambda: list(cursor.get_page(None)),
+                f'cursor page {deep_page}': lambda: list(
+                    cursor.get_page(deep_cursor)
+                ),
+            }
+            for label, func in results.items():
+                func()
+                stats = summarize(measure(func, options['repeat']))
+                self.stdout.write(
+                    f'{label:>20}: p50 {stats["p50_ms"]:8.3f} ms  '
+                    f'p95 {stats["p95_ms"]:8.3f} ms'
+                )
+
+    def _populate(self, total):
+        author = User.objects.create_user(username='bench')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {i}') for i in range(total)
+        )
+        self.stdout.write(f'{total} posts created')
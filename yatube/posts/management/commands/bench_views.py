@@ -0,0 +1,315 @@
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from urllib.parse import urlencode, urlsplit
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from posts import fake_data, urls
+from posts.benchmark import (
+    SCENARIOS, BenchData, Sampler, isolated_storage, login_cookies,
+    scratch_database, summarize,
+)
+from posts.fake_data import add_data_arguments, data_options
+from posts.models import User
+
+
+class ClientTransport:
+    """In-process requests through the Django test client.
+
+    Queries are counted with an execute wrapper on the worker's own
+    connection.
+    """
+
+    def __init__(self, user_id):
+        self.anonymous = Client()
+        self.user = Client()
+        self.user.force_login(User.objects.get(pk=user_id))
+
+    def request(self, scenario, method, path, data):
+        client = self.user if scenario.login else self.anonymous
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = getattr(client, method.lower())(path, data)
+        return response.status_code, queries
+
+
+class HTTPTransport:
+    """Requests to a running server over HTTP; queries are not seen.
+
+    The session is created in the database this command uses, which
+    must be the server's.
+    """
+
+    def __init__(self, base_url, user_id):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.csrf_token, self.cookies = login_cookies(user_id)
+
+    def request(self, scenario, method, path, data):
+        headers = {
+            'Host': self.host, 'Cookie': self.cookies[scenario.login],
+        }
+        body = None
+        path = self.prefix + path
+        if method == 'GET':
+            if data:
+                path += '?' + urlencode(data, doseq=True)
+        else:
+            body = urlencode(data, doseq=True)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.csrf_token
+        server = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            server.request(method, path, body, headers)
+            response = server.getresponse()
+            response.read()
+            return response.status, None
+        finally:
+            server.close()
+
+
+def _revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every route of posts.urls with concurrent requests and '
+        'report p50/p95/p99 latency, queries per request and throughput. '
+        'By default data is generated into a scratch database and '
+        'requests go through the test client; --base-url sends them to '
+        'a running server instead.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Measured requests per route.',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=20,
+            help='Unmeasured requests per route first.',
+        )
+        parser.add_argument(
+            '--route', action='append', dest='routes',
+            help='Route name such as posts:index, repeatable '
+                 '(default: all).',
+        )
+        parser.add_argument(
+            '--read-only', action='store_true',
+            help='Skip routes that write.',
+        )
+        parser.add_argument(
+            '--existing', action='store_true',
+            help='Use the data already in the database instead of a '
+                 'generated scratch database.',
+        )
+        parser.add_argument(
+            '--base-url',
+            help='Server to send requests to, e.g. http://127.0.0.1:8000; '
+                 'implies --existing.',
+        )
+        parser.add_argument('--json', help='Write the results to this file.')
+        parser.add_argument(
+            '--compare', help='Results file of an earlier run to diff with.'
+        )
+        add_data_arguments(
+            parser, users=500, groups=10, posts=5000, comments=20000,
+            follows=5000, images=10,
+        )
+
+    def handle(self, *args, **options):
+        names = self._routes(options)
+        with ExitStack() as stack:
+            data_counts = None
+            if not (options['existing'] or options['base_url']):
+                directory = stack.enter_context(tempfile.TemporaryDirectory())
+                stack.enter_context(isolated_storage(directory))
+                stack.enter_context(scratch_database(
+                    name=os.path.join(directory, 'bench.sqlite3')
+                ))
+                data_counts = fake_data.generate(
+                    **data_options(options), log=self.stdout.write
+                )
+            if not options['base_url']:
+                stack.enter_context(override_settings(
+                    DEBUG=False,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                ))
+            results = self._run_all(names, options)
+        report = {
+            'meta': {
+                'started': timezone.now().isoformat(),
+                'revision': _revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'mode': 'http' if options['base_url'] else 'client',
+                'base_url': options['base_url'],
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'data': data_counts,
+            },
+            'routes': results,
+        }
+        if options['json']:
+            with open(options['json'], 'w') as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
+        if options['compare']:
+            self._compare(options['compare'], results)
+
+    def _routes(self, options):
+        known = {f'{urls.app_name}:{pattern.name}'
+                 for pattern in urls.urlpatterns}
+        uncovered = known - SCENARIOS.keys()
+        if uncovered:
+            self.stderr.write(
+                'No scenario for: ' + ', '.join(sorted(uncovered))
+            )
+        names = options['routes'] or [
+            name for name in SCENARIOS if name in known
+        ]
+        unknown = set(names) - SCENARIOS.keys()
+        if unknown:
+            raise CommandError('Unknown routes: ' + ', '.join(unknown))
+        if options['read_only']:
+            names = [name for name in names if not SCENARIOS[name].writes]
+        return names
+
+    def _run_all(self, names, options):
+        data = BenchData()
+        params = data_options(options)
+        workers = []
+        for index in range(options['concurrency']):
+            rng = random.Random(params['seed'] * 1000 + index)
+            sampler = Sampler(data, rng, params['alpha'])
+            if options['base_url']:
+                transport = HTTPTransport(
+                    options['base_url'], sampler.viewer_id
+                )
+            else:
+                transport = ClientTransport(sampler.viewer_id)
+            workers.append((transport, sampler))
+        connection.close()
+        results = {}
+        self.stdout.write(
+            f'{"route":<26} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"p99 ms":>8} {"queries":>8} {"errors":>6}'
+        )
+        for name in names:
+            scenario = SCENARIOS[name]
+            self._phase(workers, scenario, options['warmup'])
+            result = self._phase(workers, scenario, options['requests'])
+            results[name] = result
+            queries = result['queries_mean']
+            self.stdout.write(
+                f'{name:<26} {result["throughput_rps"]:8.1f} '
+                f'{result["p50_ms"]:8.2f} {result["p95_ms"]:8.2f} '
+                f'{result["p99_ms"]:8.2f} '
+                f'{"-" if queries is None else f"{queries:.1f}":>8} '
+                f'{result["errors"]:>6}'
+            )
+        return results
+
+    def _phase(self, workers, scenario, requests):
+        """``requests`` requests to one route from every worker at once."""
+        lock = threading.Lock()
+        remaining = requests
+        latencies, queries, statuses, errors = [], [], Counter(), Counter()
+
+        def work(transport, sampler):
+            nonlocal remaining
+            try:
+                while True:
+                    with lock:
+                        if remaining <= 0:
+                            return
+                        remaining -= 1
+                    method, path, data = scenario.build(sampler)
+                    started = time.perf_counter()
+                    try:
+                        status, count = transport.request(
+                            scenario, method, path, data
+                        )
+                    except Exception as error:
+                        with lock:
+                            errors[type(error).__name__] += 1
+                        continue
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        statuses[status] += 1
+                        if count is not None:
+                            queries.append(count)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=work, args=worker) for worker in workers
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        failed = sum(
+            total for status, total in statuses.items() if status >= 400
+        )
+        return {
+            **summarize(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 1)
+            if elapsed else 0.0,
+            'queries_mean': round(sum(queries) / len(queries), 2)
+            if queries else None,
+            'queries_max': max(queries) if queries else None,
+            'statuses': {str(code): total for code, total in statuses.items()},
+            'exceptions': dict(errors),
+            'errors': failed + sum(errors.values()),
+        }
+
+    def _compare(self, path, results):
+        with open(path) as file:
+            before = json.load(file)['routes']
+        self.stdout.write(f'\nCompared with {path}:')
+        for name, result in results.items():
+            old = before.get(name)
+            if not old:
+                continue
+            change = (
+                (result['p95_ms'] - old['p95_ms']) / old['p95_ms']
+                if old['p95_ms'] else 0.0
+            )
+            self.stdout.write(
+                f'{name:<26} p95 {old["p95_ms"]:8.2f} -> '
+                f'{result["p95_ms"]:8.2f} ms ({change:+.0%})  '
+                f'{old["throughput_rps"]:8.1f} -> '
+                f'{result["throughput_rps"]:8.1f} req/s'
+            )
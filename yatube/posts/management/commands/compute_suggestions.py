@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute "who to follow" suggestions from the follow graph; '
+        'run it periodically.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Compute only the suggestions of this user id (repeatable).'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=suggestions.SUGGESTIONS,
+            help='Suggestions kept per user.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=suggestions.BATCH_SIZE,
+            help='Users ranked per query.'
+        )
+
+    def handle(self, *args, **options):
+        users = suggestions.compute(
+            options['user_ids'],
+            limit=options['limit'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(f'suggestions computed for {users} users')
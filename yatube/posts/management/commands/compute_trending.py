@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold comments and follows since the last run into the trending '
+        'scores; run it periodically.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Recompute the scores from the whole window.'
+        )
+
+    def handle(self, *args, **options):
+        result = trending.run(rebuild=options['rebuild'])
+        self.stdout.write(
+            '{action} {posts} posts with activity from {since:%Y-%m-%d '
+            '%H:%M:%S} to {until:%Y-%m-%d %H:%M:%S}'.format(
+                action='Rebuilt' if result['rebuilt'] else 'Updated',
+                **result,
+            )
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from posts import blobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Merge identical post images in MEDIA_ROOT into one file each '
+        'and recount image references.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report what would be merged or deleted.'
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Also delete images no post uses.'
+        )
+
+    def handle(self, *args, **options):
+        stats = blobs.dedupe(
+            dry_run=options['dry_run'], prune=options['prune']
+        )
+        would = 'would be ' if options['dry_run'] else ''
+        self.stdout.write(
+            f'{stats["files"]} files: {stats["duplicates"]} duplicates '
+            f'and {stats["pruned"]} unused {would}deleted, '
+            f'{filesizeformat(stats["bytes"])} {would}freed, '
+            f'{stats["posts"]} posts {would}repointed'
+        )
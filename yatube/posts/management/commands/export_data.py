@@ -0,0 +1,46 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream groups, posts, comments and follows to JSON Lines or CSV '
+        'files, one per dataset, in constant memory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl'
+        )
+        parser.add_argument(
+            '--only', action='append', choices=list(transfer.DATASETS),
+            help='Dataset to export, repeatable (default: all).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='JSON file with the last exported pk per dataset; '
+                 'an existing one resumes the export.',
+        )
+
+    def handle(self, *args, **options):
+        os.makedirs(options['directory'], exist_ok=True)
+        checkpoint = transfer.Checkpoint(options['checkpoint'])
+        for name in options['only'] or transfer.DATASETS:
+            report = transfer.export_dataset(
+                transfer.DATASETS[name],
+                transfer.dump_path(
+                    options['directory'], name, options['format']
+                ),
+                options['format'],
+                checkpoint,
+                batch_size=options['batch_size'],
+                progress=transfer.ProgressPrinter(self.stdout.write),
+            )
+            self.stdout.write(str(report))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts import fake_data
+from posts.fake_data import add_data_arguments, data_options
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with users, groups, posts with images, '
+        'comments and follows drawn from power-law distributions. '
+        f'Users get the password "{fake_data.PASSWORD}".'
+    )
+
+    def add_arguments(self, parser):
+        add_data_arguments(
+            parser, users=1000, groups=20, posts=20000, comments=50000,
+            follows=20000, images=20,
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=fake_data.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        counts = fake_data.generate(
+            **data_options(options),
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Created ' + ', '.join(
+                f'{total} {name}' for name, total in counts.items()
+            )
+        ))
@@ -0,0 +1,83 @@
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import caching, transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Load groups, posts, comments and follows written by export_data, '
+        'in batches of bulk_create(), resumable from a checkpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl'
+        )
+        parser.add_argument(
+            '--only', action='append', choices=list(transfer.DATASETS),
+            help='Dataset to import, repeatable (default: all found).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='JSON file with the byte offset reached per dataset; '
+                 'an existing one resumes the import.',
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Create missing authors and followers as inactive users '
+                 'instead of skipping their rows.',
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_false', dest='rebuild',
+            help='Skip recomputing counters, timelines and the search '
+                 'index after the import.',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = transfer.Checkpoint(options['checkpoint'])
+        users = transfer.UserResolver(create=options['create_users'])
+        names = options['only'] or [
+            name for name in transfer.DATASETS
+            if os.path.exists(self._path(name, options))
+        ]
+        if not names:
+            raise CommandError(
+                f'No {options["format"]} files in {options["directory"]}'
+            )
+        imported = 0
+        for name in names:
+            report = transfer.import_dataset(
+                transfer.DATASETS[name],
+                self._path(name, options),
+                options['format'],
+                checkpoint,
+                batch_size=options['batch_size'],
+                users=users,
+                progress=transfer.ProgressPrinter(self.stdout.write),
+            )
+            self.stdout.write(str(report))
+            imported += report.rows
+        caching.bump(caching.EVERY_FEED)
+        if options['rebuild']:
+            for command in transfer.REBUILD_COMMANDS:
+                call_command(*command, stdout=self.stdout)
+        elif imported:
+            # bulk_create() sends no signals: nothing derived has moved.
+            commands = [name for name, *_ in transfer.REBUILD_COMMANDS]
+            self.stderr.write(self.style.WARNING(
+                f'{imported} rows imported, but counters, timelines, the '
+                f'search index, suggestions and trending do not count '
+                f'them yet; run {", ".join(commands)}.'
+            ))
+
+    def _path(self, name, options):
+        return transfer.dump_path(
+            options['directory'], name, options['format']
+        )
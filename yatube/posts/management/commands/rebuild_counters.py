@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters, directory
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute denormalized post, comment, follower and image '
+        'reference counters and the group directory statistics from the '
+        'source tables.'
+    )
+
+    def handle(self, *args, **options):
+        counters.rebuild()
+        directory.rebuild()
+        self.stdout.write('Counters rebuilt')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import fulltext
+
+
+class Command(BaseCommand):
+    help = 'Refill the full-text search index of posts and comments.'
+
+    def handle(self, *args, **options):
+        if not fulltext.fts_available():
+            self.stdout.write(
+                'No FTS5 index in this database, the fallback search '
+                'needs none'
+            )
+            return
+        self.stdout.write(f'{fulltext.rebuild()} posts indexed')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized follow timelines from Follow and Post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Rebuild only the timeline of this user id (repeatable).'
+        )
+
+    def handle(self, *args, **options):
+        edges = timeline.rebuild(options['user_ids'])
+        self.stdout.write(f'{edges} follow edges fanned out')
@@ -0,0 +1,70 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:32
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    for group_id, total in Post.objects.exclude(group=None).values_list(
+        'group'
+    ).annotate(total=Count('pk')).order_by():
+        Group.objects.filter(pk=group_id).update(post_count=total)
+    for post_id, total in Comment.objects.exclude(post=None).values_list(
+        'post'
+    ).annotate(total=Count('pk')).order_by():
+        Post.objects.filter(pk=post_id).update(comment_count=total)
+    stats = {}
+    for author_id, total in Post.objects.values_list('author').annotate(
+        total=Count('pk')
+    ).order_by():
+        stats.setdefault(author_id, [0, 0])[0] = total
+    for author_id, total in Follow.objects.values_list('author').annotate(
+        total=Count('pk')
+    ).order_by():
+        stats.setdefault(author_id, [0, 0])[1] = total
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(
+                user_id=user_id, post_count=posts, follower_count=followers
+            )
+            for user_id, (posts, followers) in stats.items()
+        ],
+        batch_size=300,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_auto_20261018_0329'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Число публикаций')),
+                ('follower_count', models.PositiveIntegerField(default=0, verbose_name='Число подписчиков')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число публикаций'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    """FTS5 index on SQLite; other databases use the fallback search.
+
+    The sync triggers and the initial fill come from
+    ``posts.fulltext.ensure_triggers`` on ``post_migrate``.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                'CREATE VIRTUAL TABLE posts_search USING fts5('
+                "text, comments, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            return
+        # Words in the post itself rank above words in its comments.
+        cursor.execute(
+            'INSERT INTO posts_search (posts_search, rank) '
+            "VALUES ('rank', 'bm25(2.0, 1.0)')"
+        )
+
+
+TRIGGERS = (
+    'posts_search_post_inserted',
+    'posts_search_post_updated',
+    'posts_search_post_deleted',
+    'posts_search_comment_inserted',
+    'posts_search_comment_updated',
+    'posts_search_comment_deleted',
+)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for trigger in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
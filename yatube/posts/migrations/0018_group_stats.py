@@ -0,0 +1,101 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+import json
+
+
+def fill_group_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    GroupAuthorStats = apps.get_model('posts', 'GroupAuthorStats')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    Post = apps.get_model('posts', 'Post')
+    GroupAuthorStats.objects.bulk_create(
+        [
+            GroupAuthorStats(
+                group_id=group_id, author_id=author_id, post_count=total
+            )
+            for group_id, author_id, total in Post.objects.exclude(
+                group=None
+            ).order_by().values('group', 'author').annotate(
+                total=Count('pk')
+            ).values_list('group', 'author', 'total')
+        ],
+        batch_size=300,
+    )
+    last_post_at = dict(
+        Post.objects.exclude(group=None).order_by().values('group').annotate(
+            last=Max('pub_date')
+        ).values_list('group', 'last')
+    )
+    authors = {}
+    for group_id, username, posts in GroupAuthorStats.objects.order_by(
+        'group', '-post_count', 'author'
+    ).values_list('group', 'author__username', 'post_count'):
+        top = authors.setdefault(group_id, [])
+        if len(top) < 3:
+            top.append({'username': username, 'posts': posts})
+    GroupStats.objects.bulk_create(
+        [
+            GroupStats(
+                group_id=group_id,
+                last_post_at=last_post_at.get(group_id),
+                top_authors_json=json.dumps(
+                    authors.get(group_id, []), ensure_ascii=False
+                ),
+            )
+            for group_id in Group.objects.values_list('pk', flat=True)
+        ],
+        batch_size=300,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupAuthorStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Число публикаций')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group', verbose_name='Группа')),
+                ('last_post_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя публикация')),
+                ('top_authors_json', models.TextField(default='[]', verbose_name='Самые активные авторы')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['-post_count', '-id'], name='group_post_count_idx'),
+        ),
+        migrations.AddField(
+            model_name='groupauthorstats',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AddField(
+            model_name='groupauthorstats',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_stats', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.AddIndex(
+            model_name='groupauthorstats',
+            index=models.Index(fields=['group', '-post_count', 'author'], name='group_author_posts_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupauthorstats',
+            constraint=models.UniqueConstraint(fields=('group', 'author'), name='group_author'),
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
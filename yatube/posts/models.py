@@ -1,8 +1,37 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from .storage import ContentAddressedStorage
 
 TEXT_LIMIT_POST: int = 15
 TEXT_LIMIT_COMMENT: int = 30
+FEED_FIELDS: tuple = (
+    'text',
+    'pub_date',
+    'updated',
+    'image',
+    'comment_count',
+    'author',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group',
+    'group__slug',
+    'group__title',
+)
+COMMENT_FIELDS: tuple = (
+    'post',
+    'text',
+    'created',
+    'author',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+)
+COMMENT_ORDERING: tuple = ('created', 'id')
 
 User = get_user_model()
 
@@ -21,11 +50,38 @@ class Group(models.Model):
         max_length=255,
         verbose_name='Описание'
     )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число публикаций'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-post_count', '-id'], name='group_post_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Load everything a feed card renders in the same query."""
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """``bulk_create`` sends no signals, so move counters here."""
+        from . import counters, directory
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        counters.posts_bulk_added(objs)
+        directory.refresh(post.group_id for post in objs)
+        return objs
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст',
@@ -35,6 +91,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -53,16 +113,62 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         help_text='Загрузите сюда вашу картинку'
     )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:TEXT_LIMIT_POST]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def loaded_value(self, field_name, default=None):
+        """Value of ``field_name`` as it was last read from the database."""
+        value = getattr(self, '_loaded_values', {}).get(field_name, default)
+        return default if value is models.DEFERRED else value
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_list(self):
+        """Load comments with their authors in the same query."""
+        return self.select_related('author').only(*COMMENT_FIELDS)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -88,6 +194,17 @@ class Comment(models.Model):
         auto_now_add=True,
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        ordering = COMMENT_ORDERING
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+            models.Index(fields=['created'], name='comment_created_idx'),
+        ]
+
     def __str__(self):
         return self.text[:TEXT_LIMIT_COMMENT]
 
@@ -105,8 +222,236 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор'
     )
+    created = models.DateTimeField(
+        'Дата подписки',
+        default=timezone.now,
+        db_index=True,
+    )
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'author'], name='follow')
         ]
+
+
+class AuthorStats(models.Model):
+    """Denormalized per-author counters, kept in sync by signals."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число публикаций'
+    )
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-follower_count'], name='authorstats_followers_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.post_count}/{self.follower_count}'
+
+
+class GroupStats(models.Model):
+    """Precomputed group directory entry, refreshed on post changes."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Группа'
+    )
+    last_post_at = models.DateTimeField(
+        blank=True, null=True,
+        verbose_name='Последняя публикация'
+    )
+    top_authors_json = models.TextField(
+        default='[]',
+        verbose_name='Самые активные авторы'
+    )
+
+    @property
+    def top_authors(self) -> list:
+        """``[{'username': ..., 'posts': ...}]``, the most active first."""
+        return json.loads(self.top_authors_json)
+
+    def __str__(self):
+        return f'{self.group}: {self.last_post_at}'
+
+
+class GroupAuthorStats(models.Model):
+    """Posts of an author in a group, kept in sync by signals."""
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='author_stats',
+        verbose_name='Группа'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число публикаций'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'author'], name='group_author'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['group', '-post_count', 'author'],
+                name='group_author_posts_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.group}: {self.author} ({self.post_count})'
+
+
+class FollowSuggestion(models.Model):
+    """Author followed by people the user follows, precomputed."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    score = models.PositiveIntegerField(
+        verbose_name='Общих подписок'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='follow_suggestion'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score', 'author'],
+                name='suggestion_user_score_idx'
+            ),
+        ]
+
+
+class ImageBlob(models.Model):
+    """Stored image file, found by content hash and reference-counted."""
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Файл'
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        db_index=True,
+        verbose_name='SHA-256'
+    )
+    size = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Размер'
+    )
+    refs = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число ссылок'
+    )
+
+    def __str__(self):
+        return f'{self.name}: {self.refs}'
+
+
+class ImageVariant(models.Model):
+    """Pre-rendered width and format variant of a post image."""
+    source = models.CharField(
+        max_length=100,
+        verbose_name='Исходный файл'
+    )
+    name = models.CharField(
+        max_length=255,
+        verbose_name='Файл'
+    )
+    format = models.CharField(
+        max_length=8,
+        verbose_name='Формат'
+    )
+    width = models.PositiveIntegerField(verbose_name='Ширина')
+    height = models.PositiveIntegerField(verbose_name='Высота')
+    size = models.PositiveIntegerField(verbose_name='Размер')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'format', 'width'], name='image_variant'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.source}: {self.format} {self.width}w'
+
+
+class TrendingScore(models.Model):
+    """Decayed recent activity around a post; see ``posts.trending``."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Публикация'
+    )
+    score = models.FloatField(verbose_name='Рейтинг')
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-score', '-post'], name='trending_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.3f}'
+
+
+class TimelineEntry(models.Model):
+    """Post delivered to a follower's feed at write time (fan-out)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Публикация'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='timeline_entry'
+            )
+        ]
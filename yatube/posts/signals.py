@@ -0,0 +1,121 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import blobs, caching, counters, directory, follows, timeline
+from .models import Comment, Follow, Group, Post, User
+
+NOT_LOADED = object()
+# What cards and the directory show of a user.
+USER_NAME_FIELDS: tuple = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.post_added(instance)
+        directory.refresh([instance.group_id])
+        timeline.fan_out_post(instance)
+        blobs.acquire(instance.image.name)
+        caching.bump(*caching.post_feeds(instance))
+        return
+    old_image = instance.loaded_value('image', NOT_LOADED)
+    # A ``FieldFile`` after ``save()``, a name when read from the database.
+    old_image = getattr(old_image, 'name', old_image)
+    if old_image is not NOT_LOADED and old_image != instance.image.name:
+        blobs.acquire(instance.image.name)
+        blobs.release(old_image)
+    old_author_id = instance.loaded_value('author_id', NOT_LOADED)
+    old_group_id = instance.loaded_value('group_id', NOT_LOADED)
+    if NOT_LOADED in (old_author_id, old_group_id):
+        caching.bump(*caching.post_feeds(instance))
+        return
+    counters.post_moved(instance, old_author_id, old_group_id)
+    if (old_author_id, old_group_id) != (
+        instance.author_id, instance.group_id
+    ):
+        directory.refresh([old_group_id, instance.group_id])
+    if old_author_id != instance.author_id:
+        timeline.retract_post(instance)
+        timeline.fan_out_post(instance)
+    caching.bump(
+        *caching.post_feeds(instance, old_author_id, old_group_id)
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.post_removed(instance)
+    directory.refresh([instance.group_id])
+    blobs.release(instance.image.name)
+    caching.bump(*caching.post_feeds(instance))
+
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, instance, created=False, **kwargs):
+    if created:
+        directory.refresh([instance.pk])
+    caching.bump(caching.EVERY_FEED)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.comment_added(instance)
+    if instance.post_id is not None:
+        caching.bump(*caching.post_feeds(instance.post))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.comment_removed(instance)
+    post = Post.objects.filter(
+        pk=instance.post_id
+    ).only('author', 'group').first()
+    if post is not None:
+        caching.bump(*caching.post_feeds(post))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created and not follows.in_bulk():
+        counters.follow_added(instance)
+        timeline.add_follow(instance.user_id, instance.author_id)
+        caching.bump(f'follow:{instance.user_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if follows.in_bulk():
+        return
+    counters.follow_removed(instance)
+    timeline.remove_follow(instance.user_id, instance.author_id)
+    caching.bump(f'follow:{instance.user_id}')
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    """Read the names about to be replaced: cards show them and
+    ``directory`` copies the username."""
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+        USER_NAME_FIELDS
+    ):
+        # E.g. ``last_login`` on every login.
+        return
+    instance._old_names = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*USER_NAME_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    old_names = instance.__dict__.pop('_old_names', None)
+    if old_names is None:
+        return
+    names = dict(zip(USER_NAME_FIELDS, old_names))
+    if names['username'] != instance.username:
+        directory.refresh_author(instance.pk)
+    if any(getattr(instance, name) != names[name] for name in names):
+        # Cards and cached feeds show the author's name.
+        caching.bump(caching.EVERY_FEED)
@@ -0,0 +1,42 @@
+"""Storage that keeps one file per distinct image content.
+
+``ContentAddressedStorage`` hashes every upload. When a file with the
+same SHA-256 is already stored, the upload is dropped and the name of
+that file is returned, so reposted images share one file and, as sorl
+names thumbnails after the source, one set of thumbnails. ``ImageBlob``
+maps hashes to names and counts the posts using each file; see
+``posts.blobs`` for when a file may be deleted.
+"""
+import hashlib
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def content_hash(content) -> str:
+    """SHA-256 of a Django ``File``, read in chunks."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def _save(self, name, content):
+        image_blob = apps.get_model('posts', 'ImageBlob')
+        sha256 = content_hash(content)
+        stored = image_blob.objects.filter(sha256=sha256).order_by(
+            '-refs', 'pk'
+        ).values_list('name', flat=True)
+        for stored_name in stored:
+            if self.exists(stored_name):
+                return stored_name
+        name = super()._save(name, content)
+        image_blob.objects.update_or_create(
+            name=name, defaults={'sha256': sha256, 'size': content.size}
+        )
+        return name
@@ -0,0 +1,124 @@
+"""'Who to follow': authors followed by the authors a user follows.
+
+Counting friends of friends walks every two-step path from a user, which
+for a user with thousands of follows is far too much for a request. So
+``compute`` ranks the candidates ahead of time, for users in batches
+with one ``INSERT ... SELECT`` each, and keeps the best ``SUGGESTIONS``
+per user in ``FollowSuggestion``; the ``compute_suggestions`` command
+runs it periodically. A request reads one index range of that table and
+skips authors followed since the last run.
+"""
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import AuthorStats, Follow, FollowSuggestion
+
+SUGGESTIONS: int = 50
+BATCH_SIZE: int = 200
+AUTHOR_FIELDS: tuple = ('username', 'first_name', 'last_name')
+
+# Candidates are the authors followed by the followed ones, ranked by
+# how many of them follow each; ``ROW_NUMBER()`` keeps the top of every
+# user. Every lookup of ``Follow`` here is served by its unique index.
+RANK_SQL = '''
+INSERT INTO {suggestion} (user_id, author_id, score)
+SELECT user_id, author_id, score FROM (
+    SELECT
+        followed.user_id AS user_id,
+        candidate.author_id AS author_id,
+        COUNT(*) AS score,
+        ROW_NUMBER() OVER (
+            PARTITION BY followed.user_id
+            ORDER BY COUNT(*) DESC, candidate.author_id
+        ) AS position
+    FROM {follow} followed
+    JOIN {follow} candidate ON candidate.user_id = followed.author_id
+    WHERE followed.user_id IN ({users})
+        AND candidate.author_id <> followed.user_id
+        AND NOT EXISTS (
+            SELECT 1 FROM {follow} existing
+            WHERE existing.user_id = followed.user_id
+                AND existing.author_id = candidate.author_id
+        )
+    GROUP BY followed.user_id, candidate.author_id
+) ranked
+WHERE position <= %s
+'''
+
+
+def _rank(user_ids, limit: int):
+    sql = RANK_SQL.format(
+        suggestion=connection.ops.quote_name(FollowSuggestion._meta.db_table),
+        follow=connection.ops.quote_name(Follow._meta.db_table),
+        users=', '.join(['%s'] * len(user_ids)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*user_ids, limit])
+
+
+def compute(user_ids=None, limit: int = SUGGESTIONS,
+            batch_size: int = BATCH_SIZE) -> int:
+    """Recompute the suggestions of ``user_ids``, or of everyone.
+
+    Returns the number of users computed.
+    """
+    suggestions = FollowSuggestion.objects.all()
+    if user_ids is None:
+        followers = Follow.objects.values_list('user_id', flat=True)
+        # Users who follow nobody any more have no friends of friends.
+        suggestions.exclude(user_id__in=followers).delete()
+        user_ids = followers.distinct().order_by('user_id')
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            suggestions.filter(user_id__in=batch).delete()
+            _rank(batch, limit)
+    return len(user_ids)
+
+
+def _unfollowed(queryset, user, author_field: str):
+    return queryset.annotate(followed=Exists(Follow.objects.filter(
+        user=user, author_id=OuterRef(author_field)
+    ))).filter(followed=False)
+
+
+def for_user(user, limit: int = SUGGESTIONS) -> list:
+    """Authors to suggest to ``user``, best first.
+
+    Each one has ``mutual``: how many followed authors follow them. Users
+    without suggestions yet get the most followed authors instead, with
+    ``mutual`` of zero.
+    """
+    suggestions = _unfollowed(
+        FollowSuggestion.objects.filter(user=user), user, 'author_id'
+    ).select_related('author').only(
+        'score', 'author', *(f'author__{name}' for name in AUTHOR_FIELDS)
+    ).order_by('-score', 'author_id')
+    authors = []
+    for suggestion in suggestions[:limit]:
+        suggestion.author.mutual = suggestion.score
+        authors.append(suggestion.author)
+    if len(authors) < limit:
+        authors += popular(
+            user, limit - len(authors), {author.pk for author in authors}
+        )
+    return authors
+
+
+def popular(user, limit: int, excluded=()) -> list:
+    """The most followed authors ``user`` does not follow yet."""
+    stats = _unfollowed(
+        AuthorStats.objects.filter(follower_count__gt=0).exclude(
+            user_id__in={user.pk, *excluded}
+        ),
+        user,
+        'user_id',
+    ).select_related('user').only(
+        'follower_count', 'user', *(f'user__{name}' for name in AUTHOR_FIELDS)
+    ).order_by('-follower_count', 'user_id')
+    authors = []
+    for row in stats[:limit]:
+        row.user.mutual = 0
+        authors.append(row.user)
+    return authors
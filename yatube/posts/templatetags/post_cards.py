@@ -0,0 +1,98 @@
+import re
+
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import caching, follows, thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE: str = 'posts/includes/post_card.html'
+FOLLOW_BUTTON_TEMPLATE: str = 'posts/includes/follow_button.html'
+# Left in the shared, cached card HTML where the follow button of the
+# current user goes; see ``follow_buttons``.
+FOLLOW_MARKER = re.compile(r'<!--follow:(\d+)-->')
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, show_group=True):
+    """Render the feed card of ``post`` from the fragment cache.
+
+    Usage: ``{% post_card post %}`` or ``{% post_card post False %}``
+    to hide the group link (on the group page itself).
+    """
+    render_context = context.render_context
+    if 'posts_card_version' not in render_context:
+        render_context['posts_card_version'] = caching.card_version()
+
+    def render():
+        if 'posts_image_variants' not in render_context:
+            # The first card missing from the cache looks up the image
+            # variants of the whole page.
+            render_context['posts_image_variants'] = thumbnails.variants_for(
+                context.get('page_obj') or [post]
+            )
+        state = {'complete': True}
+        html = render_to_string(CARD_TEMPLATE, {
+            'post': post,
+            'show_group': show_group,
+            'thumbnails_state': state,
+            'image_variants': render_context['posts_image_variants'],
+        })
+        return html, state['complete']
+
+    html = caching.render_card(
+        post,
+        'group' if show_group else 'plain',
+        render_context['posts_card_version'],
+        render,
+    )
+    return mark_safe(html)
+
+
+class FollowButtonsNode(template.Node):
+    def __init__(self, nodelist, excluded):
+        self.nodelist = nodelist
+        self.excluded = excluded
+
+    def render(self, context):
+        html = self.nodelist.render(context)
+        request = context.get('request')
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return FOLLOW_MARKER.sub('', html)
+        excluded = {user.pk}
+        excluded.update(value.resolve(context) for value in self.excluded)
+        author_ids = {
+            int(author_id) for author_id in FOLLOW_MARKER.findall(html)
+        } - excluded
+        following = follows.for_request(request).following(author_ids)
+        buttons = {
+            author_id: render_to_string(FOLLOW_BUTTON_TEMPLATE, {
+                'author_id': author_id,
+                'following': author_id in following,
+                'next': request.get_full_path(),
+            }, request=request)
+            for author_id in author_ids
+        }
+        return FOLLOW_MARKER.sub(
+            lambda match: buttons.get(int(match.group(1)), ''), html
+        )
+
+
+@register.tag
+def follow_buttons(parser, token):
+    """Put follow buttons of the current user into the cards inside.
+
+    Usage: ``{% follow_buttons %}...{% endfollow_buttons %}``, optionally
+    with author ids to show no button for: ``{% follow_buttons author.pk %}``.
+    The cards stay cached for everyone; the follow state of all their
+    authors is read in one query.
+    """
+    excluded = [
+        parser.compile_filter(bit) for bit in token.split_contents()[1:]
+    ]
+    nodelist = parser.parse(('endfollow_buttons',))
+    parser.delete_first_token()
+    return FollowButtonsNode(nodelist, excluded)
@@ -0,0 +1,80 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_thumbnail(context, post, geometry_string):
+    """URL of a pre-rendered thumbnail of ``post.image``.
+
+    Usage: ``{% post_thumbnail post "960x339" as image_url %}``.
+    Until the worker has rendered it, the original image is used and
+    ``thumbnails_state`` in the context (if any) is marked incomplete,
+    so the caller does not cache the fallback.
+    """
+    if not post.image:
+        return ''
+    url = thumbnails.lookup(post, geometry_string)
+    if url is None:
+        state = context.get('thumbnails_state')
+        if state is not None:
+            state['complete'] = False
+        url = post.image.url
+    return url
+
+
+@register.inclusion_tag('posts/includes/picture.html', takes_context=True)
+def post_picture(context, post, sizes='100vw', loading='lazy',
+                 css_class='card-img my-2'):
+    """``<picture>`` of ``post.image`` with a ``srcset`` per format.
+
+    Usage: ``{% post_picture post "(min-width: 960px) 960px, 100vw" %}``;
+    pass ``loading="eager"`` for an image above the fold. Widths,
+    heights and sizes come from the recorded variants; before they are
+    rendered the original image is shown and the context's
+    ``thumbnails_state`` is marked incomplete, as by ``post_thumbnail``.
+    """
+    variants = thumbnails.variants_of(post, context.get('image_variants'))
+    if not variants:
+        state = context.get('thumbnails_state')
+        if state is not None:
+            state['complete'] = False
+    fallback = variants.get('JPEG') or next(iter(variants.values()), None)
+    sources = [
+        {
+            'type': f'image/{image_format.lower()}',
+            'srcset': _srcset(formats),
+        }
+        for image_format, formats in variants.items()
+        if formats is not fallback
+    ]
+    default = None
+    if fallback:
+        # Browsers without ``srcset`` get the width of the old crop.
+        default = [
+            variant for variant in fallback
+            if variant.width <= thumbnails.IMAGE_ASPECT[0]
+        ][-1:] or fallback[:1]
+        default = default[0]
+    return {
+        'css_class': css_class,
+        'loading': loading,
+        'sizes': sizes,
+        'sources': sources,
+        'srcset': _srcset(fallback) if fallback else '',
+        'src': (
+            default_storage.url(default.name) if default else post.image.url
+        ),
+        'width': default.width if default else None,
+        'height': default.height if default else None,
+    }
+
+
+def _srcset(variants) -> str:
+    return ', '.join(
+        f'{default_storage.url(variant.name)} {variant.width}w'
+        for variant in variants
+    )
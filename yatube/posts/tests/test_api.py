@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedAPITests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-group', description='-'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_cursor_pages_and_sparse_fields(self):
+        """Лента отдаётся по курсору и только с запрошенными полями."""
+        url = reverse('posts:api_group_list', kwargs={'slug': 'test-group'})
+        first = self.client.get(url, {'limit': 2, 'fields': 'id,author'})
+        data = first.json()
+        self.assertEqual(data['results'], [
+            {'id': post.pk, 'author': 'author'}
+            for post in reversed(self.posts[1:])
+        ])
+        self.assertIsNone(data['previous'])
+        second = self.client.get(
+            url, {'limit': 2, 'fields': 'id', 'cursor': data['next']}
+        ).json()
+        self.assertEqual(second['results'], [{'id': self.posts[0].pk}])
+        self.assertIsNone(second['next'])
+        self.assertEqual(
+            self.client.get(url, {'fields': 'id,password'}).status_code, 400
+        )
+        self.assertEqual(self.client.get(url, {'limit': 0}).status_code, 400)
+
+    def test_not_modified_without_queries(self):
+        """Неизменная лента отвечает 304, не обращаясь к базе."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+        Post.objects.filter(pk=self.posts[0].pk).get().save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_detail_changes_with_comments(self):
+        """ETag поста меняется вместе с его комментариями."""
+        post = self.posts[0]
+        url = reverse('posts:api_post_detail', kwargs={'post_id': post.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.json()['comment_count'], 0)
+        post.comments.create(author=self.reader, text='Комментарий')
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comment_count'], 1)
+        missing = reverse('posts:api_post_detail', kwargs={'post_id': 0})
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_follow_feed(self):
+        """Лента подписок требует входа и меняется при подписке."""
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.reader)
+        response = self.client.get(url)
+        self.assertEqual(response.json()['results'], [])
+        self.assertIn('private', response['Cache-Control'])
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_follow_feed_version(self):
+        """ETag ленты подписок меняется с постами и комментариями
+        отслеживаемых авторов, популярных тоже, но не чужих."""
+        other = User.objects.create_user(username='other')
+        hot = User.objects.create_user(username='hot')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        url = reverse('posts:api_follow_index')
+        first = self.client.get(url)['ETag']
+        Post.objects.create(author=other, text='Чужой пост')
+        self.assertEqual(self.client.get(url)['ETag'], first)
+        self.posts[0].comments.create(author=other, text='Комментарий')
+        second = self.client.get(url)['ETag']
+        self.assertNotEqual(second, first)
+        with override_settings(POSTS_TIMELINE_FANOUT_LIMIT=1):
+            Follow.objects.create(user=other, author=hot)
+            Follow.objects.create(user=self.reader, author=hot)
+            third = self.client.get(url)['ETag']
+            self.assertNotEqual(third, second)
+            Post.objects.create(author=hot, text='Пост популярного автора')
+            response = self.client.get(url)
+        self.assertNotEqual(response['ETag'], third)
+        self.assertEqual(len(response.json()['results']), 4)
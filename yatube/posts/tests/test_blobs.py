@@ -0,0 +1,134 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from .. import thumbnails
+from ..models import ImageBlob, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\xFF\x00')
+
+
+def upload(name, content=SMALL_GIF):
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageDeduplicationTests(TransactionTestCase):
+    """Commits for real: files are deleted in on_commit callbacks."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.user = User.objects.create_user(username='meme')
+
+    def post(self, image):
+        return Post.objects.create(author=self.user, text='Мем', image=image)
+
+    def stored(self, name):
+        return os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+
+    def test_identical_uploads_share_a_file(self):
+        """Одинаковые картинки хранятся одним файлом с числом ссылок."""
+        first = self.post(upload('small.gif'))
+        second = self.post(upload('repost.gif'))
+        other = self.post(upload('small.gif', OTHER_GIF))
+        self.assertEqual(first.image.name, 'posts/small.gif')
+        self.assertEqual(second.image.name, 'posts/small.gif')
+        self.assertNotEqual(other.image.name, first.image.name)
+        self.assertEqual(
+            len(os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'posts'))), 2
+        )
+        blob = ImageBlob.objects.get(name='posts/small.gif')
+        self.assertEqual((blob.refs, blob.size), (2, len(SMALL_GIF)))
+
+    def test_last_reference_deletes_file_and_thumbnails(self):
+        """Файл и миниатюры удаляются вместе с последней ссылкой."""
+        first = self.post(upload('small.gif'))
+        second = self.post(upload('small.gif'))
+        for geometry, options in thumbnails.thumbnail_sizes().items():
+            thumbnail = thumbnails.backend.render(
+                'posts/small.gif', geometry, **options
+            )
+        first.delete()
+        self.assertTrue(self.stored('posts/small.gif'))
+        second.image = upload('other.gif', OTHER_GIF)
+        second.save()
+        self.assertFalse(self.stored('posts/small.gif'))
+        self.assertFalse(thumbnail.exists())
+        self.assertFalse(ImageBlob.objects.filter(
+            name='posts/small.gif'
+        ).exists())
+        self.assertEqual(ImageBlob.objects.get(name='posts/other.gif').refs, 1)
+
+    def test_name_taken_while_released_keeps_file(self):
+        """Файл, который новый пост взял во время удаления последней
+        ссылки, остаётся и снова учитывается."""
+        first = self.post(upload('small.gif'))
+        with transaction.atomic():
+            first.delete()
+            # The storage had found the file before the delete.
+            second = self.post('posts/small.gif')
+        self.assertTrue(self.stored('posts/small.gif'))
+        blob = ImageBlob.objects.get(name='posts/small.gif')
+        self.assertEqual((blob.refs, blob.size), (1, len(SMALL_GIF)))
+        second.delete()
+        self.assertFalse(self.stored('posts/small.gif'))
+
+    def test_dedupe_media(self):
+        """Команда объединяет копии, созданные до хранилища с хешами."""
+        # Copies stored before the hashing storage, unknown to it.
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        for name, content in (
+            ('a', SMALL_GIF), ('b', SMALL_GIF), ('c', SMALL_GIF),
+            ('unused', OTHER_GIF),
+        ):
+            path = os.path.join(TEMP_MEDIA_ROOT, 'posts', f'{name}.gif')
+            with open(path, 'wb') as file:
+                file.write(content)
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Копия', image=name)
+            for name in ('posts/b.gif', 'posts/b.gif', 'posts/c.gif')
+        ])
+        out = io.StringIO()
+        call_command('dedupe_media', '--dry-run', '--prune', stdout=out)
+        self.assertIn(
+            '2 duplicates and 1 unused would be deleted', out.getvalue()
+        )
+        self.assertTrue(self.stored('posts/c.gif'))
+
+        call_command('dedupe_media', '--prune', stdout=out)
+        self.assertEqual(
+            set(Post.objects.values_list('image', flat=True)),
+            {'posts/b.gif'},
+        )
+        self.assertEqual(
+            os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'posts')), ['b.gif']
+        )
+        self.assertEqual(
+            list(ImageBlob.objects.values_list('name', 'refs')),
+            [('posts/b.gif', 3)],
+        )
+        # The next identical upload finds the kept file.
+        self.assertEqual(self.post(upload('d.gif')).image.name, 'posts/b.gif')
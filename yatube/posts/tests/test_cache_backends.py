@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..cache_backends import MeteredLocMemCache, SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """Запись, чтение, add, incr, удаление и истечение срока."""
+        cache = self.cache
+        cache.set('page', '<p>Пост</p>')
+        self.assertEqual(cache.get('page'), '<p>Пост</p>')
+        self.assertFalse(cache.add('page', 'другое'))
+        self.assertTrue(cache.add('counter', 1, None))
+        self.assertEqual(cache.incr('counter'), 2)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        self.assertEqual(
+            cache.get_many(['page', 'counter', 'missing']),
+            {'page': '<p>Пост</p>', 'counter': 2},
+        )
+        cache.delete('page')
+        self.assertIsNone(cache.get('page'))
+        cache.set('short', 1, 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('short'))
+        self.assertTrue(cache.add('short', 2))
+
+    def test_shared_between_processes(self):
+        """Записи и инкременты видны другому экземпляру на том же файле."""
+        other = self.make_cache()
+        self.cache.add('generation', 1, None)
+        other.incr('generation')
+        self.assertEqual(self.cache.get('generation'), 2)
+        other.clear()
+        self.assertIsNone(self.cache.get('generation'))
+
+    def test_lru_eviction(self):
+        """При превышении лимитов вытесняются давно читанные записи."""
+        cache = self.make_cache(MAX_ENTRIES=4, CULL_FREQUENCY=2)
+        for key in 'abcd':
+            cache.set(key, key)
+            time.sleep(0.01)
+        with mock.patch('posts.cache_backends.ACCESS_RESOLUTION', 0):
+            cache.get('a')
+        cache.set('e', 'e')
+        self.assertEqual(sorted(cache.get_many('abcde')), ['a', 'e'])
+        self.assertEqual(cache.stats()['evictions'], 3)
+
+        cache = self.make_cache(MAX_SIZE=1000)
+        cache.clear()
+        for key in 'xyz':
+            cache.set(key, 'v' * 400)
+        self.assertLessEqual(cache.stats()['size'], 1000)
+        self.assertEqual(cache.get('z'), 'v' * 400)
+
+    def test_hit_miss_metrics(self):
+        """Попадания и промахи считаются в обоих бэкендах."""
+        for cache in (self.cache, MeteredLocMemCache('metrics', {})):
+            with self.subTest(backend=type(cache).__name__):
+                cache.set('key', 'value')
+                cache.get('key')
+                cache.get('missing')
+                cache.get_many(['key', 'missing'])
+                stats = cache.stats()
+                self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+                self.assertEqual(stats['hit_rate'], 0.5)
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..views import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.commenters = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(5)
+        ]
+        Comment.objects.bulk_create(
+            Comment(
+                post=cls.post,
+                author=cls.commenters[number % 5],
+                text=f'Комментарий {number}',
+            )
+            for number in range(COMMENTS_PER_PAGE + 5)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def test_first_page_and_load_more(self):
+        """Пост показывает первую страницу, фрагмент подгружает остальные."""
+        response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertTrue(comments.has_next())
+        fragment = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'comments': comments.next_cursor},
+        )
+        rest = fragment.context['comments']
+        self.assertEqual(
+            [comment.text for comment in rest],
+            [f'Комментарий {number}' for number in range(
+                COMMENTS_PER_PAGE, COMMENTS_PER_PAGE + 5
+            )],
+        )
+        self.assertFalse(rest.has_next())
+        self.assertNotContains(fragment, 'Показать ещё')
+
+    def test_authors_in_the_same_query(self):
+        """Авторы комментариев не догружаются по одному."""
+        with self.assertNumQueries(2):
+            list(self.client.get(self.url).context['comments'])
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Ещё один'
+        )
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_api_comments(self):
+        """API отдаёт комментарии страницами по курсору."""
+        url = reverse(
+            'posts:api_post_comments', kwargs={'post_id': self.post.pk}
+        )
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), 10)
+        self.assertEqual(first['results'][0]['author'], 'reader0')
+        second = self.client.get(url, {'cursor': first['next']}).json()
+        self.assertEqual(second['results'][0]['text'], 'Комментарий 10')
@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Первая группа', slug='first', description='-'
+        )
+        cls.other_group = Group.objects.create(
+            title='Вторая группа', slug='second', description='-'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def assert_counters(self, posts, group_posts, followers):
+        self.group.refresh_from_db()
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual(stats.post_count, posts)
+        self.assertEqual(self.group.post_count, group_posts)
+        self.assertEqual(stats.follower_count, followers)
+
+    def test_counters_follow_writes(self):
+        """Счетчики меняются при создании, переносе и удалении."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        Post.objects.bulk_create([
+            Post(author=self.author, group=self.group, text='Пачка')
+        ])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assert_counters(posts=2, group_posts=2, followers=1)
+
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assert_counters(posts=2, group_posts=1, followers=1)
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.post_count, 1)
+
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+        post.delete()
+        Follow.objects.all().delete()
+        self.assert_counters(posts=1, group_posts=1, followers=0)
+
+    def test_rebuild_command(self):
+        """Команда rebuild_counters пересчитывает счетчики с нуля."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.all().delete()
+        Group.objects.update(post_count=0)
+        Post.objects.update(comment_count=0)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assert_counters(posts=1, group_posts=1, followers=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_pages_read_counters(self):
+        """Страницы поста и профиля не считают посты автора."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        AuthorStats.objects.filter(user=self.author).update(post_count=42)
+        pages = {
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}):
+                'number_author_posts',
+            reverse('posts:profile', kwargs={'username': self.author}):
+                'post_count',
+        }
+        for url, variable in pages.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.context[variable], 42)
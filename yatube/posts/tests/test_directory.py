@@ -0,0 +1,132 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import directory
+from ..models import Group, GroupStats, Post, User
+
+
+class GroupDirectoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cats = Group.objects.create(
+            title='Коты', slug='cats', description='Про котов'
+        )
+        cls.dogs = Group.objects.create(
+            title='Собаки', slug='dogs', description='Про собак'
+        )
+        cls.anna, cls.boris, cls.vera, cls.gleb = [
+            User.objects.create_user(username=username)
+            for username in ('anna', 'boris', 'vera', 'gleb')
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, author, group=None):
+        return Post.objects.create(author=author, group=group, text='Пост')
+
+    def stats(self, group):
+        stats = GroupStats.objects.get(group=group)
+        return stats.last_post_at, stats.top_authors
+
+    def test_stats_follow_post_changes(self):
+        """Статистика групп обновляется при создании, переносе и удалении."""
+        for author, total in ((self.anna, 1), (self.boris, 3)):
+            for _ in range(total):
+                self.post(author, self.cats)
+        vera_post = self.post(self.vera, self.cats)
+        Post.objects.bulk_create([
+            Post(author=self.gleb, group=self.cats, text='Пачка')
+            for _ in range(2)
+        ])
+        self.assertEqual(self.stats(self.cats)[1], [
+            {'username': 'boris', 'posts': 3},
+            {'username': 'gleb', 'posts': 2},
+            {'username': 'anna', 'posts': 1},
+        ])
+        newest = Post.objects.filter(group=self.cats).first()
+        self.assertEqual(self.stats(self.cats)[0], newest.pub_date)
+
+        vera_post.group = self.dogs
+        vera_post.save()
+        self.assertEqual(self.stats(self.dogs), (
+            vera_post.pub_date, [{'username': 'vera', 'posts': 1}]
+        ))
+        vera_post.delete()
+        self.assertEqual(self.stats(self.dogs), (None, []))
+        Post.objects.filter(author=self.boris).first().delete()
+
+        incremental = {
+            stats.group_id: self.stats(stats.group_id)
+            for stats in GroupStats.objects.all()
+        }
+        directory.rebuild()
+        self.assertEqual(incremental, {
+            stats.group_id: self.stats(stats.group_id)
+            for stats in GroupStats.objects.all()
+        })
+        self.assertEqual(self.stats(self.cats)[1][:2], [
+            {'username': 'boris', 'posts': 2},
+            {'username': 'gleb', 'posts': 2},
+        ])
+
+    def test_directory_page_is_one_query(self):
+        """Каталог групп читается одним запросом на страницу."""
+        Group.objects.bulk_create([
+            Group(title=f'Группа {number}', slug=f'group-{number}')
+            for number in range(40)
+        ])
+        self.post(self.anna, self.dogs)
+        self.post(self.boris, self.dogs)
+        self.post(self.anna, self.cats)
+        client = Client()
+        with self.assertNumQueries(1):
+            response = client.get(reverse('posts:group_directory'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj)[:2], [self.dogs, self.cats])
+        self.assertContains(response, 'href="/profile/boris/"')
+        # Groups bulk-created without a stats row still render.
+        with self.assertNumQueries(1):
+            response = client.get(
+                reverse('posts:group_directory'),
+                {'cursor': page_obj.next_cursor},
+            )
+        self.assertEqual(len(response.context['page_obj']), 12)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_directory_api(self):
+        """API каталога отдаёт статистику групп."""
+        post = self.post(self.anna, self.cats)
+        response = Client().get(
+            reverse('posts:api_group_directory'), {'limit': 1}
+        )
+        data = response.json()
+        self.assertEqual(data['results'], [{
+            'slug': 'cats',
+            'title': 'Коты',
+            'description': 'Про котов',
+            'post_count': 1,
+            'last_post_at': post.pub_date.isoformat(),
+            'top_authors': [{'username': 'anna', 'posts': 1}],
+            'url': '/group/cats/',
+        }])
+        response = Client().get(
+            reverse('posts:api_group_directory'),
+            {'limit': 1, 'cursor': data['next']},
+        )
+        self.assertEqual(response.json()['results'][0]['top_authors'], [])
+
+    def test_rename_refreshes_top_authors(self):
+        """Переименование автора обновляет статистику его групп, а
+        сохранение без смены имени не делает лишних запросов."""
+        self.post(self.anna, self.cats)
+        self.post(self.boris, self.dogs)
+        anna = User.objects.get(pk=self.anna.pk)
+        anna.username = 'anya'
+        anna.save()
+        self.assertEqual(
+            self.stats(self.cats)[1], [{'username': 'anya', 'posts': 1}]
+        )
+        with self.assertNumQueries(1):
+            anna.save(update_fields=['last_login'])
@@ -0,0 +1,50 @@
+import random
+import shutil
+import tempfile
+from collections import Counter
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from .. import fake_data
+from ..models import Comment, Follow, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class FakeDataTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generate(self):
+        """Данные создаются с перекосом в пользу популярных авторов."""
+        counts = fake_data.generate(
+            users=50, groups=3, posts=500, comments=300, follows=200,
+            images=2, image_share=0.5,
+        )
+        self.assertEqual(counts['posts'], Post.objects.count())
+        self.assertEqual(counts['follows'], Follow.objects.count())
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(
+            Post.objects.exclude(image='').values('image').distinct().count(),
+            2,
+        )
+        per_author = sorted(Counter(
+            Post.objects.values_list('author_id', flat=True)
+        ).values(), reverse=True)
+        median = per_author[len(per_author) // 2]
+        self.assertGreater(per_author[0], 10 * median)
+        top = User.objects.get(username='fake0')
+        self.assertEqual(top.stats.post_count, per_author[0])
+        self.assertEqual(
+            sum(Post.objects.values_list('comment_count', flat=True)), 300
+        )
+
+    def test_zipf(self):
+        """Первый элемент выбирается чаще последнего."""
+        draw = fake_data.Zipf('abcd', 1.0, random.Random(1))
+        drawn = Counter(draw() for _ in range(1000))
+        self.assertGreater(drawn['a'], drawn['d'] * 2)
@@ -0,0 +1,176 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.queries import REPEAT_LIMIT, assert_queries
+
+from .. import follows
+from ..models import AuthorStats, Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class FollowStateTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(4)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+        Follow.objects.create(user=cls.fan, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT "posts_follow"')
+        ]
+
+    def test_profile_following_is_about_the_reader(self):
+        """Кнопка подписки зависит от подписки читателя, а не чужой."""
+        url = reverse('posts:profile', kwargs={'username': 'author0'})
+        response, queries = self.follow_queries(url)
+        self.assertFalse(response.context['following'])
+        self.assertEqual(len(queries), 1)
+        self.assertNotContains(response, 'name="follow"')
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        self.assertTrue(self.client.get(url).context['following'])
+
+    def test_feed_buttons_in_one_query(self):
+        """Кнопки подписки в ленте читаются одним запросом."""
+        Follow.objects.create(user=self.reader, author=self.authors[1])
+        response, queries = self.follow_queries(reverse('posts:index'))
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'name="follow"', count=3)
+        self.assertContains(response, 'name="unfollow"', count=1)
+        self.assertNotContains(response, '<!--follow:')
+
+    def test_follow_feed_knows_its_authors(self):
+        """В ленте подписок кнопки «Отписаться» без запроса подписок."""
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        response, queries = self.follow_queries(reverse('posts:follow_index'))
+        self.assertContains(response, 'name="unfollow"', count=1)
+        self.assertEqual(queries, [])
+
+    def test_anonymous_feed_has_no_buttons(self):
+        """Гость не видит кнопок подписки."""
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, 'follow_bulk')
+        self.assertNotContains(response, '<!--follow:')
+
+    def test_bulk_follow_queries_do_not_grow(self):
+        """Массовая подписка не делает запросов на каждого автора."""
+        ids = [
+            User.objects.create_user(username=f'new{number}').pk
+            for number in range(2 * REPEAT_LIMIT)
+        ]
+        with assert_queries(25):
+            self.client.post(reverse('posts:follow_bulk'), {'follow': ids})
+        followers = AuthorStats.objects.filter(
+            user_id__in=ids
+        ).values_list('follower_count', flat=True)
+        self.assertEqual(list(followers), [1] * len(ids))
+        with assert_queries(25):
+            self.client.post(reverse('posts:follow_bulk'), {'unfollow': ids})
+        self.assertEqual(list(followers.all()), [0] * len(ids))
+        self.assertFalse(self.reader.follower.exists())
+
+    def test_bulk_follow_and_unfollow(self):
+        """Массовая подписка и отписка двигают счётчики и ленты."""
+        Follow.objects.create(user=self.reader, author=self.authors[3])
+        ids = [author.pk for author in self.authors]
+        response = self.client.post(reverse('posts:follow_bulk'), {
+            'follow': [ids[0], ids[1], self.reader.pk, 0, 'x'],
+            'unfollow': [ids[3]],
+        })
+        self.assertEqual(response.json(), {'following': ids[:2]})
+        self.assertEqual(
+            set(self.reader.follower.values_list('author_id', flat=True)),
+            set(ids[:2]),
+        )
+        self.authors[0].stats.refresh_from_db()
+        self.assertEqual(self.authors[0].stats.follower_count, 2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        response = self.client.post(reverse('posts:follow_bulk'), {
+            'unfollow': ids[1], 'next': reverse('posts:index'),
+        })
+        self.assertRedirects(response, reverse('posts:index'))
+        response = self.client.post(reverse('posts:follow_bulk'), {
+            'follow': ids[2], 'next': 'https://example.com/',
+        })
+        self.assertEqual(response.json(), {'following': [ids[2]]})
+        self.assertEqual(
+            self.client.get(reverse('posts:follow_bulk')).status_code, 405
+        )
+        # The per-row receivers leave the bulk unfollow alone.
+        self.client.post(reverse('posts:follow_bulk'), {'unfollow': ids[0]})
+        self.authors[0].stats.refresh_from_db()
+        self.assertEqual(self.authors[0].stats.follower_count, 1)
+
+
+class ConcurrentFollowTests(TransactionTestCase):
+    """Follows from many threads at once, each on its own connection."""
+
+    READERS: int = 8
+    ROUNDS: int = 5
+
+    def setUp(self):
+        if connection.is_in_memory_db():
+            self.skipTest('Нужна база в файле, см. core.testing.')
+        cache.clear()
+
+    def test_concurrent_follows_and_unfollows(self):
+        """Одновременные подписки и отписки на одного автора проходят
+        без ошибок блокировки, а число подписчиков точное."""
+        author = User.objects.create_user(username='author')
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(self.READERS)
+        ]
+        barrier = threading.Barrier(len(readers))
+        errors = []
+
+        def work(reader):
+            try:
+                barrier.wait()
+                for _ in range(self.ROUNDS):
+                    follows.follow(reader, [author.pk])
+                    follows.unfollow(reader, [author.pk])
+                follows.follow(reader, [author.pk])
+            except Exception as error:
+                errors.append(repr(error))
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=work, args=(reader,))
+            for reader in readers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            AuthorStats.objects.get(user=author).follower_count,
+            self.READERS,
+        )
+        self.assertEqual(author.following.count(), self.READERS)
@@ -80,7 +80,7 @@ class PostFormTests(TestCase):
             post_.group: post.group,
             post_.author: post.author,
             post_.text: post.text,
-            post_.image: post.image,
+            'posts/small.gif': post.image.name,
         }
         for object_, value in objects_names.items():
             with self.subTest(object_=object_):
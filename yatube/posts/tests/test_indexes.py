@@ -0,0 +1,95 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса SQLite')
+class FeedIndexTests(TestCase):
+    """Запросы лент читают строки по индексу, без сортировки в памяти."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост'
+        )
+        Comment.objects.create(post=cls.post, author=cls.user, text='Да')
+        Follow.objects.create(user=cls.user, author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def query_plans(self, url, table, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params)
+        plans = []
+        for query in queries:
+            sql = query['sql']
+            if f'FROM "{table}"' not in sql or sql.startswith('SELECT COUNT('):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans.append(' | '.join(row[-1] for row in cursor))
+        self.assertTrue(plans, f'Нет запросов к {table} на {url}')
+        return plans
+
+    def assert_uses_index(self, plan, index):
+        self.assertIn(index, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds_use_composite_indexes(self):
+        """Каждая лента использует свой составной индекс."""
+        feeds = {
+            reverse('posts:index'): 'post_pub_date_idx',
+            reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ): 'post_group_pub_date_idx',
+            reverse(
+                'posts:profile', kwargs={'username': self.user.username}
+            ): 'post_author_pub_date_idx',
+        }
+        for url, index in feeds.items():
+            for params in ({}, {'cursor': ''}):
+                with self.subTest(url=url, params=params):
+                    cache.clear()
+                    for plan in self.query_plans(url, 'posts_post', params):
+                        self.assert_uses_index(plan, index)
+
+    def test_follow_feed_reads_timeline_index(self):
+        """Лента подписок читает материализованную ленту по индексу."""
+        url = reverse('posts:follow_index')
+        for plan in self.query_plans(url, 'posts_post'):
+            self.assertIn('posts_timelineentry', plan)
+            self.assertNotRegex(plan, r'SCAN (TABLE )?posts_post(?! USING)')
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_cursor_page_seeks_by_index(self):
+        """Переход по курсору ищет строки в индексе."""
+        for i in range(15):
+            Post.objects.create(author=self.user, text=f'Пост {i}')
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        cursor = self.client.get(url).context['page_obj'].next_cursor
+        for plan in self.query_plans(url, 'posts_post', {'cursor': cursor}):
+            self.assert_uses_index(plan, 'post_author_pub_date_idx')
+
+    def test_comments_use_post_index(self):
+        """Комментарии поста выбираются по индексу."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        for plan in self.query_plans(url, 'posts_comment'):
+            self.assert_uses_index(plan, 'comment_post_created_idx')
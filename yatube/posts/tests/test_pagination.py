@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..helpers import CursorPage, CursorPaginator
+from ..models import Group, Post
+
+User = get_user_model()
+
+POSTS_COUNT: int = 25
+PER_PAGE: int = 10
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Тестовая Группа',
+            slug='prosaics',
+            description='тестовое описание группы'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Пост {i}')
+            for i in range(POSTS_COUNT)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_pages_follow_each_other(self):
+        """Страницы курсора не пересекаются и покрывают всю ленту."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        page = paginator.get_page(None)
+        seen = list(page)
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            seen.extend(page)
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(page), POSTS_COUNT % PER_PAGE)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Ссылка «Предыдущая» возвращает ту же страницу."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(first.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_no_count_and_no_offset(self):
+        """Курсорная страница не выполняет COUNT(*) и OFFSET."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        cursor = paginator.get_page(None).next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator.get_page(cursor))
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Некорректный курсор открывает первую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        for cursor in ('garbage', 'W10', '!!'):
+            with self.subTest(cursor=cursor):
+                page = paginator.get_page(cursor)
+                self.assertEqual(
+                    list(page), list(paginator.get_page(None))
+                )
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_feeds_switch_to_cursor_mode(self):
+        """Ленты используют курсорную пагинацию при включенной настройке."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.client.get(url)
+                page_obj = response.context['page_obj']
+                self.assertIsInstance(page_obj, CursorPage)
+                self.assertEqual(len(page_obj), PER_PAGE)
+                self.assertContains(
+                    response, f'?cursor={page_obj.next_cursor}'
+                )
+                response = self.client.get(
+                    url, {'cursor': page_obj.next_cursor}
+                )
+                self.assertEqual(len(response.context['page_obj']), PER_PAGE)
+
+    def test_cursor_link_switches_offset_feed(self):
+        """Параметр cursor включает курсорный режим и без настройки."""
+        response = self.client.get(reverse('posts:index'), {'cursor': ''})
+        self.assertIsInstance(response.context['page_obj'], CursorPage)
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+CARD = Template('{% load post_cards %}{% post_card post %}')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-group', description='-'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Исходный текст'
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostCardCacheTests.user)
+        cache.clear()
+
+    def render(self):
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        return CARD.render(Context({'post': post}))
+
+    def test_warm_card_is_served_from_cache(self):
+        """Повторный рендер карточки берется из кэша."""
+        first = self.render()
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        self.assertEqual(self.render(), first)
+        self.assertIn('Исходный текст', first)
+
+    def test_edit_invalidates_card(self):
+        """Редактирование через post_edit обновляет карточку."""
+        self.render()
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый текст', 'group': self.group.pk},
+        )
+        self.assertIn('Новый текст', self.render())
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_client.get(url), 'Новый текст'
+                )
+
+    def test_comment_and_group_changes_invalidate_card(self):
+        """Новый комментарий и переименование группы обновляют карточку."""
+        self.render()
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        self.assertIn('<b>Комментариев:</b> 1', self.render())
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertIn('Новое название', self.render())
+
+    def test_author_rename_invalidates_card_and_feeds(self):
+        """Смена имени автора обновляет карточку и закэшированные ленты."""
+        self.render()
+        self.authorized_client.get(reverse('posts:index'))
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name, author.last_name = 'Лев', 'Толстой'
+        author.save()
+        self.assertIn('Лев Толстой', self.render())
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')), 'Лев Толстой'
+        )
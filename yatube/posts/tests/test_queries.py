@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+POSTS_COUNT: int = 12
+
+
+class FeedQueriesTests(TestCase):
+    """Число запросов ленты не зависит от числа постов на странице."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание',
+        )
+        for i in range(POSTS_COUNT):
+            author = User.objects.create_user(
+                username=f'user{i}', first_name='Имя', last_name=f'{i}'
+            )
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-'
+            )
+            Post.objects.create(author=author, group=group, text=f'Пост {i}')
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост автора {i}'
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueriesTests.reader)
+        cache.clear()
+
+    def test_guest_feed_queries(self):
+        """Ленты для гостя укладываются в фиксированное число запросов."""
+        pages = {
+            reverse('posts:index'): 2,
+            reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ): 2,
+            reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ): 2,
+        }
+        for url, queries in pages.items():
+            for page in ('1', '2'):
+                with self.subTest(url=url, page=page):
+                    cache.clear()
+                    with self.assertNumQueries(queries):
+                        self.guest_client.get(url, {'page': page})
+
+    def test_follow_feed_queries(self):
+        """Лента подписок укладывается в фиксированное число запросов."""
+        for page in ('1', '2'):
+            with self.subTest(page=page):
+                with self.assertNumQueries(4):
+                    self.authorized_client.get(
+                        reverse('posts:follow_index'), {'page': page}
+                    )
@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import fulltext
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.other = User.objects.create_user(username='tolstoy')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-group', description='-'
+        )
+        cls.in_text = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Севастопольские рассказы',
+        )
+        cls.in_comment = Post.objects.create(
+            author=cls.other, text='Война и мир'
+        )
+        Comment.objects.create(
+            post=cls.in_comment, author=cls.author,
+            text='Тоже про Севастопольские бастионы',
+        )
+        Post.objects.create(author=cls.other, text='Анна Каренина')
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_ranked_results_with_comments(self):
+        """Совпадение в тексте поста выше совпадения в комментарии."""
+        self.assertTrue(fulltext.fts_available())
+        self.assertEqual(
+            self.search(q='севастопольск'),
+            [self.in_text.pk, self.in_comment.pk],
+        )
+        self.assertEqual(self.search(q='каренина "OR'), [])
+
+    def test_filters(self):
+        """Результаты фильтруются по группе и автору."""
+        self.assertEqual(
+            self.search(q='севастопольские', group='test-group'),
+            [self.in_text.pk],
+        )
+        self.assertEqual(
+            self.search(q='севастопольские', author='tolstoy'),
+            [self.in_comment.pk],
+        )
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'мир', 'author': 'nobody'}
+        )
+        self.assertIsNone(response.context['page_obj'])
+        self.assertTrue(response.context['form'].errors['author'])
+
+    def test_index_follows_writes(self):
+        """Индекс обновляется при правке, удалении и bulk_create."""
+        Post.objects.filter(pk=self.in_text.pk).update(text='Детство')
+        Comment.objects.all().delete()
+        self.assertEqual(self.search(q='севастопольские'), [])
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Отрочество {i}')
+            for i in range(11)
+        )
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'отрочество', 'page': 2}
+        )
+        self.assertEqual(response.context['page_obj'].paginator.count, 11)
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertContains(response, '?q=%D0%BE%D1%82%D1%80%D0%BE')
+        Post.objects.get(pk=self.in_comment.pk).delete()
+        self.assertEqual(self.search(q='война'), [])
+
+    @override_settings(POSTS_SEARCH_BACKEND='substring')
+    def test_fallback_backend(self):
+        """Запасной бэкенд находит те же посты без индекса."""
+        self.assertEqual(
+            sorted(self.search(q='Севастопольские')),
+            sorted([self.in_text.pk, self.in_comment.pk]),
+        )
+        self.assertEqual(
+            self.search(q='Севастопольские', group='test-group'),
+            [self.in_text.pk],
+        )
+
+    def test_api(self):
+        """API поиска отдает JSON с результатами и ошибками."""
+        response = self.client.get(
+            reverse('posts:api_search'), {'q': 'каренина'}
+        )
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['text'], 'Анна Каренина')
+        self.assertEqual(data['results'][0]['author'], 'tolstoy')
+        response = self.client.get(reverse('posts:api_search'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('q', response.json()['errors'])
@@ -0,0 +1,132 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import suggestions
+from ..models import Follow, FollowSuggestion
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader, cls.anna, cls.boris, cls.vera, cls.gleb = [
+            User.objects.create_user(username=name)
+            for name in ('reader', 'anna', 'boris', 'vera', 'gleb')
+        ]
+        # reader -> anna, boris; both follow vera, only anna follows gleb.
+        for user, author in (
+            (cls.reader, cls.anna), (cls.reader, cls.boris),
+            (cls.anna, cls.vera), (cls.boris, cls.vera),
+            (cls.anna, cls.gleb), (cls.anna, cls.reader),
+            (cls.boris, cls.anna),
+        ):
+            Follow.objects.create(user=user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_friends_of_friends_ranking(self):
+        """Кандидаты ранжируются по числу общих подписок."""
+        call_command('compute_suggestions', stdout=io.StringIO())
+        self.assertEqual(
+            list(FollowSuggestion.objects.filter(user=self.reader).order_by(
+                '-score', 'author_id'
+            ).values_list('author__username', 'score')),
+            [('vera', 2), ('gleb', 1)],
+        )
+        # Neither the reader nor already followed authors are suggested.
+        self.assertFalse(FollowSuggestion.objects.filter(
+            user=self.boris, author__in=[self.boris, self.anna]
+        ).exists())
+
+    def test_limit_keeps_the_top(self):
+        """Для каждого пользователя хранится не больше limit предложений."""
+        suggestions.compute(limit=1)
+        self.assertEqual(
+            list(FollowSuggestion.objects.filter(
+                user=self.reader
+            ).values_list('author__username', flat=True)),
+            ['vera'],
+        )
+
+    def test_new_follows_are_skipped_until_recompute(self):
+        """Подписка после расчёта сразу убирает автора из предложений."""
+        suggestions.compute()
+        Follow.objects.create(user=self.reader, author=self.vera)
+        with self.assertNumQueries(1):
+            people = suggestions.for_user(self.reader, 1)
+        self.assertEqual([(self.gleb, 1)], [
+            (person, person.mutual) for person in people
+        ])
+
+    def test_popular_authors_without_suggestions(self):
+        """Без предложений показываются популярные авторы."""
+        newcomer = User.objects.create_user(username='newcomer')
+        people = suggestions.for_user(newcomer, 2)
+        self.assertEqual(people, [self.anna, self.vera])
+        self.assertEqual([person.mutual for person in people], [0, 0])
+
+    def test_suggestions_page(self):
+        """Страница «Кого читать» с кнопками подписки."""
+        suggestions.compute()
+        response = self.client.get(reverse('posts:follow_suggestions'))
+        self.assertEqual(list(response.context['people'])[:2], [
+            self.vera, self.gleb,
+        ])
+        self.assertContains(response, 'общих подписок: 2')
+        self.assertContains(response, 'name="follow"', count=2)
+        self.assertNotContains(response, 'name="unfollow"')
+        self.assertRedirects(
+            Client().get(reverse('posts:follow_suggestions')),
+            reverse('users:login') + '?next='
+            + reverse('posts:follow_suggestions'),
+        )
+
+    def test_follower_and_following_pages(self):
+        """Списки подписчиков и подписок, новые подписки первыми."""
+        response = self.client.get(
+            reverse('posts:followers', args=['anna'])
+        )
+        self.assertEqual(response.context['people'], [
+            self.boris, self.reader,
+        ])
+        # No button for the reader, "unfollow" for boris.
+        self.assertContains(response, 'name="unfollow"', count=1)
+        self.assertNotContains(response, 'name="follow"')
+        response = self.client.get(
+            reverse('posts:following', args=['reader'])
+        )
+        self.assertEqual(response.context['people'], [
+            self.boris, self.anna,
+        ])
+        self.assertContains(response, 'name="unfollow"', count=2)
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:following', args=['nobody'])
+            ).status_code,
+            404,
+        )
+
+    def test_follow_list_is_paginated_by_cursor(self):
+        """Список подписчиков листается курсором."""
+        for number in range(31):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'fan{number}'),
+                author=self.gleb,
+            )
+        url = reverse('posts:followers', args=['gleb'])
+        page = self.client.get(url).context['page_obj']
+        self.assertEqual(len(page), 30)
+        self.assertTrue(page.has_next())
+        rest = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual(rest.context['people'][-1], self.anna)
+        self.assertEqual(len(rest.context['people']), 2)
@@ -0,0 +1,216 @@
+import io
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image, features
+
+from .. import thumbnails
+from ..models import ImageVariant, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+CARD = Template('{% load post_cards %}{% post_card post %}')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаляем тестовые медиа."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ThumbnailTests.user)
+        cache.clear()
+
+    def render_card(self):
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        return CARD.render(Context({'post': post}))
+
+    def test_miss_falls_back_without_rendering(self):
+        """Пока миниатюры нет, показывается оригинал без вызова Pillow."""
+        with mock.patch.object(thumbnails.backend, 'render') as render:
+            html = self.render_card()
+            response = self.authorized_client.get(
+                reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+            )
+        render.assert_not_called()
+        self.assertIn(self.post.image.url, html)
+        self.assertContains(response, self.post.image.url)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        self.assertIn('Без сигналов', self.render_card())
+
+    def test_rendered_thumbnail_is_used(self):
+        """После работы воркера шаблоны ссылаются на миниатюру."""
+        thumbnails.render_all(self.post.image.name)
+        url = thumbnails.lookup(self.post, '960x339')
+        self.assertIsNotNone(url)
+        self.assertNotEqual(url, self.post.image.url)
+        variant = thumbnails.variants_of(self.post)['JPEG'][0]
+        first = self.render_card()
+        self.assertIn(f'{default_storage.url(variant.name)} 320w', first)
+        self.assertNotIn(self.post.image.url, first)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        self.assertEqual(self.render_card(), first)
+
+    def test_views_schedule_thumbnails(self):
+        """Создание и смена картинки ставят миниатюры в очередь."""
+        with mock.patch('posts.views.thumbnails.schedule') as schedule:
+            self.authorized_client.post(reverse('posts:post_create'), data={
+                'text': 'Новый пост',
+                'image': SimpleUploadedFile(
+                    name='new.gif', content=SMALL_GIF,
+                    content_type='image/gif'
+                ),
+            })
+            post = Post.objects.get(text='Новый пост')
+            self.assertTrue(post.image)
+            schedule.assert_called_once_with(post)
+            schedule.reset_mock()
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                data={'text': 'Только текст'},
+            )
+            schedule.assert_not_called()
+
+
+def jpeg(width, height) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 100, 50)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photo')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Большая картинка',
+            image=SimpleUploadedFile(
+                name='wide.jpg', content=jpeg(1000, 500),
+                content_type='image/jpeg'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_variants_up_to_source_width(self):
+        """Варианты не шире исходника, их размеры записаны в базу."""
+        thumbnails.render_variants(self.post.image.name)
+        variants = ImageVariant.objects.filter(
+            source=self.post.image.name, format='JPEG'
+        ).order_by('width')
+        self.assertEqual(
+            [(variant.width, variant.height) for variant in variants],
+            [(320, 113), (640, 226), (960, 339)],
+        )
+        for variant in variants:
+            with default_storage.open(variant.name) as file:
+                self.assertEqual(Image.open(file).size, (
+                    variant.width, variant.height
+                ))
+            self.assertEqual(variant.size, default_storage.size(variant.name))
+
+    def test_picture_needs_no_file_access(self):
+        """Разметка строится по записям в базе без чтения файлов."""
+        thumbnails.render_variants(self.post.image.name)
+        template = Template('{% load post_images %}{% post_picture post %}')
+        with mock.patch.object(default_storage, 'exists') as exists, \
+                mock.patch.object(default_storage, 'open') as open_:
+            with self.assertNumQueries(1):
+                html = template.render(Context({'post': self.post}))
+        exists.assert_not_called()
+        open_.assert_not_called()
+        self.assertEqual(html.count(' 320w'), 1 + ('WEBP' in (
+            thumbnails.variant_formats()
+        )))
+        self.assertIn('960w', html)
+        self.assertIn('width="960" height="339"', html)
+
+    @skipUnless(features.check('webp'), 'Pillow is built without WebP')
+    def test_webp_variants(self):
+        """WebP-варианты отдаются через <source> и меньше JPEG."""
+        thumbnails.render_variants(self.post.image.name)
+        sizes = dict(ImageVariant.objects.filter(
+            source=self.post.image.name, width=960
+        ).values_list('format', 'size'))
+        self.assertLess(sizes['WEBP'], sizes['JPEG'])
+        html = Template(
+            '{% load post_images %}{% post_picture post %}'
+        ).render(Context({'post': self.post}))
+        self.assertIn('<source type="image/webp"', html)
+
+    def test_feed_reads_variants_once(self):
+        """Варианты картинок всей страницы ленты читаются одним запросом."""
+        for number in range(3):
+            post = Post.objects.create(
+                author=self.user,
+                text=f'Картинка {number}',
+                image=SimpleUploadedFile(
+                    name=f'feed{number}.jpg', content=jpeg(400 + number, 300),
+                    content_type='image/jpeg'
+                ),
+            )
+            thumbnails.render_variants(post.image.name)
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse('posts:index'))
+        self.assertEqual(response.content.decode().count('320w'), 3 * (
+            len(thumbnails.variant_formats())
+        ))
+        self.assertEqual(len([
+            query for query in queries
+            if 'posts_imagevariant' in query['sql']
+        ]), 1)
+
+    def test_variants_go_with_the_image(self):
+        """Варианты удаляются вместе с картинкой."""
+        variants = thumbnails.render_variants(self.post.image.name)
+        thumbnails.delete_all(self.post.image.name)
+        self.assertFalse(ImageVariant.objects.exists())
+        for variant in variants:
+            self.assertFalse(default_storage.exists(variant.name))
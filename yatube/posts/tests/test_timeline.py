@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(TimelineTests.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        """Подписка переносит старые посты, новые доставляются сразу."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader
+            ).values_list('post_id', flat=True)),
+            {self.old_post.pk, new_post.pk}
+        )
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_unfollow_and_delete_clear_timeline(self):
+        """Отписка и удаление поста убирают записи из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Удалю')
+        post.delete()
+        self.assertEqual(self.feed(), [self.old_post])
+        self.reader.follower.filter(author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(POSTS_TIMELINE_FANOUT_LIMIT=0)
+    def test_hot_author_is_read_on_demand(self):
+        """Посты популярного автора читаются без записи в ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Хит')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @override_settings(POSTS_TIMELINE_FANOUT_LIMIT=2)
+    def test_author_crossing_the_limit_both_ways(self):
+        """Посты, написанные пока автор был популярным, не пропадают."""
+        other, late = [
+            User.objects.create_user(username=username)
+            for username in ('other', 'late')
+        ]
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        before = Post.objects.create(author=self.author, text='До')
+        # The third follower makes the author hot and gets no backfill.
+        Follow.objects.create(user=late, author=self.author)
+        hot = Post.objects.create(author=self.author, text='Хит')
+        self.assertFalse(TimelineEntry.objects.filter(post=hot).exists())
+        self.assertFalse(TimelineEntry.objects.filter(user=late).exists())
+        self.assertEqual(self.feed(), [hot, before, self.old_post])
+
+        Follow.objects.filter(user=other).delete()
+        expected = {self.old_post.pk, before.pk, hot.pk}
+        for user in (self.reader, late):
+            self.assertEqual(set(TimelineEntry.objects.filter(
+                user=user
+            ).values_list('post_id', flat=True)), expected)
+        self.assertFalse(TimelineEntry.objects.filter(user=other).exists())
+        self.assertEqual(self.feed(), [hot, before, self.old_post])
+        self.client.force_login(late)
+        self.assertEqual(self.feed(), [hot, before, self.old_post])
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post])
@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import transfer
+from ..models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+PUB_DATE = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание, "с кавычками"'
+        )
+        post = Post.objects.create(
+            author=self.author, group=group, text='Первая строка\nвторая'
+        )
+        Post.objects.filter(pk=post.pk).update(pub_date=PUB_DATE)
+        Post.objects.create(author=self.reader, text='Без группы')
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.snapshot = self.dump()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def dump(self):
+        return {
+            name: list(dataset.model.objects.order_by('pk').values_list(
+                *dataset.export_fields()
+            ))
+            for name, dataset in transfer.DATASETS.items()
+        }
+
+    def wipe(self):
+        for model in (Follow, Comment, Post, Group):
+            model.objects.all().delete()
+        AuthorStats.objects.all().delete()
+
+    def run_command(self, name, *args):
+        call_command(name, self.directory, *args, stdout=StringIO())
+
+    def test_round_trip(self):
+        """Экспорт и импорт в обоих форматах восстанавливают данные."""
+        for file_format in transfer.FORMATS:
+            with self.subTest(file_format=file_format):
+                self.run_command('export_data', f'--format={file_format}')
+                self.wipe()
+                self.run_command('import_data', f'--format={file_format}')
+                self.assertEqual(self.dump(), self.snapshot)
+                self.assertEqual(
+                    Post.objects.get(group__slug='group').pub_date, PUB_DATE
+                )
+                stats = AuthorStats.objects.get(user=self.author)
+                self.assertEqual(stats.post_count, 1)
+                self.assertEqual(stats.follower_count, 1)
+
+    def test_resume_from_checkpoint(self):
+        """Импорт продолжается с сохраненной позиции и идемпотентен."""
+        self.run_command('export_data')
+        path = transfer.dump_path(self.directory, 'post', 'jsonl')
+        _, offset = next(transfer.read_rows(path, 'jsonl'))
+        checkpoint = os.path.join(self.directory, 'checkpoint.json')
+        with open(checkpoint, 'w') as file:
+            json.dump({'group': 10 ** 6, 'post': offset}, file)
+        self.wipe()
+        self.run_command(
+            'import_data', '--only=post', f'--checkpoint={checkpoint}'
+        )
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Без группы']
+        )
+        self.run_command('import_data', '--only=group', '--only=post')
+        self.run_command('import_data', '--only=post')
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_unknown_users(self):
+        """Строки с неизвестными пользователями пропускаются или
+        пользователи создаются по флагу --create-users."""
+        self.run_command('export_data', '--only=follow')
+        self.wipe()
+        User.objects.filter(username='reader').update(username='renamed')
+        out = StringIO()
+        call_command(
+            'import_data', self.directory, '--no-rebuild', stdout=out
+        )
+        self.assertIn('1 skipped', out.getvalue())
+        self.assertFalse(Follow.objects.exists())
+        self.run_command('import_data', '--create-users', '--no-rebuild')
+        follower = Follow.objects.get().user
+        self.assertEqual(follower.username, 'reader')
+        self.assertFalse(follower.is_active)
+        self.assertFalse(follower.has_usable_password())
+
+    def test_orphans_and_rows_already_present(self):
+        """Комментарии к отсутствующим постам пропускаются, уже
+        существующие строки не считаются созданными, а импорт без
+        пересчета предупреждает об устаревших счетчиках."""
+        self.run_command('export_data')
+        Post.objects.all().delete()
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_data', self.directory, '--only=comment', '--no-rebuild',
+            stdout=out, stderr=err,
+        )
+        self.assertIn('comment: 0 rows', out.getvalue())
+        self.assertIn('1 orphaned', out.getvalue())
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(err.getvalue(), '')
+        call_command(
+            'import_data', self.directory, '--only=post', '--no-rebuild',
+            stdout=out, stderr=err,
+        )
+        self.assertIn('post: 2 rows', out.getvalue())
+        self.assertIn('rebuild_counters', err.getvalue())
+        out = StringIO()
+        call_command(
+            'import_data', self.directory, '--only=post', '--no-rebuild',
+            stdout=out, stderr=StringIO(),
+        )
+        self.assertIn('post: 0 rows', out.getvalue())
+        self.assertIn('2 already present', out.getvalue())
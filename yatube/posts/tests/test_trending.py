@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Follow, Post, TrendingScore, User
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.now = timezone.now()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old, cls.busy, cls.quiet = [
+            Post.objects.create(author=cls.author, text=text)
+            for text in ('Старый пост', 'Обсуждаемый пост', 'Тихий пост')
+        ]
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=cls.now - timedelta(days=5)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, ago):
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        Comment.objects.filter(pk=comment.pk).update(
+            created=self.now - ago
+        )
+
+    def scores(self):
+        return dict(TrendingScore.objects.values_list('post_id', 'score'))
+
+    def test_recent_activity_outweighs_old(self):
+        """Свежие комментарии весят больше старых."""
+        for _ in range(3):
+            self.comment(self.old, timedelta(days=2))
+        self.comment(self.busy, timedelta(hours=1))
+        trending.run(now=self.now)
+        self.assertEqual(list(trending.feed()), [self.busy, self.old])
+        scores = self.scores()
+        self.assertAlmostEqual(
+            trending.activity(scores[self.old.pk], self.now),
+            3 * 2 ** -4, places=2,
+        )
+
+    def test_new_followers_lift_fresh_posts(self):
+        """Новый подписчик поднимает только свежие посты автора."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(pk=follow.pk).update(
+            created=self.now - timedelta(hours=12)
+        )
+        trending.run(now=self.now)
+        scores = self.scores()
+        self.assertEqual(set(scores), {self.busy.pk, self.quiet.pk})
+        self.assertAlmostEqual(
+            trending.activity(scores[self.busy.pk], self.now), 1.0, places=2
+        )
+
+    def test_incremental_matches_rebuild(self):
+        """Пошаговый расчёт совпадает с полным пересчётом."""
+        self.comment(self.busy, timedelta(hours=30))
+        self.comment(self.quiet, timedelta(hours=20))
+        trending.run(now=self.now - timedelta(hours=10))
+        self.comment(self.busy, timedelta(hours=2))
+        self.comment(self.old, timedelta(hours=1))
+        result = trending.run(now=self.now)
+        self.assertFalse(result['rebuilt'])
+        self.assertEqual(result['posts'], 2)
+        incremental = self.scores()
+        self.assertTrue(trending.run(rebuild=True, now=self.now)['rebuilt'])
+        rebuilt = self.scores()
+        self.assertEqual(set(incremental), set(rebuilt))
+        for post_id, score in rebuilt.items():
+            self.assertAlmostEqual(incremental[post_id], score)
+
+    def test_decayed_posts_leave_the_table(self):
+        """Угасшая активность удаляется из рейтинга."""
+        self.comment(self.busy, timedelta(hours=1))
+        trending.run(now=self.now)
+        trending.run(now=self.now + timedelta(days=3))
+        self.assertFalse(TrendingScore.objects.exists())
+
+    def test_trending_page_is_one_indexed_read(self):
+        """Страница популярного читает рейтинг без агрегатов."""
+        self.comment(self.quiet, timedelta(hours=1))
+        self.comment(self.busy, timedelta(minutes=1))
+        trending.run(now=self.now)
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.busy, self.quiet]
+        )
+        for query in queries:
+            self.assertNotIn('posts_comment', query['sql'])
+            self.assertNotIn('posts_follow', query['sql'])
+        self.assertEqual(len(queries), 2)
+
+
+class FollowCreatedMigrationTests(TransactionTestCase):
+    before = [('posts', '0016_image_variants')]
+    after = [('posts', '0017_trending')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_old_follows_are_not_new_followers(self):
+        """Подписки, сделанные до миграции, не считаются новыми."""
+        apps = self.migrate(self.before)
+        user_model = apps.get_model('auth', 'User')
+        author = user_model.objects.create(username='author')
+        reader = user_model.objects.create(username='reader')
+        apps.get_model('posts', 'Post').objects.create(
+            author=author, text='Свежий пост'
+        )
+        apps.get_model('posts', 'Follow').objects.create(
+            user=reader, author=author
+        )
+        apps = self.migrate(self.after)
+        self.assertEqual(
+            apps.get_model('posts', 'Follow').objects.get().created,
+            trending.EPOCH,
+        )
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        trending.run(rebuild=True)
+        self.assertFalse(TrendingScore.objects.exists())
@@ -0,0 +1,108 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+from ..uploads import LimitedTemporaryFileUploadHandler
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_file(size, image_format='GIF', name='image.gif'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'white').save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POSTS_IMAGE_MAX_SIZE=2048,
+    POSTS_IMAGE_MAX_DIMENSIONS=(100, 100),
+)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаляем тестовые медиа."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ImageUploadTests.user)
+
+    def create(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост', 'image': image},
+        )
+
+    def test_valid_image_is_saved(self):
+        """Картинка в пределах лимитов сохраняется."""
+        self.create(image_file((10, 10)))
+        self.assertTrue(Post.objects.get(text='Пост').image)
+
+    def test_invalid_images_are_rejected(self):
+        """Большие, огромные по размеру и неподдерживаемые файлы
+        отклоняются до полного декодирования."""
+        cases = {
+            'oversized': SimpleUploadedFile(
+                'big.gif', image_file((10, 10)).read() + b'\0' * 4096
+            ),
+            'dimensions': image_file((101, 10)),
+            'format': image_file((10, 10), 'BMP', 'image.bmp'),
+            'not_image': SimpleUploadedFile('text.gif', b'not an image'),
+        }
+        for case, image in cases.items():
+            with self.subTest(case=case):
+                response = self.create(image)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_handler_stops_reading_past_limit(self):
+        """Обработчик прекращает загрузку на первом куске сверх лимита,
+        не дочитывая запрос, а форма сообщает о размере файла."""
+        request = RequestFactory().post('/')
+        handler = LimitedTemporaryFileUploadHandler(request)
+        handler.new_file('image', 'big.gif', 'image/gif', None)
+        handler.receive_data_chunk(b'\0' * 1024, 0)
+        handler.receive_data_chunk(b'\0' * 1024, 1024)
+        with self.assertRaises(StopUpload) as stopped:
+            handler.receive_data_chunk(b'\0' * 1024, 2048)
+        self.assertTrue(stopped.exception.connection_reset)
+        self.assertEqual(handler.file.tell(), 2048)
+        self.assertEqual(request.rejected_uploads['image'].size, 3072)
+        handler.file.close()
+        response = self.create(
+            SimpleUploadedFile('big.gif', b'\0' * 8192)
+        )
+        self.assertIn(
+            'Размер файла не должен превышать 2,0\xa0КБ.',
+            response.context['form'].errors['image'],
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_handler_refuses_declared_oversize(self):
+        """Файл с заявленной длиной сверх лимита отклоняется сразу."""
+        request = RequestFactory().post('/')
+        handler = LimitedTemporaryFileUploadHandler(request)
+        with self.assertRaises(StopUpload):
+            handler.new_file('image', 'big.gif', 'image/gif', 4096)
+        self.assertEqual(request.rejected_uploads['image'].size, 4096)
+        handler.file.close()
@@ -111,16 +111,39 @@ class PostViewTests(TestCase):
         """Кэш на главной странице работает правильно."""
         cache.clear()
         response1 = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.create(
-            author=self.user,
-            text=self.post.text,
-        )
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
         response2 = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response1.content, response2.content)
         cache.clear()
         response3 = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response1.content, response3.content)
 
+    def test_posts_index_cache_invalidated_by_new_post(self):
+        """Новый пост сразу виден на закэшированных страницах."""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for page in pages:
+            self.authorized_client.get(page)
+        Post.objects.create(
+            author=self.user, group=self.group, text='Свежий пост'
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertContains(
+                    self.authorized_client.get(page), 'Свежий пост'
+                )
+
+    def test_posts_index_cache_shared_between_users(self):
+        """Гость и пользователь получают один закэшированный список."""
+        cache.clear()
+        self.authorized_client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response = Client().get(reverse('posts:index'))
+        self.assertContains(response, self.post.text[:20])
+
     def test_group_list_pages_show_correct_context(self):
         """Шаблон group_list сформирован с правильным контекстом."""
         response_group_list = self.authorized_client.get(
@@ -0,0 +1,269 @@
+"""Thumbnails rendered ahead of time, off the request path.
+
+``schedule`` queues a job on a local thread pool that renders every size
+from ``POSTS_THUMBNAIL_SIZES`` once a post with an image is committed.
+Templates call ``lookup``: it derives the sorl-thumbnail file name and
+checks that the file exists, which is a ``stat`` call, never a Pillow
+decode. Misses fall back to the original image and queue a render.
+
+The same job renders the responsive variants of the image: every width
+of ``POSTS_IMAGE_WIDTHS`` up to the width of the source, as WebP when
+Pillow supports it and as JPEG, cropped to ``POSTS_IMAGE_ASPECT``. The
+source is decoded once for all of them. Their sizes are recorded in
+``ImageVariant``, so ``variants_of`` builds a ``srcset`` with one query
+and no file access.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail import delete as delete_registered
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import caching
+from .models import ImageVariant
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES: dict = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+THUMBNAIL_WORKERS: int = 2
+IMAGE_WIDTHS: tuple = (320, 640, 960, 1440)
+IMAGE_ASPECT: tuple = (960, 339)
+VARIANT_FORMATS: tuple = ('WEBP', 'JPEG')
+VARIANT_OPTIONS: dict = {'crop': 'center', 'upscale': True}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def thumbnail_sizes() -> dict:
+    return getattr(settings, 'POSTS_THUMBNAIL_SIZES', THUMBNAIL_SIZES)
+
+
+def variant_sizes(source_width: int) -> list:
+    """``(width, height)`` of the variants of a source this wide.
+
+    Widths above the source's are skipped, except the smallest one:
+    they would only add bytes, not detail.
+    """
+    widths = sorted(getattr(settings, 'POSTS_IMAGE_WIDTHS', IMAGE_WIDTHS))
+    aspect_width, aspect_height = getattr(
+        settings, 'POSTS_IMAGE_ASPECT', IMAGE_ASPECT
+    )
+    return [
+        (width, round(width * aspect_height / aspect_width))
+        for width in widths
+        if width <= source_width or width == widths[0]
+    ]
+
+
+def variant_formats() -> tuple:
+    """Configured variant formats this Pillow build can write."""
+    formats = getattr(settings, 'POSTS_IMAGE_VARIANT_FORMATS', VARIANT_FORMATS)
+    return tuple(
+        image_format for image_format in formats
+        if image_format != 'WEBP' or features.check('webp')
+    )
+
+
+class PrerenderBackend(ThumbnailBackend):
+    """sorl backend split into a cheap name lookup and a render step."""
+
+    def thumbnail_file(self, name, geometry_string, **options):
+        """``ImageFile`` that ``get_thumbnail`` would produce for ``name``.
+
+        Mirrors the option defaults of ``ThumbnailBackend.get_thumbnail``
+        so both agree on the file name.
+        """
+        source = ImageFile(name, default.storage)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return source, ImageFile(name, default.storage), options
+
+    def render(self, name, geometry_string, source_image=None, **options):
+        """Render a thumbnail unless it exists.
+
+        ``source_image`` is an already decoded source, shared by several
+        renders; it is left to the caller to clean up.
+        """
+        source, thumbnail, options = self.thumbnail_file(
+            name, geometry_string, **options
+        )
+        if thumbnail.exists():
+            return thumbnail
+        own_image = source_image is None
+        if own_image:
+            source_image = default.engine.get_image(source)
+        try:
+            options['image_info'] = default.engine.get_image_info(
+                source_image
+            )
+            self._create_thumbnail(
+                source_image, geometry_string, options, thumbnail
+            )
+            self._create_alternative_resolutions(
+                source_image, geometry_string, options, thumbnail.name
+            )
+        finally:
+            if own_image:
+                default.engine.cleanup(source_image)
+        return thumbnail
+
+
+backend = PrerenderBackend()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(
+                    settings, 'POSTS_THUMBNAIL_WORKERS', THUMBNAIL_WORKERS
+                ),
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def render_variants(name) -> list:
+    """Render the responsive variants of ``name`` and record them."""
+    source_image = default.engine.get_image(ImageFile(name, default.storage))
+    variants = []
+    try:
+        source_width, _ = default.engine.get_image_size(source_image)
+        for image_format in variant_formats():
+            for width, height in variant_sizes(source_width):
+                thumbnail = backend.render(
+                    name, f'{width}x{height}', source_image=source_image,
+                    format=image_format, **VARIANT_OPTIONS
+                )
+                variants.append(ImageVariant(
+                    source=name,
+                    name=thumbnail.name,
+                    format=image_format,
+                    width=width,
+                    height=height,
+                    size=default.storage.size(thumbnail.name),
+                ))
+    finally:
+        default.engine.cleanup(source_image)
+    with transaction.atomic():
+        ImageVariant.objects.filter(source=name).delete()
+        ImageVariant.objects.bulk_create(variants)
+    return variants
+
+
+def render_all(name, feeds=()):
+    """Render every configured size of ``name``; runs in the pool."""
+    try:
+        for geometry, options in thumbnail_sizes().items():
+            backend.render(name, geometry, **options)
+        render_variants(name)
+    except Exception:
+        logger.exception('Could not render thumbnails of %s', name)
+    else:
+        if feeds:
+            caching.bump(*feeds)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def _submit(name, feeds):
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    _get_executor().submit(render_all, name, feeds)
+
+
+def schedule(post):
+    """Queue thumbnails of ``post.image`` once the row is committed."""
+    if not post.image:
+        return
+    name = post.image.name
+    feeds = tuple(caching.post_feeds(post))
+    transaction.on_commit(lambda: _submit(name, feeds))
+
+
+def lookup(post, geometry_string):
+    """URL of a ready thumbnail of ``post.image``, or ``None``.
+
+    Never opens the source image. A miss queues the render, which
+    invalidates the feeds of ``post`` once the file is there.
+    """
+    if not post.image:
+        return None
+    name = post.image.name
+    options = dict(thumbnail_sizes().get(geometry_string, {}))
+    _, thumbnail, _ = backend.thumbnail_file(name, geometry_string, **options)
+    if thumbnail.exists():
+        return thumbnail.url
+    feeds = tuple(caching.post_feeds(post))
+    transaction.on_commit(lambda: _submit(name, feeds))
+    return None
+
+
+def variants_for(posts) -> dict:
+    """Recorded variants of the images of ``posts`` in one query.
+
+    Maps image names to what ``variants_of`` returns for them.
+    """
+    variants = {post.image.name: {} for post in posts if post.image}
+    for variant in ImageVariant.objects.filter(
+        source__in=variants
+    ).order_by('format', 'width'):
+        variants[variant.source].setdefault(variant.format, []).append(
+            variant
+        )
+    return variants
+
+
+def variants_of(post, known=None) -> dict:
+    """Recorded variants of ``post.image`` by format, narrowest first.
+
+    ``known`` is a ``variants_for`` result to look in first. Empty until
+    the worker has rendered them; then the caller should use the
+    original image, and a render is queued as by ``lookup``.
+    """
+    if not post.image:
+        return {}
+    name = post.image.name
+    if known is None or name not in known:
+        known = variants_for([post])
+    variants = known[name]
+    if not variants:
+        feeds = tuple(caching.post_feeds(post))
+        transaction.on_commit(lambda: _submit(name, feeds))
+    return variants
+
+
+def delete_all(name):
+    """Delete every thumbnail and variant of ``name``."""
+    for geometry, options in thumbnail_sizes().items():
+        _, thumbnail, _ = backend.thumbnail_file(name, geometry, **options)
+        thumbnail.delete()
+    variants = ImageVariant.objects.filter(source=name)
+    for variant_name in variants.values_list('name', flat=True):
+        default.storage.delete(variant_name)
+    variants.delete()
+    delete_registered(name, delete_file=False)
@@ -0,0 +1,153 @@
+"""Materialized follow timelines.
+
+Posts are pushed into ``TimelineEntry`` rows of every follower when they
+are written (fan-out-on-write), so ``follow_index`` reads one indexed
+table instead of joining ``Follow`` and ``Post``. Authors with more than
+``POSTS_TIMELINE_FANOUT_LIMIT`` followers are not fanned out: their posts
+are read straight from ``Post`` at request time (fan-out-on-read).
+When an unfollow brings such an author back to the limit, every post of
+theirs is delivered to every follower, since what they posted meanwhile
+and the followers who came meanwhile were skipped.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+FANOUT_LIMIT: int = 1000
+BATCH_SIZE: int = 500
+
+
+def fanout_limit() -> int:
+    return getattr(settings, 'POSTS_TIMELINE_FANOUT_LIMIT', FANOUT_LIMIT)
+
+
+def is_hot(author_id) -> bool:
+    return AuthorStats.objects.filter(
+        user_id=author_id, follower_count__gt=fanout_limit()
+    ).exists()
+
+
+def hot_authors_followed_by(user):
+    """Subquery of followed authors whose posts are read on demand."""
+    return Follow.objects.filter(
+        user=user, author__stats__follower_count__gt=fanout_limit()
+    ).values('author_id')
+
+
+def fanned_out_followers(author_ids):
+    """Followers whose timelines get the posts of ``author_ids``."""
+    return Follow.objects.filter(author_id__in=author_ids).exclude(
+        author__stats__follower_count__gt=fanout_limit()
+    ).order_by().values_list('user_id', flat=True).distinct()
+
+
+def feed_for(user):
+    """Posts for the follow feed of ``user``."""
+    delivered = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=delivered) | Q(author_id__in=hot_authors_followed_by(user))
+    )
+
+
+def _insert(entries):
+    """Write entries in batches without materializing them all."""
+    entries = iter(entries)
+    batch = list(islice(entries, BATCH_SIZE))
+    while batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, BATCH_SIZE))
+
+
+def fan_out_post(post):
+    """Deliver a new post to the timelines of the author's followers."""
+    if is_hot(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk)
+        for user_id in followers.iterator()
+    )
+
+
+def retract_post(post):
+    """Drop a post from every timeline, e.g. after its author changed."""
+    TimelineEntry.objects.filter(post_id=post.pk).delete()
+
+
+def add_follow(user_id, author_id):
+    """Backfill the timeline with the posts of a newly followed author."""
+    add_follows(user_id, [author_id])
+
+
+def add_follows(user_id, author_ids):
+    """``add_follow`` for many authors in a constant number of queries."""
+    hot = AuthorStats.objects.filter(
+        user_id__in=author_ids, follower_count__gt=fanout_limit()
+    ).values_list('user_id', flat=True)
+    posts = Post.objects.filter(author_id__in=author_ids).exclude(
+        author_id__in=hot
+    ).values_list('pk', flat=True)
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id)
+        for post_id in posts.iterator()
+    )
+
+
+def remove_follow(user_id, author_id):
+    remove_follows(user_id, [author_id])
+
+
+def remove_follows(user_id, author_ids):
+    """Drop the posts of ``author_ids`` from the timeline of ``user_id``.
+
+    Called after the follower counters moved.
+    """
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id__in=author_ids
+    ).delete()
+    # Unfollows take one follower at a time: an author at the limit now
+    # was over it before.
+    _backfill(AuthorStats.objects.filter(
+        user_id__in=author_ids, follower_count=fanout_limit()
+    ).values_list('user_id', flat=True))
+
+
+def _backfill(author_ids):
+    """Deliver every post of ``author_ids`` to all their followers."""
+    for author_id in author_ids:
+        posts = list(Post.objects.filter(
+            author_id=author_id
+        ).values_list('pk', flat=True))
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        _insert(
+            TimelineEntry(user_id=user_id, post_id=post_id)
+            for user_id in followers.iterator()
+            for post_id in posts
+        )
+
+
+def rebuild(user_ids=None) -> int:
+    """Recompute timelines from ``Follow`` and ``Post``.
+
+    Returns the number of follow edges that were fanned out.
+    """
+    follows = Follow.objects.all()
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+    entries.delete()
+    edges = 0
+    for user_id, author_id in follows.values_list(
+        'user_id', 'author_id'
+    ).iterator():
+        add_follow(user_id, author_id)
+        edges += 1
+    return edges
@@ -0,0 +1,388 @@
+"""Streaming export and import of groups, posts, comments and follows.
+
+Rows are written and read one at a time, as JSON Lines or CSV, so memory
+use depends on the batch size, never on the table size: export walks
+the table with ``iterator()`` in primary key order, import builds at
+most ``batch_size`` instances before each ``bulk_create()``.
+
+Users are referenced by username, so dumps can move between databases
+with different user ids. Everything else keeps its primary key, which
+is what lets comments point at imported posts and makes both directions
+resumable from a checkpoint: the last exported pk, or the byte offset
+of the last imported row. Rows pointing at a post or group missing from
+the database are skipped as orphans rather than failing the batch.
+"""
+import csv
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.db import connection, reset_queries, transaction
+
+from .models import Comment, Follow, Group, Post, User
+
+FORMATS = ('jsonl', 'csv')
+BATCH_SIZE: int = 1000
+
+# Commands, with their arguments, recomputing what bulk loads skip:
+# ``bulk_create()`` sends no signals.
+REBUILD_COMMANDS = (
+    ('rebuild_counters',),
+    ('rebuild_timelines',),
+    ('rebuild_search_index',),
+    ('compute_suggestions',),
+    ('compute_trending', '--rebuild'),
+)
+
+
+@dataclass
+class Dataset:
+    """A model and the columns of its dump."""
+
+    name: str
+    model: type
+    columns: tuple
+    # Column -> foreign key attname of a user referenced by username.
+    users: dict = field(default_factory=dict)
+
+    def export_fields(self):
+        return [
+            f'{self.users[column][:-3]}__username'
+            if column in self.users else column
+            for column in self.columns
+        ]
+
+
+# In dependency order: a dataset only refers to the ones before it.
+DATASETS = {
+    dataset.name: dataset for dataset in (
+        Dataset('group', Group, ('id', 'title', 'slug', 'description')),
+        Dataset(
+            'post', Post,
+            ('id', 'text', 'pub_date', 'updated', 'author', 'group_id',
+             'image'),
+            users={'author': 'author_id'},
+        ),
+        Dataset(
+            'comment', Comment,
+            ('id', 'post_id', 'author', 'text', 'created'),
+            users={'author': 'author_id'},
+        ),
+        Dataset(
+            'follow', Follow, ('id', 'user', 'author', 'created'),
+            users={'user': 'user_id', 'author': 'author_id'},
+        ),
+    )
+}
+
+
+@dataclass
+class Report:
+    """Rows processed by one dataset run, for the throughput line."""
+
+    name: str
+    rows: int = 0
+    skipped: int = 0
+    orphans: int = 0
+    existing: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        line = (
+            f'{self.name}: {self.rows} rows in {self.seconds:.1f} s '
+            f'({self.rate:.0f} rows/s)'
+        )
+        if self.skipped:
+            line += f', {self.skipped} skipped'
+        if self.orphans:
+            line += f', {self.orphans} orphaned'
+        if self.existing:
+            line += f', {self.existing} already present'
+        return line
+
+
+class ProgressPrinter:
+    """``progress`` callback writing a line every ``every`` rows."""
+
+    def __init__(self, write, every=100000):
+        self.write = write
+        self.every = every
+        self.reported = {}
+
+    def __call__(self, report, elapsed):
+        step = report.rows // self.every
+        if step > self.reported.get(report.name, 0):
+            self.reported[report.name] = step
+            self.write(
+                f'  {report.name}: {report.rows} rows '
+                f'({report.rows / elapsed:.0f} rows/s)'
+            )
+
+
+class Checkpoint:
+    """Progress per dataset, saved to a JSON file after every batch."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.state = {}
+        if path and os.path.exists(path):
+            with open(path) as file:
+                self.state = json.load(file)
+
+    def get(self, name, default=0):
+        return self.state.get(name, default)
+
+    def save(self, name, value):
+        self.state[name] = value
+        if not self.path:
+            return
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.state, file)
+        os.replace(temporary, self.path)
+
+
+def dump_path(directory, name, file_format):
+    return os.path.join(directory, f'{name}.{file_format}')
+
+
+def _to_text(value):
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_dataset(dataset, path, file_format, checkpoint,
+                   batch_size=BATCH_SIZE, progress=None):
+    """Append rows with pk above the checkpoint to ``path``."""
+    report = Report(dataset.name)
+    started = time.perf_counter()
+    last_pk = checkpoint.get(dataset.name)
+    rows = dataset.model.objects.filter(pk__gt=last_pk).order_by(
+        'pk'
+    ).values_list(*dataset.export_fields()).iterator(chunk_size=batch_size)
+    resume = last_pk and os.path.exists(path)
+    mode = 'a' if resume else 'w'
+    with open(path, mode, encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            writer = csv.writer(file)
+            if not resume:
+                writer.writerow(dataset.columns)
+        for values in rows:
+            values = [_to_text(value) for value in values]
+            if file_format == 'csv':
+                writer.writerow(['' if v is None else v for v in values])
+            else:
+                file.write(json.dumps(
+                    dict(zip(dataset.columns, values)), ensure_ascii=False
+                ))
+                file.write('\n')
+            report.rows += 1
+            if report.rows % batch_size == 0:
+                file.flush()
+                checkpoint.save(dataset.name, values[0])
+                reset_queries()
+                if progress:
+                    progress(report, time.perf_counter() - started)
+        file.flush()
+        if report.rows:
+            checkpoint.save(dataset.name, values[0])
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _read_jsonl(file, offset):
+    file.seek(offset)
+    for line in file:
+        offset += len(line)
+        if line.strip():
+            yield json.loads(line), offset
+
+
+def _read_csv(file, offset):
+    position = 0
+
+    def lines():
+        # csv.reader pulls a line only when it needs one, so after each
+        # record ``position`` is exactly the end of that record.
+        nonlocal position
+        for line in file:
+            position += len(line)
+            yield line.decode('utf-8')
+
+    header = next(csv.reader(lines()))
+    if offset:
+        file.seek(offset)
+        position = offset
+    for values in csv.reader(lines()):
+        yield dict(zip(header, values)), position
+
+
+def read_rows(path, file_format, offset=0):
+    """Yield ``(row, offset after the row)`` from ``offset`` on."""
+    with open(path, 'rb') as file:
+        reader = _read_csv if file_format == 'csv' else _read_jsonl
+        yield from reader(file, offset)
+
+
+@contextmanager
+def original_timestamps(model):
+    """Keep imported dates instead of ``auto_now(_add)`` overriding them."""
+    fields = [
+        item for item in model._meta.concrete_fields
+        if getattr(item, 'auto_now', False)
+        or getattr(item, 'auto_now_add', False)
+    ]
+    saved = [(item.auto_now, item.auto_now_add) for item in fields]
+    for item in fields:
+        item.auto_now = item.auto_now_add = False
+    try:
+        yield
+    finally:
+        for item, (auto_now, auto_now_add) in zip(fields, saved):
+            item.auto_now, item.auto_now_add = auto_now, auto_now_add
+
+
+class UserResolver:
+    """Username to id, memoised; creates missing users on request."""
+
+    def __init__(self, create=False):
+        self.create = create
+        self.ids = {}
+
+    def resolve(self, usernames):
+        missing = {name for name in usernames if name} - self.ids.keys()
+        if not missing:
+            return
+        self.ids.update(User.objects.filter(
+            username__in=missing
+        ).values_list('username', 'id'))
+        missing -= self.ids.keys()
+        if missing and self.create:
+            users = [User(username=name, is_active=False) for name in missing]
+            for user in users:
+                user.set_unusable_password()
+            User.objects.bulk_create(users, ignore_conflicts=True)
+            self.ids.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'id'))
+
+    def get(self, username):
+        return self.ids.get(username)
+
+
+def _instance(dataset, row, users):
+    values = {}
+    for column in dataset.columns:
+        if column not in row:
+            # Dumps made before the column existed: keep the default.
+            continue
+        value = row.get(column)
+        if column in dataset.users:
+            user_id = users.get(value)
+            if user_id is None:
+                return None
+            values[dataset.users[column]] = user_id
+            continue
+        model_field = dataset.model._meta.get_field(
+            column[:-3] if column.endswith('_id') else column
+        )
+        if value in (None, ''):
+            value = None if model_field.null else ''
+        else:
+            value = model_field.to_python(value)
+        values[column] = value
+    return dataset.model(**values)
+
+
+def _foreign_keys(dataset):
+    """``(column, related model)`` of the columns holding another pk."""
+    return [
+        (column, dataset.model._meta.get_field(column[:-3]).related_model)
+        for column in dataset.columns
+        if column.endswith('_id')
+    ]
+
+
+def _present(model, pks) -> set:
+    """The pks of ``pks`` that ``model`` has, in batches of parameters."""
+    pks = list({pk for pk in pks if pk is not None})
+    step = connection.features.max_query_params or len(pks) or 1
+    found = set()
+    for start in range(0, len(pks), step):
+        found.update(model.objects.filter(
+            pk__in=pks[start:start + step]
+        ).values_list('pk', flat=True))
+    return found
+
+
+def import_dataset(dataset, path, file_format, checkpoint,
+                   batch_size=BATCH_SIZE, users=None, progress=None):
+    """Load ``path`` from the checkpointed offset in batches.
+
+    Each batch is one transaction followed by a checkpoint, and rows
+    whose pk already exists are ignored, so an interrupted import can
+    simply be run again. ``rows`` of the report counts the rows really
+    created; ``existing`` the ignored ones.
+    """
+    users = users or UserResolver()
+    report = Report(dataset.name)
+    started = time.perf_counter()
+    batch, offset = [], checkpoint.get(dataset.name)
+
+    def flush():
+        users.resolve(
+            row[column] for row in batch for column in dataset.users
+        )
+        instances = []
+        for row in batch:
+            instance = _instance(dataset, row, users)
+            if instance is None:
+                report.skipped += 1
+            else:
+                instances.append(instance)
+        for column, related_model in _foreign_keys(dataset):
+            found = _present(
+                related_model, (getattr(item, column) for item in instances)
+            )
+            kept = [
+                item for item in instances
+                if getattr(item, column) in found
+                or getattr(item, column) is None
+            ]
+            report.orphans += len(instances) - len(kept)
+            instances = kept
+        pks = [item.pk for item in instances]
+        with transaction.atomic():
+            before = _present(dataset.model, pks)
+            dataset.model.objects.bulk_create(
+                instances, ignore_conflicts=True
+            )
+            created = len(_present(dataset.model, pks) - before)
+        checkpoint.save(dataset.name, offset)
+        report.rows += created
+        report.existing += len(instances) - created
+        batch.clear()
+        # With DEBUG on, the connection logs every INSERT; keep that
+        # log from growing with the file.
+        reset_queries()
+        if progress:
+            progress(report, time.perf_counter() - started)
+
+    with original_timestamps(dataset.model):
+        for row, offset in read_rows(path, file_format, offset):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,165 @@
+"""Trending posts: recent comment and follow activity with time decay.
+
+Every comment on a post, and every new follower of its author while the
+post is fresh, adds ``weight * 2 ** (-age / half-life)`` to the post's
+activity. Decay scales every post alike, so ``TrendingScore.score``
+keeps the undecayed activity as a logarithm,
+``log2(sum(weight * 2 ** (t / half-life)))`` with ``t`` counted from
+``EPOCH``: ordering by it is ordering by the decayed activity at any
+moment, scores never have to be decayed in place, and new events are
+simply added to them.
+
+``update`` folds the comments and follows created since the last run
+into the scores and drops posts whose activity has decayed away. The
+``compute_trending`` command runs it periodically; the position it got
+to is kept in the cache, and when it is missing the scores are rebuilt
+from the last ``WINDOW``. Serving the feed is one read of the score
+index.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, TrendingScore
+
+EPOCH = datetime(2022, 1, 1, tzinfo=dt_timezone.utc)
+HALF_LIFE: timedelta = timedelta(hours=12)
+WINDOW: timedelta = timedelta(days=7)
+# A new follower lifts the author's posts of the last POST_WINDOW.
+POST_WINDOW: timedelta = timedelta(days=3)
+COMMENT_WEIGHT: float = 1.0
+FOLLOW_WEIGHT: float = 2.0
+# Posts whose decayed activity falls below this leave the table.
+MIN_ACTIVITY: float = 0.05
+# Rows committed a little late still land after the checkpoint.
+LAG: timedelta = timedelta(seconds=5)
+BATCH_SIZE: int = 500
+CHECKPOINT_KEY: str = 'posts:trending:checkpoint'
+
+
+def half_life() -> timedelta:
+    return getattr(settings, 'POSTS_TRENDING_HALF_LIFE', HALF_LIFE)
+
+
+def moment_units(moment) -> float:
+    """Half-lives from ``EPOCH`` to ``moment``."""
+    return (moment - EPOCH) / half_life()
+
+
+def _log_activity(moment, weight: float) -> float:
+    return moment_units(moment) + math.log2(weight)
+
+
+def _add(total, value: float) -> float:
+    """``log2(2 ** total + 2 ** value)`` without overflow."""
+    if total is None:
+        return value
+    high, low = max(total, value), min(total, value)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def activity(score: float, now=None) -> float:
+    """Decayed activity of a stored score at ``now``."""
+    return 2 ** (score - moment_units(now or timezone.now()))
+
+
+def _batches(items):
+    items = list(items)
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start:start + BATCH_SIZE]
+
+
+def _increments(since, until) -> dict:
+    """Log-activity added to each post by events in ``[since, until)``."""
+    increments = {}
+    comments = Comment.objects.filter(
+        created__gte=since, created__lt=until
+    ).order_by().values_list('post_id', 'created')
+    for post_id, created in comments.iterator():
+        increments[post_id] = _add(
+            increments.get(post_id), _log_activity(created, COMMENT_WEIGHT)
+        )
+    authors = {}
+    follows = Follow.objects.filter(
+        created__gte=since, created__lt=until
+    ).order_by().values_list('author_id', 'created')
+    for author_id, created in follows.iterator():
+        authors[author_id] = _add(
+            authors.get(author_id), _log_activity(created, FOLLOW_WEIGHT)
+        )
+    for batch in _batches(authors):
+        fresh = Post.objects.filter(
+            author_id__in=batch, pub_date__gte=until - POST_WINDOW
+        ).order_by().values_list('pk', 'author_id')
+        for post_id, author_id in fresh.iterator():
+            increments[post_id] = _add(
+                increments.get(post_id), authors[author_id]
+            )
+    return increments
+
+
+def _apply(increments):
+    for batch in _batches(increments):
+        scores = {
+            row.pk: row for row in TrendingScore.objects.filter(pk__in=batch)
+        }
+        changed, created = [], []
+        for post_id in batch:
+            row = scores.get(post_id)
+            if row is None:
+                created.append(TrendingScore(
+                    post_id=post_id, score=increments[post_id]
+                ))
+            else:
+                row.score = _add(row.score, increments[post_id])
+                changed.append(row)
+        TrendingScore.objects.bulk_update(changed, ['score'])
+        TrendingScore.objects.bulk_create(created)
+
+
+@transaction.atomic
+def update(since, until) -> int:
+    """Add the activity of ``[since, until)``; returns the posts touched.
+
+    Afterwards posts whose activity decayed below ``MIN_ACTIVITY`` by
+    ``until`` are dropped.
+    """
+    increments = _increments(since, until)
+    _apply(increments)
+    TrendingScore.objects.filter(
+        score__lt=moment_units(until) + math.log2(MIN_ACTIVITY)
+    ).delete()
+    return len(increments)
+
+
+def run(rebuild=False, now=None) -> dict:
+    """One periodic pass: from the checkpoint, or a rebuild, to now."""
+    until = (now or timezone.now()) - LAG
+    checkpoint = None if rebuild else cache.get(CHECKPOINT_KEY)
+    if checkpoint is None:
+        since = until - WINDOW
+    else:
+        since = datetime.fromtimestamp(checkpoint, dt_timezone.utc)
+    # Readers see the old scores until the new ones are complete.
+    with transaction.atomic():
+        if checkpoint is None:
+            TrendingScore.objects.all().delete()
+        posts = update(since, until) if since < until else 0
+    cache.set(CHECKPOINT_KEY, until.timestamp(), None)
+    return {
+        'rebuilt': checkpoint is None,
+        'since': since,
+        'until': until,
+        'posts': posts,
+    }
+
+
+def feed():
+    """Trending posts, the most active first, for ``for_feed()``."""
+    return Post.objects.filter(trending__isnull=False).order_by(
+        '-trending__score', '-trending__post'
+    )
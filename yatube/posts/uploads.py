@@ -0,0 +1,123 @@
+"""Bounded-memory handling of uploaded images.
+
+``LimitedTemporaryFileUploadHandler`` streams uploads to disk in chunks
+and stops reading the request once ``POSTS_IMAGE_MAX_SIZE`` is exceeded;
+``request_files`` puts such a file back as an empty stand-in of the size
+received, so the form can reject it. ``check_image`` then validates
+size, format and dimensions from the image header alone, before
+Django's ``ImageField`` opens the file.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import (
+    StopUpload, TemporaryFileUploadHandler,
+)
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+IMAGE_MAX_SIZE: int = 5 * 1024 * 1024
+IMAGE_MAX_DIMENSIONS: tuple = (4096, 4096)
+IMAGE_FORMATS: tuple = ('GIF', 'JPEG', 'PNG', 'WEBP')
+
+
+def image_max_size() -> int:
+    return getattr(settings, 'POSTS_IMAGE_MAX_SIZE', IMAGE_MAX_SIZE)
+
+
+def image_max_dimensions() -> tuple:
+    return getattr(
+        settings, 'POSTS_IMAGE_MAX_DIMENSIONS', IMAGE_MAX_DIMENSIONS
+    )
+
+
+def image_formats() -> tuple:
+    return getattr(settings, 'POSTS_IMAGE_FORMATS', IMAGE_FORMATS)
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to a temporary file, giving up past the limit.
+
+    A file declaring a larger ``Content-Length`` is refused before any
+    data; otherwise the upload stops at the first chunk past the limit,
+    without reading the rest of the request body. Either way the file
+    is recorded in ``request.rejected_uploads`` for ``request_files``.
+    """
+
+    def new_file(self, field_name, file_name, content_type,
+                 content_length, *args, **kwargs):
+        super().new_file(
+            field_name, file_name, content_type, content_length,
+            *args, **kwargs
+        )
+        self.received = 0
+        if (content_length or 0) > image_max_size():
+            self.reject(content_length)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > image_max_size():
+            self.reject(self.received)
+        self.file.write(raw_data)
+
+    def reject(self, size):
+        stand_in = SimpleUploadedFile(self.file_name, b'', self.content_type)
+        stand_in.size = size
+        if self.request is not None:
+            if not hasattr(self.request, 'rejected_uploads'):
+                self.request.rejected_uploads = {}
+            self.request.rejected_uploads[self.field_name] = stand_in
+        raise StopUpload(connection_reset=True)
+
+
+def request_files(request):
+    """``request.FILES`` with the uploads stopped at the size limit."""
+    rejected = getattr(request, 'rejected_uploads', None)
+    files = request.FILES
+    if rejected:
+        files = files.copy()
+        for name, stand_in in rejected.items():
+            files[name] = stand_in
+    return files
+
+
+def check_image(file):
+    """Validate an uploaded image reading only its header.
+
+    ``Image.open`` parses the header lazily; the pixel data is not
+    decoded here, so a huge or malicious image costs no memory.
+    """
+    limit = image_max_size()
+    if file.size > limit:
+        raise ValidationError(
+            'Размер файла не должен превышать %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(limit)},
+        )
+    if hasattr(file, 'temporary_file_path'):
+        source = file.temporary_file_path()
+    else:
+        source = file
+    try:
+        with Image.open(source) as image:
+            image_format, (width, height) = image.format, image.size
+    except Exception as error:
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image'
+        ) from error
+    finally:
+        file.seek(0)
+    if image_format not in image_formats():
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.',
+            code='invalid_image_format',
+            params={'format': image_format},
+        )
+    max_width, max_height = image_max_dimensions()
+    if width > max_width or height > max_height:
+        raise ValidationError(
+            'Размер изображения не должен превышать '
+            '%(max_width)s×%(max_height)s пикселей.',
+            code='image_too_large',
+            params={'max_width': max_width, 'max_height': max_height},
+        )
@@ -1,28 +1,130 @@
 from django.urls import path
 
-from . import views
+from core.queries import query_budget
+
+from . import api, views
 
 app_name = 'posts'
 
+# Every view declares the most queries a request may run, session and
+# user lookups included; see ``core.queries``.
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('group/<slug:slug>/', views.group_list, name='group_list'),
-    path('profile/<str:username>/', views.profile, name='profile'),
-    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
-    path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
-    path('create/', views.post_create, name='post_create'),
+    path('', query_budget(10)(views.index), name='index'),
+    path(
+        'trending/',
+        query_budget(8)(views.trending_posts),
+        name='trending'
+    ),
+    path(
+        'group/',
+        query_budget(5)(views.group_directory),
+        name='group_directory'
+    ),
+    path(
+        'group/<slug:slug>/',
+        query_budget(10)(views.group_list),
+        name='group_list'
+    ),
+    path(
+        'profile/<str:username>/',
+        query_budget(10)(views.profile),
+        name='profile'
+    ),
+    path(
+        'posts/<int:post_id>/',
+        query_budget(8)(views.post_detail),
+        name='post_detail'
+    ),
+    path(
+        'posts/<int:post_id>/edit/',
+        query_budget(30)(views.post_edit),
+        name='post_edit'
+    ),
+    path(
+        'create/',
+        query_budget(30)(views.post_create),
+        name='post_create'
+    ),
+    path(
+        'posts/<int:post_id>/comment/',
+        query_budget(12)(views.add_comment),
+        name='add_comment'
+    ),
+    path(
+        'posts/<int:post_id>/comments/',
+        query_budget(4)(views.post_comments),
+        name='post_comments'
+    ),
+    path(
+        'follow/',
+        query_budget(10)(views.follow_index),
+        name='follow_index'
+    ),
+    path(
+        'follow/bulk/',
+        query_budget(25)(views.follow_bulk),
+        name='follow_bulk'
+    ),
+    path(
+        'follow/suggestions/',
+        query_budget(6)(views.follow_suggestions),
+        name='follow_suggestions'
+    ),
+    path(
+        'profile/<str:username>/followers/',
+        query_budget(10)(views.followers),
+        name='followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        query_budget(10)(views.following),
+        name='following'
+    ),
+    path('search/', query_budget(12)(views.search), name='search'),
+    path(
+        'api/search/',
+        query_budget(4)(api.search),
+        name='api_search'
+    ),
+    path('api/posts/', query_budget(2)(api.index), name='api_index'),
+    path(
+        'api/posts/<int:post_id>/',
+        query_budget(3)(api.post_detail),
+        name='api_post_detail'
+    ),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        query_budget(3)(api.post_comments),
+        name='api_post_comments'
+    ),
+    path(
+        'api/group/',
+        query_budget(2)(api.groups),
+        name='api_group_directory'
+    ),
+    path(
+        'api/group/<slug:slug>/',
+        query_budget(3)(api.group_posts),
+        name='api_group_list'
+    ),
+    path(
+        'api/profile/<str:username>/',
+        query_budget(3)(api.profile),
+        name='api_profile'
+    ),
     path(
-        'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
+        'api/follow/',
+        query_budget(6)(api.follow),
+        name='api_follow_index'
     ),
-    path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
-        views.profile_follow,
+        query_budget(15)(views.profile_follow),
         name='profile_follow'
     ),
     path(
         'profile/<str:username>/unfollow/',
-        views.profile_unfollow,
+        query_budget(15)(views.profile_unfollow),
         name='profile_unfollow'
     ),
 ]
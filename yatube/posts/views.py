@@ -6,67 +6,114 @@ Version: 1.0.6. 2022"""
 
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_cookie
+from django.utils.http import is_safe_url
+from django.views.decorators.http import require_POST
 
-from . import helpers
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from . import (caching, counters, directory, follows, helpers, suggestions,
+               thumbnails, timeline, trending, uploads)
+from .forms import CommentForm, PostForm, SearchForm
+from .models import COMMENT_ORDERING, Follow, Group, Post, User
 
 QUANTITY_RECORDS: int = 10
 POST_TITLE_CHAR: int = 30
+COMMENTS_PER_PAGE: int = 20
+COMMENT_CURSOR_PARAM: str = 'comments'
+PEOPLE_PER_PAGE: int = 30
+SUGGESTIONS_SHOWN: int = 20
+GROUPS_PER_PAGE: int = 30
 
 
-@cache_page(20)
-@vary_on_cookie
 def index(request):
-    paginator = Paginator(
-        Post.objects.all(), QUANTITY_RECORDS
+    feed_version = caching.feed_version('index')
+    page_obj = helpers.pagination(
+        Post.objects.for_feed(),
+        request,
+        QUANTITY_RECORDS,
+        count=caching.remember(
+            f'posts:count:index:{feed_version}', Post.objects.count
+        ),
     )
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
     template = 'posts/index.html'
     context = {
         'page_obj': page_obj,
+        **caching.feed_context(request, feed_version),
     }
     return render(request, template, context)
 
 
+def trending_posts(request):
+    """Posts with the most recent activity; see ``posts.trending``."""
+    paginator = Paginator(trending.feed().for_feed(), QUANTITY_RECORDS)
+    context = {
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'trending': True,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def group_directory(request):
+    """Every group with its stats; see ``posts.directory``."""
+    paginator = helpers.CursorPaginator(
+        directory.groups(), GROUPS_PER_PAGE, directory.ORDERING
+    )
+    context = {
+        'page_obj': paginator.get_page(request.GET.get(helpers.CURSOR_PARAM)),
+    }
+    return render(request, 'posts/group_directory.html', context)
+
+
 def group_list(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = helpers.pagination(posts, request, QUANTITY_RECORDS)
+    posts = group.posts.for_feed()
+    page_obj = helpers.pagination(
+        posts, request, QUANTITY_RECORDS, count=group.post_count
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
+        **caching.feed_context(
+            request, caching.feed_version(f'group:{group.pk}')
+        ),
     }
     return render(request, template, context)
 
 
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    user = request.user
-    following = user.is_authenticated and author.following.exists()
-    posts = author.posts.all()
-    page_obj = helpers.pagination(posts, request, QUANTITY_RECORDS)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    following = follows.for_request(request).follows(author.pk)
+    posts = author.posts.for_feed()
+    post_count = counters.posts_of(author)
+    page_obj = helpers.pagination(
+        posts, request, QUANTITY_RECORDS, count=post_count
+    )
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following
+        'following': following,
+        'post_count': post_count,
+        'follower_count': counters.followers_of(author),
+        **caching.feed_context(
+            request, caching.feed_version(f'profile:{author.pk}')
+        ),
     }
     return render(request, template, context)
 
 
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     post_title = post.text[:POST_TITLE_CHAR]
     author = post.author
-    number_author_posts = author.posts.all().count()
-    comments = post.comments.all()
+    number_author_posts = counters.posts_of(author)
+    comments = comment_page(request, post)
     form = CommentForm()
     context = {
         'post': post,
@@ -81,16 +128,36 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def comment_page(request, post):
+    """A page of comments of ``post``, oldest first, by cursor."""
+    paginator = helpers.CursorPaginator(
+        post.comments.for_list(), COMMENTS_PER_PAGE, COMMENT_ORDERING
+    )
+    return paginator.get_page(request.GET.get(COMMENT_CURSOR_PARAM))
+
+
+def post_comments(request, post_id):
+    """The next page of comments as an HTML fragment for "load more"."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comment_page(request, post),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(
         request.POST or None,
+        files=uploads.request_files(request) or None,
     )
     if form.is_valid():
         temp_form = form.save(commit=False)
         temp_form.author = request.user
         temp_form.save()
+        thumbnails.schedule(temp_form)
         return redirect(
             'posts:profile', temp_form.author
         )
@@ -105,11 +172,13 @@ def post_edit(request, post_id):
 
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None,
+        files=uploads.request_files(request) or None,
         instance=post
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id)
     context = {
         'post': post,
@@ -133,10 +202,13 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, QUANTITY_RECORDS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = timeline.feed_for(request.user).for_feed()
+    page_obj = helpers.pagination(posts, request, QUANTITY_RECORDS)
+    # Every post here is by a followed author: the follow buttons need
+    # no lookup.
+    follows.for_request(request).remember(
+        {post.author_id for post in page_obj}, True
+    )
     context = {
         'page_obj': page_obj,
     }
@@ -145,19 +217,127 @@ def follow_index(request):
 
 @login_required
 def profile_follow(request, username):
-    follow_author = get_object_or_404(User, username=username)
-    if follow_author != request.user:
-        follow_author = Follow.objects.get_or_create(
-            user=request.user,
-            author=follow_author
-        )
+    author = get_object_or_404(User, username=username)
+    follows.follow(request.user, [author.pk])
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    follow_author = get_object_or_404(User, username=username)
-    data_follow = request.user.follower.filter(author=follow_author)
-    if data_follow.exists():
-        data_follow.delete()
+    author = get_object_or_404(User, username=username)
+    follows.unfollow(request.user, [author.pk])
     return redirect('posts:profile', username)
+
+
+def _follow_list(request, username, side: str, title: str):
+    """Followers or followed authors of a user, newest follows first.
+
+    ``side`` is the field of ``Follow`` the user is on; the page lists
+    the other one.
+    """
+    author = get_object_or_404(
+        User.objects.only('pk', 'username'), username=username
+    )
+    other = 'author' if side == 'user' else 'user'
+    edges = Follow.objects.filter(**{side: author}).select_related(
+        other
+    ).only(other, *(
+        f'{other}__{name}' for name in suggestions.AUTHOR_FIELDS
+    ))
+    paginator = helpers.CursorPaginator(edges, PEOPLE_PER_PAGE, ('-id',))
+    page_obj = paginator.get_page(request.GET.get(helpers.CURSOR_PARAM))
+    people = [getattr(edge, other) for edge in page_obj]
+    if side == 'user' and request.user == author:
+        # The reader's own follows: every button is "unfollow".
+        follows.for_request(request).remember(
+            [person.pk for person in people], True
+        )
+    context = {
+        'author': author,
+        'people': people,
+        'page_obj': page_obj,
+        'title': title,
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+def followers(request, username):
+    return _follow_list(request, username, 'author', 'Подписчики')
+
+
+def following(request, username):
+    return _follow_list(request, username, 'user', 'Подписки')
+
+
+@login_required
+def follow_suggestions(request):
+    people = suggestions.for_user(request.user, SUGGESTIONS_SHOWN)
+    follows.for_request(request).remember(
+        [person.pk for person in people], False
+    )
+    context = {
+        'people': people,
+        'suggestions': True,
+    }
+    return render(request, 'posts/suggestions.html', context)
+
+
+def _author_ids(request, name) -> set:
+    ids = set()
+    for value in request.POST.getlist(name)[:follows.MAX_BULK]:
+        try:
+            ids.add(int(value))
+        except ValueError:
+            pass
+    return ids
+
+
+@login_required
+@require_POST
+def follow_bulk(request):
+    """Follow and unfollow several authors in one request.
+
+    Takes ``follow`` and ``unfollow`` author ids. Redirects to a safe
+    ``next``, otherwise answers with the followed ones among them.
+    """
+    to_follow = _author_ids(request, 'follow')
+    to_unfollow = _author_ids(request, 'unfollow') - to_follow
+    existing = set(User.objects.filter(
+        pk__in=to_follow | to_unfollow
+    ).values_list('pk', flat=True))
+    to_follow &= existing
+    to_unfollow &= existing
+    state = follows.for_request(request)
+    if to_follow:
+        follows.follow(request.user, to_follow)
+        state.remember(to_follow - {request.user.pk}, True)
+    if to_unfollow:
+        follows.unfollow(request.user, to_unfollow)
+        state.remember(to_unfollow, False)
+    next_url = request.POST.get('next')
+    if next_url and is_safe_url(
+        next_url,
+        allowed_hosts={request.get_host()},
+        require_https=request.is_secure(),
+    ):
+        return redirect(next_url)
+    return JsonResponse({
+        'following': sorted(state.following(existing)),
+    })
+
+
+def search(request):
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        page_obj = Paginator(form.results(), QUANTITY_RECORDS).get_page(
+            request.GET.get('page')
+        )
+    query = request.GET.copy()
+    query.pop('page', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'page_query': f'{query.urlencode()}&' if query else '',
+    }
+    return render(request, 'posts/search.html', context)
@@ -31,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.queries.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,7 +47,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -61,14 +63,34 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+TEST_RUNNER = 'core.testing.DiscoverRunner'
+
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Seconds a connection is kept for the next request of its
+        # thread; 0 closes it after every request.
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_DB_CONN_MAX_AGE', 60)),
+        'OPTIONS': {
+            # Seconds a write waits for another one to commit, e.g.
+            # concurrent post_create and add_comment requests.
+            'timeout': float(os.environ.get('YATUBE_DB_TIMEOUT', 20)),
+        },
     }
 }
 
+# Run on every new SQLite connection, see core.sqlite. cache_size is in
+# KiB when negative: 64 MiB of pages, plus up to 256 MiB memory-mapped.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -109,12 +131,97 @@ LOGIN_REDIRECT_URL = 'posts:index'
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+
+# What a request over its view's query budget, or running N+1 queries,
+# does: 'raise', 'log' or 'off'. See core.queries. Recording every query
+# costs time, so outside DEBUG it is off unless asked for.
+QUERY_BUDGET_MODE = os.environ.get(
+    'YATUBE_QUERY_BUDGET', 'log' if DEBUG else 'off'
+)
+
+# Statements from this many seconds on go to the slow query log; None
+# turns it off, which YATUBE_SLOW_QUERY_MS does when empty or 'off'.
+# See core.slow_queries and slow_query_report.
+SLOW_QUERY_MS = os.environ.get('YATUBE_SLOW_QUERY_MS', '100').strip()
+SLOW_QUERY_THRESHOLD = (
+    None if SLOW_QUERY_MS.lower() in ('', 'off')
+    else float(SLOW_QUERY_MS) / 1000
+)
+
+# Rotated next to it as slow-queries.log.1 and so on.
+SLOW_QUERY_LOG = os.environ.get(
+    'YATUBE_SLOW_QUERY_LOG', os.path.join(BASE_DIR, 'slow-queries.log')
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'core.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'posts.uploads.LimitedTemporaryFileUploadHandler',
+]
+
+POSTS_IMAGE_MAX_SIZE = 5 * 1024 * 1024
+
+POSTS_IMAGE_MAX_DIMENSIONS = (4096, 4096)
+
+POSTS_IMAGE_FORMATS = ('GIF', 'JPEG', 'PNG', 'WEBP')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'posts.cache_backends.SQLiteCache',
+        # Tests get a copy of their own, see core.testing.
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
+    },
+    'locmem': {
+        'BACKEND': 'posts.cache_backends.MeteredLocMemCache',
         'LOCATION': '127.0.0.1:8000',
-    }
+    },
 }
+
+POSTS_CACHE_ALIAS = 'default'
+
+POSTS_PAGINATION = 'offset'
+
+POSTS_TIMELINE_FANOUT_LIMIT = 1000
+
+POSTS_FEED_CACHE_TIMEOUT = 60 * 15
+
+POSTS_THUMBNAIL_SIZES = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+
+POSTS_THUMBNAIL_WORKERS = 2
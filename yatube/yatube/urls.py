@@ -3,12 +3,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core import views as core_views
+
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied'
 
 urlpatterns = [
     path(r'^admin/', admin.site.urls),
+    path('metrics/', core_views.metrics, name='metrics'),
     path('', include('posts.urls', namespace='posts')),
     path(r'^auth/', include('users.urls', namespace='users')),
     path(r'^auth/', include('django.contrib.auth.urls')),